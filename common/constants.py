@@ -17,3 +17,11 @@ BOOLEAN_CHOICES = (
 TRUTH_NESS = ['True', 'TRUE', 'true', 't', 'T', 'Y', 'y', 'yes', 'Yes', 'YES']
 
 FALSE_NESS = ['False', 'FALSE', 'false', 'f', 'F', 'N', 'n', 'no', 'No', 'NO']
+
+# ( query parameter, days ) of the recent periods that the dashboard and
+# the reports filter on; the last one is the dashboard's default
+RECENT_PERIODS = (
+    ('last_week', 7),
+    ('last_month', 30),
+    ('last_three_months', 90),
+)
@@ -1,3 +1,5 @@
+import uuid
+
 import django_filters
 
 from django import forms
@@ -5,6 +7,7 @@ from django.utils.encoding import force_str
 from django.utils.dateparse import parse_datetime
 
 from rest_framework import ISO_8601
+from rest_framework.exceptions import ValidationError
 
 from search.filters import SearchFilter, AutoCompleteSearchFilter
 
@@ -78,6 +81,34 @@ class ListIntegerFilter(ListCharFilter):
         return int(value)
 
 
+class ListUUIDFilter(ListCharFilter):
+    """
+    Enable filtering of comma separated ids e.g. foreign keys.
+
+    The ids are matched exactly so that the lookup can use the column's
+    index; an id that is not a UUID is rejected with a 400 instead of
+    failing in the database.
+
+    The error is reported against `param_name`; pass it when the query
+    parameter is not named after the lookup e.g.
+    `county = ListUUIDFilter(name='ward__constituency__county',
+    param_name='county')`.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.param_name = kwargs.pop('param_name', None)
+        super(ListUUIDFilter, self).__init__(*args, **kwargs)
+
+    def customize(self, value):
+        try:
+            return uuid.UUID(value.strip())
+        except ValueError:
+            raise ValidationError({
+                self.param_name or self.name: [
+                    u"'{}' is not a valid id".format(value)]
+            })
+
+
 class CommonFieldsFilterset(django_filters.FilterSet):
     """Every model that descends from AbstractBase should have this
 
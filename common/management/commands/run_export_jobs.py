@@ -0,0 +1,32 @@
+import time
+
+from django.core.management import BaseCommand
+
+from common.models import run_pending_export_jobs
+
+
+class Command(BaseCommand):
+    help = 'Runs the pending export jobs; keeps polling unless --once'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            dest='once',
+            default=False,
+            help='Run the jobs that are pending then exit')
+        parser.add_argument(
+            '--interval',
+            type=int,
+            dest='interval',
+            default=5,
+            help='Seconds to wait between polls')
+
+    def handle(self, *args, **options):
+        while True:
+            ran = run_pending_export_jobs()
+            if ran:
+                self.stdout.write("Ran {} export jobs".format(ran))
+            if options['once']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+import common.models.base
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('common', 'admin_unit_codes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, serialize=False, editable=False, primary_key=True)),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated', models.DateTimeField(default=django.utils.timezone.now)),
+                ('deleted', models.BooleanField(default=False)),
+                ('active', models.BooleanField(default=True, help_text=b'Indicates whether the record has been retired?')),
+                ('search', models.CharField(max_length=255, null=True, editable=False, blank=True)),
+                ('url', models.TextField(help_text=b'The normalized path and filters of the exported list')),
+                ('format', models.CharField(max_length=10, choices=[(b'csv', b'Comma separated values'), (b'excel', b'Excel workbook')])),
+                ('scope', models.CharField(help_text=b'Identifies the users allowed to download the export', max_length=32, db_index=True)),
+                ('fingerprint', models.CharField(max_length=32, db_index=True)),
+                ('status', models.CharField(default=b'PENDING', max_length=10, choices=[(b'PENDING', b'Waiting for a worker'), (b'RUNNING', b'Being exported'), (b'DONE', b'Ready for download'), (b'FAILED', b'Failed')])),
+                ('artifact', models.FileField(null=True, upload_to=b'exports', blank=True)),
+                ('error', models.TextField(null=True, blank=True)),
+                ('started', models.DateTimeField(null=True, blank=True)),
+                ('finished', models.DateTimeField(null=True, blank=True)),
+                ('created_by', models.ForeignKey(related_name='+', on_delete=django.db.models.deletion.PROTECT, default=common.models.base.get_default_system_user_id, to=settings.AUTH_USER_MODEL)),
+                ('updated_by', models.ForeignKey(related_name='+', on_delete=django.db.models.deletion.PROTECT, default=common.models.base.get_default_system_user_id, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ('-updated', '-created'),
+                'abstract': False,
+                'default_permissions': ('add', 'change', 'delete', 'view'),
+            },
+        ),
+    ]
@@ -1,2 +1,4 @@
 from .base import *  # NOQA
 from .model_declarations import *  # NOQA
+from .model_versions import *  # NOQA
+from .export_jobs import *  # NOQA
@@ -0,0 +1,240 @@
+import hashlib
+import logging
+import tempfile
+import uuid
+
+from django.conf import settings
+from django.core.files import File
+from django.core.urlresolvers import resolve, Resolver404
+from django.db import models
+from django.utils import encoding, timezone
+from django.utils.encoding import force_bytes, force_text
+from django.utils.six.moves.urllib.parse import (
+    urlencode, urlsplit, parse_qsl)
+
+from rest_framework.exceptions import ValidationError
+
+from users.models import load_user_scope
+
+from .base import AbstractBase
+from .model_versions import get_model_versions, get_queryset_version_tag
+
+LOGGER = logging.getLogger(__name__)
+
+# query parameters that do not change what is exported
+EXPORT_IGNORED_PARAMS = (
+    'format', 'stream', 'page', 'page_size', 'cursor', 'count',
+    'access_token'
+)
+
+EXPORT_EXTENSIONS = {
+    'csv': 'csv',
+    'excel': 'xlsx',
+}
+
+
+def normalize_export_url(url):
+    """Drop the host and paging parameters and sort the filters"""
+    parts = urlsplit(url)
+    params = sorted(
+        (key, value) for key, value in parse_qsl(
+            parts.query, keep_blank_values=True)
+        if key not in EXPORT_IGNORED_PARAMS
+    )
+    return '{}?{}'.format(parts.path, urlencode(params)) \
+        if params else parts.path
+
+
+def resolve_list_view(url):
+    """The view class behind an exportable url"""
+    try:
+        match = resolve(urlsplit(url).path)
+    except Resolver404:
+        raise ValidationError({"url": ["The url does not exist"]})
+
+    view_class = getattr(match.func, 'cls', None)
+    if view_class is None or not hasattr(view_class, 'list'):
+        raise ValidationError({"url": ["Only list endpoints can be exported"]})
+    return view_class
+
+
+def get_user_scope_key(user):
+    """
+    Users whose scope keys match see exactly the same records.
+
+    The scope is made up of the administrative unit or regulator the user
+    is attached to and the user's permissions.
+    """
+    return load_user_scope(user).key
+
+
+def get_export_version_tag(view_class):
+    """
+    The versions of the tables an export reads.
+
+    Besides the tables of the view's queryset ( and its subqueries ), a
+    view lists the models its serializer reads through relations,
+    prefetches and extra selects in `export_models`.
+    """
+    queryset = getattr(view_class, 'queryset', None)
+    export_models = getattr(view_class, 'export_models', ())
+    if queryset is None and not export_models:
+        # there is no way to tell when the data changes
+        return uuid.uuid4().hex
+
+    version_tag = set(
+        (model._meta.db_table, version)
+        for model, version in get_model_versions(export_models).items())
+    if queryset is not None:
+        version_tag.update(get_queryset_version_tag(queryset))
+    return sorted(version_tag)
+
+
+@encoding.python_2_unicode_compatible
+class ExportJob(AbstractBase):
+
+    """
+    An export of a list endpoint that runs outside the request cycle.
+
+    Jobs are shared among users with the same scope. The fingerprint
+    covers the normalized url, the format, the scope and the versions of
+    the exported tables, so repeating an export reuses the finished
+    artifact until the underlying data changes.
+    """
+    PENDING = 'PENDING'
+    RUNNING = 'RUNNING'
+    DONE = 'DONE'
+    FAILED = 'FAILED'
+
+    url = models.TextField(
+        help_text='The normalized path and filters of the exported list')
+    format = models.CharField(max_length=10, choices=(
+        ('csv', 'Comma separated values'),
+        ('excel', 'Excel workbook'),
+    ))
+    scope = models.CharField(
+        max_length=32, db_index=True,
+        help_text='Identifies the users allowed to download the export')
+    fingerprint = models.CharField(max_length=32, db_index=True)
+    status = models.CharField(max_length=10, default=PENDING, choices=(
+        (PENDING, 'Waiting for a worker'),
+        (RUNNING, 'Being exported'),
+        (DONE, 'Ready for download'),
+        (FAILED, 'Failed'),
+    ))
+    artifact = models.FileField(upload_to='exports', null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+    started = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    @classmethod
+    def request_export(cls, user, url, export_format):
+        """
+        Return a `( job, created )` tuple for the export.
+
+        An unfinished or finished job with the same fingerprint is reused.
+        """
+        if export_format not in EXPORT_EXTENSIONS:
+            raise ValidationError(
+                {"format": ["Exports can only be csv or excel files"]})
+        url = normalize_export_url(url)
+        view_class = resolve_list_view(url)
+        scope = get_user_scope_key(user)
+
+        version_tag = get_export_version_tag(view_class)
+        fingerprint = hashlib.md5(force_bytes(repr(
+            (url, export_format, scope, version_tag)))).hexdigest()
+
+        existing = cls.objects.filter(fingerprint=fingerprint).exclude(
+            status=cls.FAILED).first()
+        if existing is not None:
+            return existing, False
+
+        return cls.objects.create(
+            url=url, format=export_format, scope=scope,
+            fingerprint=fingerprint, created_by=user, updated_by=user
+        ), True
+
+    def _claim(self):
+        """Mark the job as running; False if another worker got it first"""
+        now = timezone.now()
+        claimed = ExportJob.objects.filter(
+            pk=self.pk, status=self.PENDING).update(
+            status=self.RUNNING, started=now, updated=now)
+        if claimed:
+            self.status = self.RUNNING
+            self.started = now
+        return bool(claimed)
+
+    def _render(self, output):
+        # imported here since the test helpers pull in the whole of DRF
+        from rest_framework.test import APIRequestFactory, force_authenticate
+
+        parts = urlsplit(self.url)
+        params = parse_qsl(parts.query, keep_blank_values=True)
+        params.extend([
+            ('format', self.format),
+            ('stream', 'true'),
+            # views that can not stream render everything as one page
+            ('page_size', settings.REST_FRAMEWORK['MAX_PAGINATE_BY']),
+        ])
+        request = APIRequestFactory().get(parts.path, dict(params))
+        force_authenticate(request, user=self.created_by)
+
+        match = resolve(parts.path)
+        response = match.func(request, *match.args, **match.kwargs)
+        try:
+            if response.status_code != 200:
+                raise ValueError(
+                    'The export responded with {}'.format(
+                        response.status_code))
+            if response.streaming:
+                for chunk in response.streaming_content:
+                    output.write(chunk)
+            else:
+                # a truncated artifact would be reused as if it were whole
+                data = getattr(response, 'data', None)
+                if isinstance(data, dict) and data.get('next'):
+                    raise ValueError(
+                        'The export has more than {} records; only lists '
+                        'that stream can be exported in full'.format(
+                            settings.REST_FRAMEWORK['MAX_PAGINATE_BY']))
+                response.render()
+                output.write(response.content)
+        finally:
+            response.close()
+
+    def run(self):
+        """Export the url to the artifact; returns False if not claimed"""
+        if not self._claim():
+            return False
+
+        try:
+            with tempfile.TemporaryFile() as output:
+                self._render(output)
+                output.seek(0)
+                self.artifact.save(
+                    '{}.{}'.format(self.pk, EXPORT_EXTENSIONS[self.format]),
+                    File(output), save=False)
+            self.status = self.DONE
+        except Exception as error:
+            LOGGER.exception('Export {} failed'.format(self.pk))
+            self.status = self.FAILED
+            self.error = force_text(error)
+
+        self.finished = timezone.now()
+        self.updated = self.finished
+        self.save()
+        return True
+
+    def __str__(self):
+        return '{}: {} ( {} )'.format(self.format, self.url, self.status)
+
+
+def run_pending_export_jobs(limit=None):
+    """Run the oldest pending jobs; returns the number that ran"""
+    pending = ExportJob.objects.filter(
+        status=ExportJob.PENDING).order_by('created')
+    if limit is not None:
+        pending = pending[:limit]
+    return len([job for job in pending if job.run()])
@@ -0,0 +1,122 @@
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.sql import Query
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+
+MODEL_VERSION_KEY = 'model_version:{}.{}'
+NAMED_VERSION_KEY = 'named_version:{}'
+
+
+def _model_version_key(model):
+    # proxies ( including deferred models ) share their concrete table
+    model = model._meta.concrete_model
+    return MODEL_VERSION_KEY.format(
+        model._meta.app_label, model._meta.model_name)
+
+
+def _initial_version():
+    # A counter that was evicted must not restart at a value that older
+    # cache entries could still be keyed on
+    return int(time.time() * 1000)
+
+
+def _get_versions(keys):
+    versions = cache.get_many(keys)
+    for key in keys:
+        if versions.get(key) is None:
+            cache.add(key, _initial_version(), None)
+            versions[key] = cache.get(key) or 0
+    return versions
+
+
+def _bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, _initial_version(), None)
+
+
+def get_model_versions(models):
+    """
+    Return a {model: version} dict for the given models.
+
+    The version of a model changes every time one of its records is saved
+    or deleted, making it a cheap way to invalidate cached values that are
+    derived from the model's table.
+    """
+    keys = dict((_model_version_key(model), model) for model in models)
+    versions = _get_versions(list(keys.keys()))
+    return dict((model, versions[key]) for key, model in keys.items())
+
+
+def get_model_version(model):
+    return get_model_versions([model])[model]
+
+
+def _where_subqueries(node):
+    for child in getattr(node, 'children', []):
+        rhs = getattr(child, 'rhs', None)
+        # e.g. `id__in=<queryset>` keeps the queryset as the lookup's rhs
+        subquery = getattr(rhs, 'query', rhs)
+        if isinstance(subquery, Query):
+            yield subquery
+        for nested in _where_subqueries(child):
+            yield nested
+
+
+def _query_tables(query):
+    tables = set(join.table_name for join in query.alias_map.values())
+    for subquery in _where_subqueries(query.where):
+        tables.update(_query_tables(subquery))
+    return tables
+
+
+def get_queryset_version_tag(queryset):
+    """
+    A sorted list of ( table, version ) pairs for the tables a queryset
+    reads, including those read by subqueries in its filters; it changes
+    whenever any of those tables is written to.
+    """
+    tables = _query_tables(queryset.query)
+    models = [
+        model for model in apps.get_models()
+        if model._meta.db_table in tables
+    ]
+    return sorted(
+        (model._meta.db_table, version)
+        for model, version in get_model_versions(models).items())
+
+
+def bump_model_version(model):
+    _bump_version(_model_version_key(model))
+
+
+def get_named_versions(names):
+    """
+    Return a {name: version} dict of version counters that are not tied
+    to a single table; the code that changes whatever a counter covers
+    bumps it with `bump_named_version`.
+    """
+    keys = dict((NAMED_VERSION_KEY.format(name), name) for name in names)
+    versions = _get_versions(list(keys.keys()))
+    return dict((name, versions[key]) for key, name in keys.items())
+
+
+def get_named_version(name):
+    return get_named_versions([name])[name]
+
+
+def bump_named_version(name):
+    _bump_version(NAMED_VERSION_KEY.format(name))
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def bump_model_version_on_change(sender, instance, **kwargs):
+    if sender._meta.app_label in settings.LOCAL_APPS:
+        bump_model_version(sender)
@@ -1,13 +1,288 @@
+import base64
+import binascii
+import hashlib
+import json
+import re
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage, Paginator as DjangoPaginator
+from django.db import connections
+from django.db.models.fields import FieldDoesNotExist
+from django.utils.encoding import force_bytes
+
 from rest_framework import pagination
 from rest_framework.compat import OrderedDict
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .constants import FALSE_NESS
+from .models import get_queryset_version_tag
+
+
+KEYSET_ORDERING = ('updated', 'created', 'id')
+
+
+def get_keyset_fields(model, names=KEYSET_ORDERING):
+    """The keyset columns; models without audit dates use the pk"""
+    fields = []
+    for name in names:
+        try:
+            fields.append(model._meta.get_field(name))
+        except FieldDoesNotExist:
+            continue
+    if model._meta.pk not in fields:
+        fields.append(model._meta.pk)
+    return fields
+
+
+def filter_after_keyset(queryset, fields, position, reverse=False):
+    """
+    Keep the records after `position` in the descending keyset ordering.
+
+    Uses a row value comparison so that postgres can walk an index on
+    the keyset columns instead of scanning and discarding an offset.
+    """
+    quote_name = connections[queryset.db].ops.quote_name
+    columns = ', '.join(
+        '{}.{}'.format(
+            quote_name(field.model._meta.db_table),
+            quote_name(field.column))
+        for field in fields
+    )
+    placeholders = ', '.join(['%s'] * len(fields))
+    return queryset.extra(
+        where=['({}) {} ({})'.format(
+            columns, '>' if reverse else '<', placeholders)],
+        params=position
+    )
+
+
+def iterate_in_keyset_chunks(queryset, chunk_size):
+    """
+    Yield the records of `queryset` as lists of at most `chunk_size`.
+
+    Each chunk is a separate query resuming after the previous chunk, so
+    only one chunk is ever held in memory and `prefetch_related` still
+    applies to every chunk.
+    """
+    fields = get_keyset_fields(queryset.model)
+    # by attname, so a relation pk sorts on its own column rather than on
+    # the related model's ordering
+    queryset = queryset.order_by(*['-' + field.attname for field in fields])
+    chunk = list(queryset[:chunk_size])
+    while chunk:
+        yield chunk
+        if len(chunk) < chunk_size:
+            break
+        position = [getattr(chunk[-1], field.attname) for field in fields]
+        chunk = list(
+            filter_after_keyset(queryset, fields, position)[:chunk_size])
+
+
+class ExactCount(object):
+    """Counts with a plain `COUNT(*)`"""
+
+    def count(self, queryset):
+        """Returns a `(count, is_estimated)` tuple"""
+        return queryset.count(), False
+
+
+class EstimatedCount(ExactCount):
+    """
+    Reads the row estimate off the query planner.
+
+    Only the model's whole listing is estimated; for it the planner's
+    estimate comes straight from `pg_class.reltuples`, while estimates of
+    filtered querysets can be far off, so those are counted exactly.
+    Counting a small result exactly is cheap too, so estimates below
+    `exact_threshold` are replaced by an exact count.
+    """
+    exact_threshold = 1000
+    rows_regex = re.compile(r'rows=(\d+)')
+
+    def is_unfiltered(self, queryset):
+        """Whether the queryset reads what the model's default manager does"""
+        def get_sql(queryset):
+            return queryset.order_by().values_list(
+                'pk').query.sql_with_params()
+
+        return get_sql(queryset) == get_sql(
+            queryset.model._default_manager.all())
+
+    def count(self, queryset):
+        if not self.is_unfiltered(queryset):
+            return super(EstimatedCount, self).count(queryset)
+
+        sql, params = queryset.order_by().query.sql_with_params()
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute('EXPLAIN ' + sql, params)
+            plan = cursor.fetchone()[0]
+
+        match = self.rows_regex.search(plan)
+        if match is None or int(match.group(1)) < self.exact_threshold:
+            return super(EstimatedCount, self).count(queryset)
+        return int(match.group(1)), True
+
+
+class CachedCount(ExactCount):
+    """
+    Caches exact counts.
+
+    The cache key is a hash of the compiled query, which normalizes the
+    filters and the user's scoping, and of the versions of every table in
+    the query; saving or deleting a record in any of those tables
+    invalidates the count.
+    """
+    timeout = 60 * 60
+
+    def _get_cache_key(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        version_tag = get_queryset_version_tag(queryset)
+        digest = hashlib.md5(
+            force_bytes(repr((sql, params, version_tag)))).hexdigest()
+        return 'count:{}'.format(digest)
+
+    def count(self, queryset):
+        queryset = queryset.order_by()
+        key = self._get_cache_key(queryset)
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, self.timeout)
+        return count, False
+
+
+class CountingPaginator(DjangoPaginator):
+    """A django paginator that counts using a count strategy"""
+
+    def __init__(self, object_list, per_page, count_strategy, **kwargs):
+        super(CountingPaginator, self).__init__(
+            object_list, per_page, **kwargs)
+        self.count_strategy = count_strategy
+        self.count_is_estimated = False
+
+    def _get_count(self):
+        if self._count is None:
+            self._count, self.count_is_estimated = \
+                self.count_strategy.count(self.object_list)
+        return self._count
+    count = property(_get_count)
 
 
 class MflPaginationSerializer(pagination.PageNumberPagination):
+    """
+    Page number pagination with an opt in keyset ( cursor ) mode.
+
+    Sending `?cursor=` ( empty for the first page ) switches to keyset
+    pagination: records are ordered by `-updated, -created, -id` and each
+    page resumes after the last record of the previous one, so deep pages
+    cost the same as the first one. The cursors returned in `next` and
+    `previous` are opaque. Pass `count=false` to skip the total count.
+
+    Cursor mode always uses the keyset ordering; `ordering` is ignored.
+
+    Views choose how totals are counted by setting `count_strategy` to
+    `ExactCount` ( the default ), `EstimatedCount` or `CachedCount`;
+    `count_is_estimated` in the response tells which kind of total it is.
+    """
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    cursor_ordering = KEYSET_ORDERING
+
+    count_strategy = ExactCount
+
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.counter = getattr(
+            view, 'count_strategy', self.count_strategy)()
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        if not self.cursor_mode:
+            return self._paginate_by_page_number(queryset, request, page_size)
+
+        self.request = request
+        self.page_size = page_size
+        self.display_page_controls = False
+        self.cursor_fields = get_keyset_fields(
+            queryset.model, self.cursor_ordering)
+
+        self.count = None
+        self.count_is_estimated = False
+        if request.query_params.get(
+                self.count_query_param) not in FALSE_NESS:
+            self.count, self.count_is_estimated = \
+                self.counter.count(queryset)
+
+        position, reverse = self._decode_cursor(
+            request.query_params[self.cursor_query_param])
+        if position is not None:
+            queryset = filter_after_keyset(
+                queryset, self.cursor_fields, position, reverse)
+
+        # by attname, so a relation pk sorts on its own column rather than
+        # on the related model's ordering
+        ordering = [
+            field.attname if reverse else '-' + field.attname
+            for field in self.cursor_fields
+        ]
+        results = list(queryset.order_by(*ordering)[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+
+        self.next_cursor = self.previous_cursor = None
+        if results:
+            more_after = position is not None if reverse else has_more
+            more_before = has_more if reverse else position is not None
+            if more_after:
+                self.next_cursor = self._encode_cursor(results[-1], False)
+            if more_before:
+                self.previous_cursor = self._encode_cursor(results[0], True)
+        elif position is not None:
+            # stepped past either end; point back at that end
+            if reverse:
+                self.next_cursor = self._encode_cursor(None, False)
+            else:
+                self.previous_cursor = self._encode_cursor(None, True)
+        return results
+
+    def _paginate_by_page_number(self, queryset, request, page_size):
+        paginator = CountingPaginator(
+            queryset, page_size, self.counter)
+        page_number = request.query_params.get(self.page_query_param, 1)
+        if page_number in self.last_page_strings:
+            page_number = paginator.num_pages
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound('Invalid page "{}": {}.'.format(
+                page_number, exc))
+
+        if paginator.count > 1 and self.template is not None:
+            self.display_page_controls = True
+        self.request = request
+        return list(self.page)
 
     def get_paginated_response(self, data):
+        if self.cursor_mode:
+            return Response(OrderedDict([
+                ('count', self.count),
+                ('count_is_estimated', self.count_is_estimated),
+                ('next', self._get_cursor_link(self.next_cursor)),
+                ('previous', self._get_cursor_link(self.previous_cursor)),
+                ('page_size', self.page_size),
+                ('results', data)
+            ]))
+
         return Response(OrderedDict([
             ('count', self.page.paginator.count),
+            ('count_is_estimated', self.page.paginator.count_is_estimated),
             ('next', self.get_next_link()),
             ('previous', self.get_previous_link()),
             ('page_size', self.page.paginator.per_page),
@@ -17,3 +292,47 @@ class MflPaginationSerializer(pagination.PageNumberPagination):
             ('end_index', self.page.end_index()),
             ('results', data)
         ]))
+
+    def _get_cursor_link(self, cursor):
+        if cursor is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param,
+            cursor)
+
+    def _encode_cursor(self, instance, reverse):
+        """
+        An instance of `None` encodes the edge of the listing i.e the
+        first page when paging forward or the last one when paging back.
+        """
+        position = None
+        if instance is not None:
+            position = [
+                field.value_to_string(instance)
+                for field in self.cursor_fields
+            ]
+        payload = json.dumps({'p': position, 'r': reverse})
+        return base64.urlsafe_b64encode(
+            payload.encode('utf-8')).decode('ascii')
+
+    def _decode_cursor(self, cursor):
+        if not cursor:
+            return None, False
+
+        try:
+            payload = json.loads(
+                base64.urlsafe_b64decode(
+                    cursor.encode('ascii')).decode('utf-8'))
+            reverse = bool(payload['r'])
+            position = payload['p']
+            if position is None:
+                return None, reverse
+            if len(position) != len(self.cursor_fields):
+                raise ValueError('Wrong number of cursor values')
+            return [
+                field.to_python(value)
+                for field, value in zip(self.cursor_fields, position)
+            ], reverse
+        except (TypeError, ValueError, KeyError, UnicodeError,
+                binascii.Error, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
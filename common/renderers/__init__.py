@@ -1,2 +1,2 @@
-from .excel_renderer import ExcelRenderer  # noqa
-from .csv_renderer import CSVRenderer  # noqa
+from .excel_renderer import ExcelRenderer, write_excel_workbook  # noqa
+from .csv_renderer import CSVRenderer, stream_csv_rows  # noqa
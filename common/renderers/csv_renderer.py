@@ -1,3 +1,7 @@
+import csv
+
+from django.utils.encoding import force_str
+
 from rest_framework_csv import renderers as csv_renderers
 
 from .shared import DownloadMixin
@@ -14,3 +18,33 @@ class CSVRenderer(DownloadMixin, csv_renderers.CSVRenderer):
             data, media_type=media_type,
             renderer_context=renderer_context
         )
+
+
+class _EchoBuffer(object):
+    """A file-like object that hands back whatever is written to it"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv_rows(chunks):
+    """
+    Lazily render chunks of serialized records as CSV lines.
+
+    Records are flattened the same way `CSVRenderer` flattens them. The
+    header is taken from the first chunk since the rest of the export has
+    not been read yet; columns that only appear later are left out.
+    """
+    renderer = CSVRenderer()
+    writer = csv.writer(_EchoBuffer())
+    header = None
+    for chunk in chunks:
+        items = [renderer.flatten_item(item) for item in chunk]
+        if header is None:
+            header = sorted(set(key for item in items for key in item))
+            yield writer.writerow([force_str(key) for key in header])
+        for item in items:
+            yield writer.writerow([
+                force_str('' if item.get(key) is None else item.get(key))
+                for key in header
+            ])
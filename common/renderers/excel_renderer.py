@@ -1,12 +1,16 @@
-import xlsxwriter
-import string
-import cStringIO
-import uuid
 import json
+import numbers
+import tempfile
+import uuid
+from collections import namedtuple
+from wsgiref.util import FileWrapper
+
+import xlsxwriter
 
 from django.conf import settings
+from django.utils.encoding import force_text
 
-from rest_framework import renderers, status
+from rest_framework import renderers, serializers, status
 
 from .shared import DownloadMixin
 
@@ -64,88 +68,206 @@ def sanitize_field_names(sample_keys):
     return key_map
 
 
-def _write_excel_file(data):  # noqa
-    result = data.get('results')
-    mem_file = cStringIO.StringIO()
-    workbook = xlsxwriter.Workbook(mem_file)
-    format = workbook.add_format(
+def _is_uuid(value):
+    if isinstance(value, uuid.UUID):
+        return True
+    try:
+        uuid.UUID(str(value))
+        return True
+    except ValueError:
+        return False
+
+
+def _write_text(worksheet, row, col, value, cell_format=None):
+    if value is None:
+        return
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, default=str)
+    worksheet.write_string(row, col, force_text(value), cell_format)
+
+
+def _write_number(worksheet, row, col, value, cell_format=None):
+    if isinstance(value, numbers.Number) and not isinstance(value, bool):
+        worksheet.write_number(row, col, value, cell_format)
+    else:
+        _write_text(worksheet, row, col, value, cell_format)
+
+
+def _write_boolean(worksheet, row, col, value, cell_format=None):
+    if isinstance(value, bool):
+        worksheet.write_boolean(row, col, value, cell_format)
+    else:
+        _write_text(worksheet, row, col, value, cell_format)
+
+
+Column = namedtuple('Column', ['key', 'title', 'writer', 'nested'])
+
+
+def _pick_writer(field, sample_value):
+    if isinstance(field, serializers.BooleanField):
+        return _write_boolean
+    if isinstance(field, (
+            serializers.IntegerField, serializers.FloatField,
+            serializers.DecimalField)):
+        return _write_number
+    if isinstance(sample_value, bool):
+        return _write_boolean
+    if isinstance(sample_value, numbers.Number):
+        return _write_number
+    return _write_text
+
+
+def plan_columns(records, fields=None):
+    """
+    Work out the columns of a worksheet once, from a sample of records.
+
+    Excluded audit fields and columns holding ids are left out, the titles
+    come from `sanitize_field_names` and each column gets a writer for the
+    type of its values. `fields` are the serializer's fields, if known.
+    Columns holding lists are written to worksheets of their own.
+    """
+    fields = fields or {}
+    keys = remove_keys(list(records[0].keys())) if records else []
+    titles = dict(
+        (key_map["actual"], key_map["preferred"].capitalize())
+        for key_map in sanitize_field_names(keys))
+
+    columns = []
+    for key in keys:
+        field = fields.get(key)
+        sample_value = next((
+            record.get(key) for record in records
+            if record.get(key) not in (None, '')), None)
+        if isinstance(field, serializers.PrimaryKeyRelatedField):
+            continue
+        if sample_value is not None and not isinstance(
+                sample_value, (list, dict, bool, numbers.Number)) and \
+                _is_uuid(sample_value):
+            continue
+
+        nested = isinstance(sample_value, list)
+        columns.append(Column(
+            key=key, title=titles[key],
+            writer=None if nested else _pick_writer(field, sample_value),
+            nested=nested))
+    return columns
+
+
+class _SheetWriter(object):
+    """
+    Writes records to a worksheet row by row.
+
+    The columns are planned from the first batch of records; lists found
+    in a column are written to a child sheet where each row carries the
+    number of the row it belongs to.
+    """
+
+    def __init__(self, workbook, name, title_format, fields=None,
+                 parent_title=None, sheet_names=None):
+        self.workbook = workbook
+        self.sheet_names = set() if sheet_names is None else sheet_names
+        self.name = name
+        self.title_format = title_format
+        self.fields = fields
+        self.parent_title = parent_title
+        self.worksheet = None
+        self.columns = None
+        self.children = {}
+        self.row = 0
+
+    def _sheet_name(self, title):
+        # excel limits sheet names to 31 characters and they must be unique
+        name = title[:31]
+        suffix = 1
+        while name.lower() in self.sheet_names:
+            suffix += 1
+            name = '{} {}'.format(title[:28], suffix)
+        self.sheet_names.add(name.lower())
+        return name
+
+    def _start(self, records):
+        self.columns = plan_columns(records, self.fields)
+        self.worksheet = self.workbook.add_worksheet(
+            self._sheet_name(self.name))
+        self.worksheet.set_column(0, max(len(self.columns), 1), 30)
+        self.worksheet.set_row(0, 50)
+
+        titles = [column.title for column in self.columns]
+        if self.parent_title is not None:
+            titles.insert(0, '{} row'.format(self.parent_title))
+        for col, title in enumerate(titles):
+            self.worksheet.write_string(0, col, title, self.title_format)
+        self.row = 1
+
+    def write_records(self, records, parent_rows=None):
+        if not records:
+            return
+        if self.columns is None:
+            self._start(records)
+
+        offset = 0 if self.parent_title is None else 1
+        for index, record in enumerate(records):
+            if offset:
+                self.worksheet.write_number(self.row, 0, parent_rows[index])
+            for col, column in enumerate(self.columns, offset):
+                value = record.get(column.key)
+                if column.nested:
+                    self._write_nested(column, value)
+                else:
+                    column.writer(self.worksheet, self.row, col, value)
+            self.row += 1
+
+    def _write_nested(self, column, value):
+        if not isinstance(value, list) or not value:
+            return
+        child = self.children.get(column.key)
+        if child is None:
+            child = self.children[column.key] = _SheetWriter(
+                self.workbook, column.title, self.title_format,
+                parent_title=self.name, sheet_names=self.sheet_names)
+        items = [
+            item if isinstance(item, dict) else {'value': item}
+            for item in value
+        ]
+        # excel row numbers are 1 based
+        child.write_records(items, [self.row + 1] * len(items))
+
+
+def write_excel_workbook(chunks, output, fields=None):
+    """
+    Write chunks of serialized records to an xlsx workbook.
+
+    `output` is a path or a file object. The workbook is written in
+    xlsxwriter's constant memory mode, which flushes each row to a temp
+    file once it is complete, so memory use does not grow with the number
+    of records.
+    """
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    title_format = workbook.add_format(
         {
             'bold': True,
             'font_color': 'black',
             'font_size': 12
         })
-
-    def _add_data_to_worksheet(work_sheet_data):
-        worksheet = workbook.add_worksheet()
-        chars = string.ascii_uppercase
-
-        # format the column titles
-        worksheet.set_row(0, 50)
-        [worksheet.set_column('A:{}'.format(char), 30) for char in chars]
-
-        row = 0
-        col = 0
-        if len(work_sheet_data) >= 1:
-            example_dict = work_sheet_data[0]
-            sample_keys = example_dict.keys()
-
-            # remove columns that should not be in excel
-            sample_keys = remove_keys(sample_keys)
-
-            # find uuid fields and remove them from data
-            data = work_sheet_data[0]
-            reject_keys = []
-            for key in sample_keys:
-                try:
-                    uuid.UUID(str(data.get(key)))
-                    reject_keys.append(key)
-                    del sample_keys[sample_keys.index(key)]
-                except ValueError:
-                    pass
-
-            # remove data with uuid fields
-            for data in work_sheet_data:
-                for key in reject_keys:
-                    del data[key]
-
-            # write the excel column names
-            sample_keys_map = sanitize_field_names(sample_keys)
-            for key in sample_keys_map:
-                worksheet.write(
-                    row, col, key.get("preferred").capitalize(), format)
-                col = col + 1
-            row = 1
-            col = 0
-            for data_dict in work_sheet_data:
-                data_keys = data_dict.keys()
-
-                # remove colums that should not be in excel
-                data_keys = remove_keys(data_keys)
-
-                for key in data_keys:
-                    if not isinstance(data_dict.get(key), list):
-                        try:
-                            uuid.UUID(str(data_dict.get(key)))
-                        except ValueError:
-                            worksheet.write(row, col, str(data_dict.get(key)))
-                        col = col + 1
-                    else:
-                        # write sheets to new work sheets
-                        col = col + 1
-
-                col = 0
-                row = row + 1
-
-        else:
-            # the count is zero thus do not write the excel file
-            pass
-
-    _add_data_to_worksheet(result)
+    sheet = _SheetWriter(workbook, 'Sheet1', title_format, fields)
+    for chunk in chunks:
+        sheet.write_records(list(chunk))
+    if sheet.worksheet is None:
+        # the count is zero; xlsx files need at least one sheet
+        workbook.add_worksheet()
     workbook.close()
-    mem_file_contents = mem_file.getvalue()
-    mem_file.close()
 
-    return mem_file_contents
+
+def _write_excel_file(data, fields=None):
+    """
+    Write a page of records to an anonymous temp file; the returned
+    wrapper reads the workbook back in blocks and closing it removes the
+    file
+    """
+    output = tempfile.TemporaryFile()
+    write_excel_workbook([data.get('results')], output, fields)
+    output.seek(0)
+    return FileWrapper(output)
 
 
 class ExcelRenderer(DownloadMixin, renderers.BaseRenderer):
@@ -156,10 +278,18 @@ class ExcelRenderer(DownloadMixin, renderers.BaseRenderer):
     extension = 'xlsx'
 
     def render(self, data, media_type, renderer_context):
+        """
+        Returns the workbook as a file wrapper; `StreamingExportMixin`
+        views send it as it is read, other responses read it whole
+        """
         self.update_download_headers(renderer_context)
         result_key = data.get('results', None)
         if isinstance(result_key, (list, )):
-            return _write_excel_file(data)
+            view = renderer_context.get('view')
+            fields = None
+            if hasattr(view, 'get_serializer'):
+                fields = view.get_serializer().fields
+            return _write_excel_file(data, fields)
 
         # For now we will just support list endpoints.
         renderer_context['response'].status_code = \
@@ -1,40 +1,304 @@
+import re
+
 import six
 
+from django.db.models import Prefetch
+from django.db.models.fields import FieldDoesNotExist
 from django.utils import timezone
 
+from rest_framework.compat import OrderedDict
+from rest_framework.exceptions import ParseError
+from rest_framework.serializers import BaseSerializer, ListSerializer
+
+
+def _select_related_path(field, attrs):
+    """
+    The `select_related` path for a source that follows `field` through
+    `attrs`; the last attribute is read off the last related record.
+    """
+    path = [field.name]
+    model = field.related_model
+    for attr in attrs[:-1]:
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            break
+        if not (field.concrete and field.is_relation) or field.many_to_many:
+            break
+        path.append(attr)
+        model = field.related_model
+    return '__'.join(path)
+
+
+def _nested_serializer(field):
+    """The serializer nested in `field`, if any"""
+    if isinstance(field, ListSerializer):
+        return field.child
+    if isinstance(field, BaseSerializer):
+        return field
+    return None
+
+
+def _add_field_requirements(needs, model, field):
+    """
+    Add what `field` reads off `model` to `needs`; returns False if that
+    can not be told.
+    """
+    attrs = field.source.split('.')
+    declared = getattr(model, 'partial_response_requirements', {})
+    if attrs[0] in declared:
+        for key, names in declared[attrs[0]].items():
+            needs[key].update(names)
+        return True
+    if attrs[0] == 'pk':
+        return True
+
+    try:
+        model_field = model._meta.get_field(attrs[0])
+    except FieldDoesNotExist:
+        return False
+
+    nested = _nested_serializer(field)
+    to_many = model_field.many_to_many or not model_field.concrete
+    if nested is not None:
+        if len(attrs) > 1 or not model_field.is_relation:
+            return False
+        if to_many:
+            # prefetched records are matched up on the reverse foreign key
+            keep = [] if model_field.many_to_many \
+                else [model_field.field.name]
+            needs['nested'][attrs[0]] = (nested.fields.values(), keep)
+        else:
+            needs['only'].add(model_field.name)
+            needs['select_related'].add(model_field.name)
+    elif to_many:
+        needs['prefetch_related'].add(attrs[0])
+    else:
+        needs['only'].add(model_field.name)
+        if len(attrs) > 1 and model_field.is_relation:
+            needs['select_related'].add(
+                _select_related_path(model_field, attrs[1:]))
+    return True
+
+
+def get_queryset_requirements(model, serializer_fields):
+    """
+    Work out what a queryset of `model` has to load to serialize
+    `serializer_fields`.
+
+    Returns a dict of the `only`, `select_related`, `prefetch_related` and
+    `extra` ( select ) names that the fields read. Nested serializers over
+    to-many relations are listed in `nested` as
+    `{relation: ( serializer fields, columns to keep )}` so that they can
+    be prefetched with a narrowed queryset of their own. Computed
+    properties declare what they read in the model's
+    `partial_response_requirements`. `None` is returned when a field reads
+    something that can not be told from its source e.g. a method field or
+    an undeclared property.
+    """
+    needs = {
+        'only': set([model._meta.pk.name]),
+        'select_related': set(),
+        'prefetch_related': set(),
+        'extra': set(),
+        'nested': {},
+    }
+    for field in serializer_fields:
+        if field.source == '*' or \
+                not _add_field_requirements(needs, model, field):
+            return None
+
+    # a relation that is traversed can not be deferred
+    needs['only'].update(
+        path.split('__')[0] for path in needs['select_related'])
+    return needs
+
+
+def _prefetch_name(lookup):
+    return getattr(lookup, 'prefetch_to', lookup).split('__')[0]
+
+
+def _nested_prefetch(queryset, name, fields, keep):
+    """
+    Prefetch `name` with a queryset narrowed to the nested `fields`,
+    starting from the queryset `queryset` already prefetches it with.
+    """
+    related = queryset.model._meta.get_field(name).related_model
+    base = related._default_manager.all()
+    for lookup in queryset._prefetch_related_lookups:
+        if getattr(lookup, 'prefetch_to', None) == name and \
+                lookup.queryset is not None:
+            base = lookup.queryset
+    return Prefetch(name, queryset=narrow_queryset(base, fields, keep))
+
+
+def narrow_queryset(queryset, serializer_fields, keep=()):
+    """
+    Load only the columns, joins, prefetches and extra selects that
+    `serializer_fields` read, plus the `keep` columns.
+
+    The joins, prefetches and extra selects that `queryset` already has
+    are dropped unless a field needs them; the ones that are kept retain
+    their original definition. The queryset is returned as is if what the
+    fields need can not be worked out.
+    """
+    needs = get_queryset_requirements(queryset.model, serializer_fields)
+    if needs is None:
+        return queryset
+
+    wanted = set(
+        _prefetch_name(lookup) for lookup in needs['prefetch_related'])
+    prefetches = [
+        lookup for lookup in queryset._prefetch_related_lookups
+        if _prefetch_name(lookup) in wanted
+    ]
+    covered = set(_prefetch_name(lookup) for lookup in prefetches)
+    prefetches.extend(sorted(
+        lookup for lookup in needs['prefetch_related']
+        if _prefetch_name(lookup) not in covered))
+    covered.update(wanted)
+    prefetches.extend(
+        _nested_prefetch(queryset, name, fields, nested_keep)
+        for name, (fields, nested_keep) in sorted(needs['nested'].items())
+        if name not in covered)
+
+    narrowed = queryset.select_related(None).prefetch_related(None).only(
+        *(needs['only'] | set(keep)))
+    if needs['select_related']:
+        narrowed = narrowed.select_related(*sorted(needs['select_related']))
+    if prefetches:
+        narrowed = narrowed.prefetch_related(*prefetches)
+    if narrowed.query.extra:
+        # the mask hides the unneeded extra selects from the SELECT clause
+        narrowed.query.set_extra_mask(
+            needs['extra'] & set(narrowed.query.extra))
+    return narrowed
+
+
+def parse_fields_param(value):
+    """
+    Parse a partial response `fields` value into an ordered
+    `{field: nested fields}` dict.
+
+    `name,facility_services(service_name,average_rating),officer_in_charge`
+    selects `name`, two keys of each facility service and the whole of
+    `officer_in_charge`; the nested fields of a field that does not list
+    any are `None` i.e. all of them. `*` selects every field of its level,
+    so `*,facility_units(name)` returns everything but trims the units.
+    """
+    tokens = re.findall(r'[^,()\s]+|[(),]', value)
+    levels = [OrderedDict()]
+    last = None
+    for token in tokens:
+        if token == '(':
+            if last is None:
+                raise ParseError(
+                    'Nested fields have to follow a field name')
+            levels[-1][last] = levels[-1][last] or OrderedDict()
+            levels.append(levels[-1][last])
+            last = None
+        elif token == ')':
+            if len(levels) == 1:
+                raise ParseError('Unbalanced parentheses in fields')
+            levels.pop()
+            last = None
+        elif token == ',':
+            last = None
+        else:
+            levels[-1].setdefault(token, None)
+            last = token
+    if len(levels) != 1:
+        raise ParseError('Unbalanced parentheses in fields')
+    return levels[0]
+
+
+def get_requested_fields(request):
+    """
+    The parsed `fields` of a GET request, or `None` if the request does
+    not ask for a partial response. Parsed once per request.
+    """
+    if getattr(request, 'method', '') != 'GET':
+        return None
+    try:
+        return request._requested_fields
+    except AttributeError:
+        pass
+
+    value = request.query_params.get('fields', None)
+    requested = parse_fields_param(value) \
+        if isinstance(value, six.string_types) and value else None
+    request._requested_fields = requested
+    return requested
+
+
+def _select_keys(value, requested):
+    """Trim dicts, or lists of them, to the requested keys"""
+    if requested is None:
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_select_keys(item, requested) for item in value]
+    if not isinstance(value, dict):
+        return value
+    return OrderedDict(
+        (key, _select_keys(item, requested.get(key)))
+        for key, item in value.items()
+        if key in requested or '*' in requested
+    )
+
 
 class PartialResponseMixin(object):
 
+    """
+    Serializes only the fields asked for in the request's ``fields`` query
+    parameter ( see `parse_fields_param` for the syntax ).
+
+    Nested serializers get the fields nested under their own name and
+    dict valued fields e.g. computed summaries are trimmed to the nested
+    keys. Unknown fields are ignored.
+    """
+
+    def _get_requested_fields(self, request):
+        requested = get_requested_fields(request)
+        names = []
+        node = self
+        while getattr(node, 'parent', None) is not None:
+            # the child of a list serializer is bound with a blank name
+            if node.field_name:
+                names.append(node.field_name)
+            node = node.parent
+        for name in reversed(names):
+            if requested is None:
+                break
+            requested = requested.get(name)
+        return requested
+
     def strip_fields(self, request, origi_fields):
         """
         Fetch a subset of fields from the serializer determined by the
         request's ``fields`` query parameter.
-
-        This is an initial implementation that does not handle:
-          - nested relationships
-          - rejection of unknown fields (currently ignoring unknown fields)
-          - wildcards
-          - e.t.c
         """
         if request is None:
             return origi_fields
 
-        request_method = ""
-
-        if hasattr(request, "method"):
-            request_method = request.method
-
-        if request_method != 'GET':
+        requested = self._get_requested_fields(request)
+        if requested is None or '*' in requested:
             return origi_fields
+        return OrderedDict(
+            (name, field) for name, field in origi_fields.items()
+            if name in requested
+        )
 
-        fields = request.query_params.get('fields', None)
-        if isinstance(fields, six.string_types) and fields:
-            fields = fields.split(',')
-            return {
-                field: origi_fields[field]
-                for field in origi_fields if field in fields
-            }
-        return origi_fields
+    def to_representation(self, instance):
+        data = super(PartialResponseMixin, self).to_representation(instance)
+        request = self.context.get('request', None)
+        requested = self._get_requested_fields(request) \
+            if request is not None else None
+        if not requested:
+            return data
+        for name, nested in requested.items():
+            if nested is not None and name in data:
+                data[name] = _select_keys(data[name], nested)
+        return data
 
 
 class AbstractFieldsMixin(PartialResponseMixin):
@@ -1,3 +1,5 @@
+from django.core.urlresolvers import reverse
+
 from rest_framework import serializers
 from rest_framework_gis.serializers import GeoModelSerializer
 from ..models import (
@@ -11,7 +13,8 @@ from ..models import (
     UserContact,
     Town,
     UserConstituency,
-    SubCounty
+    SubCounty,
+    ExportJob
 )
 from .serializer_base import AbstractFieldsMixin
 
@@ -182,3 +185,24 @@ class UserConstituencySerializer(
 
     class Meta:
         model = UserConstituency
+
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    url = serializers.CharField(
+        help_text='The list url to export together with its filters')
+    download = serializers.SerializerMethodField()
+
+    def get_download(self, obj):
+        if obj.status != ExportJob.DONE:
+            return None
+        return self.context['request'].build_absolute_uri(reverse(
+            'api:common:export_job_download', kwargs={'pk': obj.pk}))
+
+    class Meta(object):
+        model = ExportJob
+        fields = (
+            'id', 'url', 'format', 'status', 'error', 'created', 'started',
+            'finished', 'download'
+        )
+        read_only_fields = (
+            'status', 'error', 'created', 'started', 'finished')
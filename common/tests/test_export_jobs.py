@@ -0,0 +1,192 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.urlresolvers import reverse
+from django.test.utils import override_settings
+from django.utils.six import StringIO
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APITestCase
+from model_mommy import mommy
+
+from facilities.models import Facility
+
+from ..models import (
+    County,
+    ExportJob,
+    normalize_export_url,
+    run_pending_export_jobs
+)
+from .test_views import LoginMixin
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    })
+class TestExportJobs(LoginMixin, APITestCase):
+
+    def setUp(self):
+        super(TestExportJobs, self).setUp()
+        cache.clear()
+        self.facilities_url = reverse('api:facilities:facilities_read_list')
+        self.url = reverse('api:common:export_jobs_list')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super(TestExportJobs, cls).tearDownClass()
+
+    def test_normalize_export_url(self):
+        self.assertEquals(
+            '/api/facilities/?county=a&name=b',
+            normalize_export_url(
+                'http://localhost/api/facilities/'
+                '?name=b&page=3&county=a&format=csv&page_size=30'))
+        self.assertEquals(
+            '/api/facilities/', normalize_export_url('/api/facilities/'))
+
+    def test_identical_requests_share_a_job(self):
+        job, created = ExportJob.request_export(
+            self.user, self.facilities_url + '?name=a&page=2', 'csv')
+        self.assertTrue(created)
+        same_job, created = ExportJob.request_export(
+            self.user, self.facilities_url + '?page=3&name=a', 'csv')
+        self.assertFalse(created)
+        self.assertEquals(job, same_job)
+
+        _, created = ExportJob.request_export(
+            self.user, self.facilities_url + '?name=a', 'excel')
+        self.assertTrue(created)
+
+    def test_data_changes_need_a_new_export(self):
+        job, _ = ExportJob.request_export(
+            self.user, self.facilities_url, 'csv')
+        mommy.make(Facility)
+        new_job, created = ExportJob.request_export(
+            self.user, self.facilities_url, 'csv')
+        self.assertTrue(created)
+        self.assertNotEqual(job, new_job)
+
+    def test_related_changes_need_a_new_export(self):
+        facility = mommy.make(Facility)
+        job, _ = ExportJob.request_export(
+            self.user, self.facilities_url, 'csv')
+        # the owner's name is exported but the owner is not filtered on
+        facility.owner.name = 'A renamed owner'
+        facility.owner.save()
+        new_job, created = ExportJob.request_export(
+            self.user, self.facilities_url, 'csv')
+        self.assertTrue(created)
+        self.assertNotEqual(job, new_job)
+
+    def test_failed_jobs_are_not_reused(self):
+        job, _ = ExportJob.request_export(
+            self.user, self.facilities_url, 'csv')
+        job.status = ExportJob.FAILED
+        job.save()
+        _, created = ExportJob.request_export(
+            self.user, self.facilities_url, 'csv')
+        self.assertTrue(created)
+
+    def test_invalid_requests(self):
+        with self.assertRaises(ValidationError):
+            ExportJob.request_export(self.user, self.facilities_url, 'pdf')
+        with self.assertRaises(ValidationError):
+            ExportJob.request_export(self.user, '/api/no/such/url/', 'csv')
+        facility = mommy.make(Facility)
+        with self.assertRaises(ValidationError):
+            ExportJob.request_export(
+                self.user,
+                reverse(
+                    'api:facilities:facility_detail',
+                    kwargs={'pk': facility.pk}),
+                'csv')
+
+    def test_run_export(self):
+        facilities = mommy.make(Facility, _quantity=2)
+        job, _ = ExportJob.request_export(
+            self.user, self.facilities_url, 'csv')
+        self.assertEquals(1, run_pending_export_jobs())
+
+        job = ExportJob.objects.get(pk=job.pk)
+        self.assertEquals(ExportJob.DONE, job.status)
+        self.assertIsNotNone(job.finished)
+        content = job.artifact.read()
+        for facility in facilities:
+            self.assertIn(facility.name.encode('utf-8'), content)
+
+        # a job runs once
+        self.assertFalse(job.run())
+        self.assertEquals(0, run_pending_export_jobs())
+
+    def test_lists_larger_than_a_page_fail(self):
+        mommy.make(County, _quantity=3)
+        rest_framework = dict(settings.REST_FRAMEWORK, MAX_PAGINATE_BY=2)
+        with self.settings(REST_FRAMEWORK=rest_framework):
+            job, _ = ExportJob.request_export(
+                self.user, reverse('api:common:counties_list'), 'csv')
+            self.assertEquals(1, run_pending_export_jobs())
+
+        job = ExportJob.objects.get(pk=job.pk)
+        self.assertEquals(ExportJob.FAILED, job.status)
+        self.assertIn('more than 2 records', job.error)
+        self.assertFalse(job.artifact)
+
+    def test_export_api(self):
+        mommy.make(Facility)
+        response = self.client.post(
+            self.url, {'url': self.facilities_url, 'format': 'excel'})
+        self.assertEquals(201, response.status_code)
+        self.assertEquals(ExportJob.PENDING, response.data['status'])
+        self.assertIsNone(response.data['download'])
+        detail_url = reverse(
+            'api:common:export_job_detail', kwargs={'pk': response.data['id']})
+        download_url = reverse(
+            'api:common:export_job_download',
+            kwargs={'pk': response.data['id']})
+        self.assertEquals(404, self.client.get(download_url).status_code)
+
+        response = self.client.post(
+            self.url, {'url': self.facilities_url, 'format': 'excel'})
+        self.assertEquals(200, response.status_code)
+
+        out = StringIO()
+        call_command('run_export_jobs', once=True, stdout=out)
+        self.assertIn('Ran 1 export jobs', out.getvalue())
+
+        response = self.client.get(detail_url)
+        self.assertEquals(ExportJob.DONE, response.data['status'])
+        self.assertIn(download_url, response.data['download'])
+
+        response = self.client.get(download_url)
+        self.assertEquals(200, response.status_code)
+        self.assertIn('.xlsx', response['Content-Disposition'])
+        self.assertTrue(b''.join(response.streaming_content))
+
+        self.assertEquals(1, self.client.get(self.url).data['count'])
+
+    def test_jobs_are_private_to_a_scope(self):
+        job, _ = ExportJob.request_export(
+            self.user, self.facilities_url, 'csv')
+        password = 'mtihani124'
+        get_user_model().objects.create_user(
+            email='other@ehealth.or.ke', first_name='Other',
+            employee_number='9999999', password=password)
+        self.client.logout()
+        self.client.login(email='other@ehealth.or.ke', password=password)
+
+        self.assertEquals(0, self.client.get(self.url).data['count'])
+        response = self.client.get(reverse(
+            'api:common:export_job_detail', kwargs={'pk': job.pk}))
+        self.assertEquals(404, response.status_code)
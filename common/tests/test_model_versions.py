@@ -0,0 +1,63 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from model_mommy import mommy
+
+from ..models import (
+    ContactType,
+    Town,
+    bump_model_version,
+    bump_named_version,
+    get_model_version,
+    get_model_versions,
+    get_named_version,
+    get_named_versions
+)
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+})
+class TestModelVersions(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_version_is_stable_until_a_write(self):
+        version = get_model_version(ContactType)
+        self.assertEquals(version, get_model_version(ContactType))
+
+        contact_type = mommy.make(ContactType)
+        saved_version = get_model_version(ContactType)
+        self.assertNotEqual(version, saved_version)
+
+        contact_type.delete()
+        self.assertNotEqual(saved_version, get_model_version(ContactType))
+
+    def test_versions_are_per_model(self):
+        versions = get_model_versions([ContactType, Town])
+        mommy.make(Town)
+        new_versions = get_model_versions([ContactType, Town])
+        self.assertEquals(versions[ContactType], new_versions[ContactType])
+        self.assertNotEqual(versions[Town], new_versions[Town])
+
+    def test_bump_after_eviction(self):
+        bump_model_version(ContactType)
+        self.assertTrue(get_model_version(ContactType) > 0)
+
+    def test_named_versions(self):
+        version = get_named_version('scope')
+        self.assertEquals(version, get_named_version('scope'))
+        mommy.make(Town)
+        self.assertEquals(version, get_named_version('scope'))
+        bump_named_version('scope')
+        self.assertNotEqual(version, get_named_version('scope'))
+
+        versions = get_named_versions(['scope', 'other'])
+        bump_named_version('other')
+        self.assertEquals(
+            versions['scope'], get_named_versions(['scope'])['scope'])
+        self.assertNotEqual(versions['other'], get_named_version('other'))
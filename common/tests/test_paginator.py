@@ -0,0 +1,145 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from rest_framework.request import Request
+from rest_framework.test import APITestCase, APIRequestFactory
+from model_mommy import mommy
+
+from ..models import ContactType
+from ..paginator import (
+    CachedCount,
+    EstimatedCount,
+    ExactCount,
+    MflPaginationSerializer
+)
+from .test_views import LoginMixin
+
+
+class TestCursorPagination(LoginMixin, APITestCase):
+
+    def setUp(self):
+        super(TestCursorPagination, self).setUp()
+        self.url = reverse('api:common:contact_types_list')
+        now = timezone.now()
+        # the first two share a timestamp; the id breaks the tie
+        for i, minutes in enumerate([0, 0, 2, 3, 4]):
+            timestamp = now - timedelta(minutes=minutes)
+            mommy.make(
+                ContactType, name='type {}'.format(i),
+                created=timestamp, updated=timestamp)
+        self.expected_order = [
+            str(contact_type.id) for contact_type in
+            ContactType.objects.order_by('-updated', '-created', '-id')
+        ]
+
+    def _ids(self, response):
+        return [str(result['id']) for result in response.data['results']]
+
+    def test_page_number_pagination_is_the_default(self):
+        response = self.client.get(self.url)
+        self.assertEquals(200, response.status_code)
+        self.assertIn('current_page', response.data)
+
+    def test_walk_forward_and_back(self):
+        response = self.client.get(self.url + '?cursor=&page_size=2')
+        self.assertEquals(200, response.status_code)
+        self.assertEquals(5, response.data['count'])
+        self.assertNotIn('current_page', response.data)
+        self.assertIsNone(response.data['previous'])
+        self.assertEquals(self.expected_order[:2], self._ids(response))
+
+        seen = self._ids(response)
+        pages = [response]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            self.assertEquals(200, response.status_code)
+            seen.extend(self._ids(response))
+            pages.append(response)
+        self.assertEquals(self.expected_order, seen)
+        self.assertEquals(3, len(pages))
+
+        previous = self.client.get(pages[-1].data['previous'])
+        self.assertEquals(self._ids(pages[-2]), self._ids(previous))
+        first = self.client.get(previous.data['previous'])
+        self.assertEquals(self._ids(pages[0]), self._ids(first))
+        self.assertIsNone(first.data['previous'])
+
+    def test_count_can_be_turned_off(self):
+        response = self.client.get(self.url + '?cursor=&count=false')
+        self.assertEquals(200, response.status_code)
+        self.assertIsNone(response.data['count'])
+        self.assertEquals(self.expected_order, self._ids(response))
+
+    def test_cursor_respects_filters(self):
+        response = self.client.get(
+            self.url + '?cursor=&page_size=1&name=type 3')
+        self.assertEquals(1, response.data['count'])
+        self.assertIsNone(response.data['next'])
+
+    def test_invalid_cursor(self):
+        for cursor in ['garbage', 'eyJwIjogWzFdfQ==']:
+            response = self.client.get(self.url + '?cursor=' + cursor)
+            self.assertEquals(404, response.status_code)
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+})
+class TestCountStrategies(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        mommy.make(ContactType, _quantity=3)
+        self.queryset = ContactType.objects.all()
+
+    def test_exact_count(self):
+        self.assertEquals((3, False), ExactCount().count(self.queryset))
+
+    def test_estimated_count(self):
+        # small results are counted exactly
+        self.assertEquals((3, False), EstimatedCount().count(self.queryset))
+
+        class AlwaysEstimate(EstimatedCount):
+            exact_threshold = 0
+
+        count, is_estimated = AlwaysEstimate().count(self.queryset)
+        self.assertTrue(is_estimated)
+        self.assertIsInstance(count, int)
+
+        # filtered querysets are always counted exactly
+        contact_type = ContactType.objects.first()
+        self.assertEquals(
+            (1, False),
+            AlwaysEstimate().count(
+                self.queryset.filter(name=contact_type.name)))
+
+    def test_cached_count(self):
+        counter = CachedCount()
+        self.assertEquals((3, False), counter.count(self.queryset))
+        with self.assertNumQueries(0):
+            self.assertEquals((3, False), counter.count(self.queryset))
+
+        # a write to the table invalidates the cached count
+        contact_type = mommy.make(ContactType)
+        self.assertEquals((4, False), counter.count(self.queryset))
+        self.assertEquals(
+            (1, False),
+            counter.count(self.queryset.filter(name=contact_type.name)))
+
+    def test_response_reports_estimates(self):
+        class View(object):
+            count_strategy = EstimatedCount
+
+        paginator = MflPaginationSerializer()
+        request = Request(APIRequestFactory().get('/'))
+        paginator.paginate_queryset(self.queryset, request, View())
+        response = paginator.get_paginated_response([])
+        self.assertEquals(3, response.data['count'])
+        self.assertFalse(response.data['count_is_estimated'])
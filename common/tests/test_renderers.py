@@ -1,3 +1,6 @@
+import io
+import zipfile
+
 from django.core.urlresolvers import reverse
 
 from rest_framework.test import APITestCase
@@ -5,8 +8,11 @@ from model_mommy import mommy
 
 
 from common.models import County
+from common.renderers import stream_csv_rows
 from common.renderers.excel_renderer import (
-    _write_excel_file, sanitize_field_names, _build_name_from_list)
+    _write_excel_file, sanitize_field_names, _build_name_from_list,
+    plan_columns)
+from facilities.models import Facility
 from .test_views import LoginMixin
 
 
@@ -90,6 +96,54 @@ class TestExcelRenderer(LoginMixin, APITestCase):
 
         _write_excel_file(data)
 
+    def test_plan_columns(self):
+        records = [
+            {
+                "id": "39f97a13-4f3f-45a3-a411-970e496526cd",
+                "name": "Kenyatta",
+                "ward": "39f97a13-4f3f-45a3-a411-970e496526cd",
+                "regulatory_status_name": None,
+                "number_of_beds": 3,
+                "is_published": True,
+                "facility_services": []
+            }
+        ]
+        columns = plan_columns(records)
+        self.assertEquals(
+            ["name", "regulatory_status_name", "number_of_beds",
+             "is_published", "facility_services"],
+            [column.key for column in columns])
+        self.assertEquals(
+            ["Name", "Regulatory status", "Number_of_beds", "Published",
+             "Facility_services"],
+            [column.title for column in columns])
+        self.assertEquals(
+            [False, False, False, False, True],
+            [column.nested for column in columns])
+
+    def test_nested_lists_go_to_their_own_sheet(self):
+        data = {
+            "results": [
+                {
+                    "name": "Kenyatta",
+                    "services": [
+                        {"service_name": "Dental"},
+                        {"service_name": "Maternity"}
+                    ]
+                },
+                {
+                    "name": "Mbagathi",
+                    "services": []
+                }
+            ]
+        }
+        workbook = zipfile.ZipFile(
+            io.BytesIO(b''.join(_write_excel_file(data))))
+        services_sheet = workbook.read('xl/worksheets/sheet2.xml')
+        self.assertIn(b'Dental', services_sheet)
+        self.assertIn(b'Maternity', services_sheet)
+        self.assertIn(b'Kenyatta', workbook.read('xl/worksheets/sheet1.xml'))
+
     def test_sanitize_field_names(self):
 
         sample_list = ['regulatory_status_name']
@@ -135,3 +189,74 @@ class TestCsvRenderer(LoginMixin, APITestCase):
         mommy.make(County)
         response = self.client.get(excel_url)
         self.assertEquals(200, response.status_code)
+
+
+class TestStreamingCsv(LoginMixin, APITestCase):
+
+    def test_stream_csv_rows(self):
+        chunks = [
+            [{'name': 'a', 'ward': {'code': 1}, 'beds': None}],
+            [{'name': u'é', 'ward': {'code': 2}, 'beds': 3}]
+        ]
+        lines = list(stream_csv_rows(iter(chunks)))
+        self.assertEquals(
+            ['beds,name,ward.code\r\n', ',a,1\r\n', '3,\xc3\xa9,2\r\n'],
+            lines)
+
+    def test_stream_csv_rows_without_records(self):
+        self.assertEquals([], list(stream_csv_rows(iter([]))))
+
+    def test_stream_facilities(self):
+        facilities = mommy.make(Facility, _quantity=3)
+        url = reverse('api:facilities:facilities_read_list')
+
+        response = self.client.get(url + '?format=csv&stream=true')
+        self.assertEquals(200, response.status_code)
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment;', response['Content-Disposition'])
+
+        lines = b''.join(response.streaming_content).splitlines()
+        self.assertEquals(4, len(lines))
+        self.assertIn(b'code', lines[0])
+        for facility in facilities:
+            self.assertIn(
+                facility.name.encode('utf-8'), b''.join(lines[1:]))
+
+    def test_stream_facilities_to_excel(self):
+        facilities = mommy.make(Facility, _quantity=3)
+        url = reverse('api:facilities:facilities_read_list')
+
+        response = self.client.get(url + '?format=excel&stream=true')
+        self.assertEquals(200, response.status_code)
+        self.assertTrue(response.streaming)
+        self.assertIn('.xlsx', response['Content-Disposition'])
+
+        workbook = zipfile.ZipFile(
+            io.BytesIO(b''.join(response.streaming_content)))
+        sheet = workbook.read('xl/worksheets/sheet1.xml')
+        for facility in facilities:
+            self.assertIn(facility.name.encode('utf-8'), sheet)
+
+    def test_excel_pages_are_streamed(self):
+        facilities = mommy.make(Facility, _quantity=3)
+        url = reverse('api:facilities:facilities_read_list')
+
+        response = self.client.get(url + '?format=excel&page_size=2')
+        self.assertEquals(200, response.status_code)
+        self.assertTrue(response.streaming)
+        self.assertIn('.xlsx', response['Content-Disposition'])
+
+        workbook = zipfile.ZipFile(
+            io.BytesIO(b''.join(response.streaming_content)))
+        sheet = workbook.read('xl/worksheets/sheet1.xml')
+        names = [
+            facility.name for facility in facilities
+            if facility.name.encode('utf-8') in sheet]
+        self.assertEquals(2, len(names))
+
+    def test_stream_needs_csv_format(self):
+        mommy.make(Facility)
+        url = reverse('api:facilities:facilities_read_list')
+        response = self.client.get(url + '?stream=true')
+        self.assertEquals(200, response.status_code)
+        self.assertFalse(response.streaming)
@@ -0,0 +1,50 @@
+from django.test import TestCase
+
+from rest_framework.compat import OrderedDict
+from rest_framework.exceptions import ParseError
+
+from ..serializers.serializer_base import _select_keys, parse_fields_param
+
+
+class TestParseFieldsParam(TestCase):
+
+    def test_flat_fields(self):
+        self.assertEquals(
+            OrderedDict([('id', None), ('name', None)]),
+            parse_fields_param('id, name'))
+
+    def test_nested_fields(self):
+        self.assertEquals(
+            OrderedDict([
+                ('name', None),
+                ('facility_services', OrderedDict([
+                    ('service_name', None), ('average_rating', None)
+                ])),
+                ('officer_in_charge', OrderedDict([
+                    ('contacts', OrderedDict([('contact', None)]))
+                ])),
+            ]),
+            parse_fields_param(
+                'name,facility_services(service_name,average_rating),'
+                'officer_in_charge(contacts(contact))'))
+
+    def test_wildcards(self):
+        self.assertEquals(
+            OrderedDict([
+                ('*', None),
+                ('facility_units', OrderedDict([('*', None)]))
+            ]),
+            parse_fields_param('*,facility_units(*)'))
+
+    def test_malformed_fields(self):
+        for value in ['name(', 'name)', '(name)', 'a(b)(c)']:
+            with self.assertRaises(ParseError):
+                parse_fields_param(value)
+
+    def test_select_keys(self):
+        value = [{'name': 'a', 'contacts': [{'contact': 1, 'type': 2}]}]
+        self.assertEquals(
+            [{'contacts': [{'contact': 1}]}],
+            _select_keys(
+                value, parse_fields_param('contacts(contact)')))
+        self.assertEquals(value, _select_keys(value, None))
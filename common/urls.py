@@ -26,7 +26,10 @@ from .views import (
     UserConstituencyDetailView,
     UserConstituencyListView,
     SubCountyDetailView,
-    SubCountyListView
+    SubCountyListView,
+    ExportJobListView,
+    ExportJobDetailView,
+    ExportJobDownloadView
 )
 
 
@@ -109,4 +112,11 @@ urlpatterns = patterns(
 
     url(r'^filtering_summaries/$',
         FilteringSummariesView.as_view(), name="filtering_summaries"),
+
+    url(r'^export_jobs/$', ExportJobListView.as_view(),
+        name='export_jobs_list'),
+    url(r'^export_jobs/(?P<pk>[^/]+)/$', ExportJobDetailView.as_view(),
+        name='export_job_detail'),
+    url(r'^export_jobs/(?P<pk>[^/]+)/download/$',
+        ExportJobDownloadView.as_view(), name='export_job_download'),
 )
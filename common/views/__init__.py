@@ -1,2 +1,3 @@
 from .app_views import *  # NOQA
 from .shared_views import *  # NOQA
+from .export_views import *  # NOQA
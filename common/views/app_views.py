@@ -25,6 +25,7 @@ from facilities.models import(
     Service,
     KephLevel
 )
+from users.middleware import get_request_scope
 from ..serializers import (
     ContactSerializer,
     CountySerializer,
@@ -64,19 +65,19 @@ from ..utilities import CustomRetrieveUpdateDestroyView
 
 class FilterAdminUnitsMixin(object):
     def get_queryset(self, *args, **kwargs):
-        user = self.request.user
-        if (user.county and hasattr(
+        scope = get_request_scope(self.request)
+        if (scope.county and hasattr(
                 self.queryset.model, 'county') and not
-                user.is_national and not
+                scope.is_national and not
                 hasattr(self.queryset.model, 'constituency')):
-            return self.queryset.filter(county=user.county)
-        elif (user.constituency and hasattr(
-                self.queryset.model, 'constituency')and not user.is_national):
-            return self.queryset.filter(constituency=user.constituency)
-        elif (user.county and hasattr(
+            return self.queryset.filter(county=scope.county)
+        elif (scope.constituency and hasattr(
+                self.queryset.model, 'constituency')and not scope.is_national):
+            return self.queryset.filter(constituency=scope.constituency)
+        elif (scope.county and hasattr(
                 self.queryset.model, 'constituency') and not
-                user.is_national and hasattr(self.queryset.model, 'county')):
-            return self.queryset.filter(constituency__county=user.county)
+                scope.is_national and hasattr(self.queryset.model, 'county')):
+            return self.queryset.filter(constituency__county=scope.county)
         else:
             return self.queryset
 
@@ -0,0 +1,72 @@
+from django.http import FileResponse
+
+from rest_framework import generics, status
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from ..models import ExportJob, get_user_scope_key
+from ..renderers import ExcelRenderer
+from ..serializers import ExportJobSerializer
+
+
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'excel': ExcelRenderer.media_type,
+}
+
+
+class ExportJobScopeMixin(object):
+    """Users only see the exports made within their own scope"""
+    queryset = ExportJob.objects.all()
+    serializer_class = ExportJobSerializer
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        return self.queryset.filter(
+            scope=get_user_scope_key(self.request.user))
+
+
+class ExportJobListView(ExportJobScopeMixin, generics.ListCreateAPIView):
+    """
+    Lists export jobs and requests new ones.
+
+    Exports run in the background ( see the `run_export_jobs` command ).
+    Poll the job until its status is DONE then fetch `download`.
+    Requesting an export that matches an existing job returns that job
+    until the exported data changes.
+
+    url -- The list url to export together with its filters
+    format -- `csv` or `excel`
+    """
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job, created = ExportJob.request_export(
+            request.user, serializer.validated_data['url'],
+            serializer.validated_data['format'])
+        return Response(
+            self.get_serializer(job).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+
+class ExportJobDetailView(ExportJobScopeMixin, generics.RetrieveAPIView):
+    """Retrieves an export job"""
+
+
+class ExportJobDownloadView(ExportJobScopeMixin, generics.RetrieveAPIView):
+    """Downloads the artifact of a finished export job"""
+
+    def retrieve(self, request, *args, **kwargs):
+        job = self.get_object()
+        if job.status != ExportJob.DONE:
+            raise NotFound('The export is not ready')
+
+        artifact = job.artifact.storage.open(job.artifact.name, 'rb')
+        response = FileResponse(
+            artifact, content_type=EXPORT_CONTENT_TYPES[job.format])
+        response['Content-Disposition'] = \
+            'attachment; filename="export.{}"'.format(
+                job.artifact.name.rsplit('.', 1)[-1])
+        return response
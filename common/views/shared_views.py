@@ -1,7 +1,11 @@
 import logging
+import tempfile
+from wsgiref.util import FileWrapper
+
 import reversion
 
 from django.core.exceptions import FieldDoesNotExist
+from django.http import StreamingHttpResponse
 from django.shortcuts import redirect
 
 from rest_framework.views import APIView
@@ -10,10 +14,125 @@ from rest_framework.mixins import RetrieveModelMixin
 
 from facilities.filters import facility_filters
 
+from ..constants import TRUTH_NESS
+from ..paginator import get_keyset_fields, iterate_in_keyset_chunks
+from ..renderers import (
+    ExcelRenderer, stream_csv_rows, write_excel_workbook)
+from ..serializers import narrow_queryset
+
 
 LOGGER = logging.getLogger(__name__)
 
 
+class PartialResponseQuerysetMixin(object):
+    """
+    Pushes a `?fields=` partial response down to the listing query.
+
+    Only the columns, joins, prefetches and extra selects that the
+    requested serializer fields read are loaded, so asking for plain
+    columns turns into a scan of the one table; nested serializers are
+    prefetched with querysets narrowed to their nested fields. The keyset
+    columns are always loaded since the cursor pagination and the
+    streamed exports read them off the records.
+    """
+    partial_response_query_param = 'fields'
+
+    def filter_queryset(self, queryset):
+        queryset = super(PartialResponseQuerysetMixin, self).filter_queryset(
+            queryset)
+        if self.request.method != 'GET' or not self.request.query_params.get(
+                self.partial_response_query_param):
+            return queryset
+        return narrow_queryset(
+            queryset, self.get_serializer().fields.values(),
+            keep=[field.name for field in get_keyset_fields(queryset.model)])
+
+
+class StreamingExportMixin(object):
+    """
+    Streams the whole filtered listing on `?stream=true` when the format
+    is `csv` or `excel`.
+
+    Pagination is bypassed; the queryset is read in keyset chunks of
+    `stream_chunk_size` records that are serialized with the view's
+    serializer and written out as they are produced, so memory use does
+    not grow with the size of the export. Paginated excel responses are
+    streamed from the workbook's temp file too.
+    """
+    stream_query_param = 'stream'
+    stream_chunk_size = 1000
+
+    def _wants_stream(self, request):
+        return (
+            request.accepted_renderer.format in ('csv', 'excel') and
+            request.query_params.get(self.stream_query_param) in TRUTH_NESS
+        )
+
+    def _serialized_chunks(self, queryset):
+        for chunk in iterate_in_keyset_chunks(
+                queryset, self.stream_chunk_size):
+            yield self.get_serializer(chunk, many=True).data
+
+    def _stream_csv(self, queryset):
+        return StreamingHttpResponse(
+            stream_csv_rows(self._serialized_chunks(queryset)),
+            content_type='text/csv')
+
+    def _stream_excel(self, queryset):
+        # the workbook is assembled in an anonymous temp file that goes
+        # away once the response has been sent
+        output = tempfile.TemporaryFile()
+        write_excel_workbook(
+            self._serialized_chunks(queryset), output,
+            fields=self.get_serializer().fields)
+        output.seek(0)
+        return StreamingHttpResponse(
+            FileWrapper(output), content_type=ExcelRenderer.media_type)
+
+    def _stream_rendered_excel(self, response):
+        # the renderer sets its headers on `self.response`
+        self.response = response
+        response.renderer_context['response'] = response
+        output = response.accepted_renderer.render(
+            response.data, response.accepted_media_type,
+            response.renderer_context)
+        if not isinstance(output, FileWrapper):
+            # e.g. the error of a response that is not a listing
+            return response
+
+        streaming = StreamingHttpResponse(
+            output, content_type=ExcelRenderer.media_type,
+            status=response.status_code)
+        for header, value in response.items():
+            if header.lower() != 'content-type':
+                streaming[header] = value
+        return streaming
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super(StreamingExportMixin, self).finalize_response(
+            request, response, *args, **kwargs)
+        if isinstance(response, Response) and response.status_code == 200 \
+                and isinstance(response.accepted_renderer, ExcelRenderer):
+            return self._stream_rendered_excel(response)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        if not self._wants_stream(request):
+            return super(StreamingExportMixin, self).list(
+                request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        renderer = request.accepted_renderer
+        if renderer.format == 'csv':
+            response = self._stream_csv(queryset)
+        else:
+            response = self._stream_excel(queryset)
+        response['Content-Disposition'] = \
+            'attachment; filename="{}.{}"'.format(
+                self.get_view_name() or 'download', renderer.extension)
+        return response
+
+
 class AuditableDetailViewMixin(RetrieveModelMixin):
 
     def _resolve_field(self, field, version):
@@ -1,4 +1,4 @@
-from django.db.models import Q
+from django.db.models import Q, Count
 
 from distutils.util import strtobool
 import django_filters
@@ -33,12 +33,15 @@ from ..models import (
     FacilityUpdates,
     KephLevel,
     OptionGroup,
-    FacilityLevelChangeReason
+    FacilityLevelChangeReason,
+    FacilitySummary
 )
 from common.filters.filter_shared import (
     CommonFieldsFilterset,
     ListIntegerFilter,
-    ListCharFilter
+    ListCharFilter,
+    ListUUIDFilter,
+    IsoDateTimeFilter
 )
 
 from common.constants import BOOLEAN_CHOICES, TRUTH_NESS
@@ -260,23 +263,29 @@ class FacilityContactFilter(CommonFieldsFilterset):
 
 
 class FacilityFilter(CommonFieldsFilterset):
-    def service_filter(self, value):
-        categories = value.split(',')
-        facility_ids = []
-        cat_len = len(categories)
-
-        for facility in Facility.objects.all():
-            cats_seen = []
-            for cat in categories:
-                service_count = FacilityService.objects.filter(
-                    service__category=cat,
-                    facility=facility).count()
-                if service_count > 0:
-                    cats_seen.append(cat)
-            if len(cats_seen) == cat_len:
-                facility_ids.append(facility.id)
-
-        return Facility.objects.filter(id__in=facility_ids)
+    def service_filter(self, queryset, value):
+        """
+        Facilities offering services in the requested categories.
+
+        By default a facility has to offer services in *all* the categories
+        (relational division); pass `service_category_mode=any` to match
+        facilities offering services in at least one of them.
+        """
+        categories = set(cat for cat in value.split(',') if cat)
+        if not categories:
+            return queryset
+
+        facility_services = FacilityService.objects.filter(
+            service__category__in=categories).order_by()
+        mode = self.data.get('service_category_mode', 'all')
+        if mode == 'any':
+            return queryset.filter(
+                id__in=facility_services.values('facility'))
+
+        matching_facilities = facility_services.values('facility').annotate(
+            categories_seen=Count('service__category', distinct=True)
+        ).filter(categories_seen=len(categories)).values('facility')
+        return queryset.filter(id__in=matching_facilities)
 
     def filter_approved_facilities(self, value):
         approved_facilities = [
@@ -298,16 +307,16 @@ class FacilityFilter(CommonFieldsFilterset):
                 Q(rejected=True) |
                 Q(has_edits=False) & Q(approved=True))
 
-    id = ListCharFilter(lookup_type='icontains')
+    id = ListUUIDFilter(lookup_type='exact')
     name = django_filters.CharFilter(lookup_type='icontains')
     code = ListIntegerFilter(lookup_type='exact')
     description = ListCharFilter(lookup_type='icontains')
 
-    facility_type = ListCharFilter(lookup_type='icontains')
-    keph_level = ListCharFilter(lookup_type='exact')
-    operation_status = ListCharFilter(lookup_type='icontains')
-    ward = ListCharFilter(lookup_type='icontains')
-    sub_county = ListCharFilter(lookup_type='exact')
+    facility_type = ListUUIDFilter(lookup_type='exact')
+    keph_level = ListUUIDFilter(lookup_type='exact')
+    operation_status = ListUUIDFilter(lookup_type='exact')
+    ward = ListUUIDFilter(lookup_type='exact')
+    sub_county = ListUUIDFilter(lookup_type='exact')
     sub_county_code = ListCharFilter(
         name="sub_county__code", lookup_type='exact')
     ward_code = ListCharFilter(name="ward__code", lookup_type='icontains')
@@ -316,13 +325,16 @@ class FacilityFilter(CommonFieldsFilterset):
         lookup_type='icontains')
     constituency_code = ListCharFilter(
         name='ward__constituency__code', lookup_type='icontains')
-    county = ListCharFilter(
-        name='ward__constituency__county',
-        lookup_type='icontains')
-    constituency = ListCharFilter(
-        name='ward__constituency', lookup_type='icontains')
-    owner = ListCharFilter(lookup_type='icontains')
-    owner_type = ListCharFilter(name='owner__owner_type', lookup_type='exact')
+    county = ListUUIDFilter(
+        name='ward__constituency__county', lookup_type='exact',
+        param_name='county')
+    constituency = ListUUIDFilter(
+        name='ward__constituency', lookup_type='exact',
+        param_name='constituency')
+    owner = ListUUIDFilter(lookup_type='exact')
+    owner_type = ListUUIDFilter(
+        name='owner__owner_type', lookup_type='exact',
+        param_name='owner_type')
     officer_in_charge = ListCharFilter(lookup_type='icontains')
     number_of_beds = ListIntegerFilter(lookup_type='exact')
     number_of_cots = ListIntegerFilter(lookup_type='exact')
@@ -347,7 +359,7 @@ class FacilityFilter(CommonFieldsFilterset):
     is_approved = django_filters.MethodFilter(
         action=filter_approved_facilities)
     service_category = django_filters.MethodFilter(
-        action=service_filter)
+        action='service_filter')
     has_edits = django_filters.TypedChoiceFilter(
         choices=BOOLEAN_CHOICES,
         coerce=strtobool)
@@ -382,3 +394,64 @@ class FacilityUnitRegulationFilter(CommonFieldsFilterset):
 
     class Meta(object):
         model = FacilityUnitRegulation
+
+
+class FacilitySummaryFilter(django_filters.FilterSet):
+    def service_filter(self, queryset, value):
+        """
+        Summaries of facilities offering services in the requested categories
+
+        Mirrors `FacilityFilter.service_filter` using the array of categories
+        held on the summary row.
+        """
+        categories = sorted(set(cat for cat in value.split(',') if cat))
+        if not categories:
+            return queryset
+
+        mode = self.data.get('service_category_mode', 'all')
+        if mode == 'any':
+            return queryset.filter(service_categories__overlap=categories)
+        return queryset.filter(service_categories__contains=categories)
+
+    id = ListUUIDFilter(
+        name='facility', lookup_type='exact', param_name='id')
+    name = django_filters.CharFilter(lookup_type='icontains')
+    code = ListIntegerFilter(lookup_type='exact')
+    county = ListUUIDFilter(lookup_type='exact')
+    constituency = ListUUIDFilter(lookup_type='exact')
+    ward = ListUUIDFilter(lookup_type='exact')
+    owner = ListUUIDFilter(lookup_type='exact')
+    owner_type = ListUUIDFilter(lookup_type='exact')
+    facility_type = ListUUIDFilter(lookup_type='exact')
+    keph_level = ListUUIDFilter(lookup_type='exact')
+    operation_status = ListUUIDFilter(lookup_type='exact')
+    regulatory_body = ListUUIDFilter(lookup_type='exact')
+    number_of_beds = ListIntegerFilter(lookup_type='exact')
+    number_of_cots = ListIntegerFilter(lookup_type='exact')
+    service_category = django_filters.MethodFilter(action='service_filter')
+
+    is_approved = django_filters.TypedChoiceFilter(
+        choices=BOOLEAN_CHOICES, coerce=strtobool)
+    approved = django_filters.TypedChoiceFilter(
+        choices=BOOLEAN_CHOICES, coerce=strtobool)
+    rejected = django_filters.TypedChoiceFilter(
+        choices=BOOLEAN_CHOICES, coerce=strtobool)
+    regulated = django_filters.TypedChoiceFilter(
+        choices=BOOLEAN_CHOICES, coerce=strtobool)
+    has_edits = django_filters.TypedChoiceFilter(
+        choices=BOOLEAN_CHOICES, coerce=strtobool)
+    is_published = django_filters.TypedChoiceFilter(
+        choices=BOOLEAN_CHOICES, coerce=strtobool)
+    is_classified = django_filters.TypedChoiceFilter(
+        choices=BOOLEAN_CHOICES, coerce=strtobool)
+    closed = django_filters.TypedChoiceFilter(
+        choices=BOOLEAN_CHOICES, coerce=strtobool)
+
+    updated_before = IsoDateTimeFilter(name='updated', lookup_type='lte')
+    updated_after = IsoDateTimeFilter(name='updated', lookup_type='gte')
+    created_before = IsoDateTimeFilter(name='created', lookup_type='lte')
+    created_after = IsoDateTimeFilter(name='created', lookup_type='gte')
+
+    class Meta:
+        model = FacilitySummary
+        fields = ()
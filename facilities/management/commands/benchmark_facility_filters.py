@@ -0,0 +1,79 @@
+import copy
+import uuid
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+
+from facilities.filters import FacilityFilter
+from facilities.models import Facility
+
+
+ID_FILTERS = (
+    'id', 'ward', 'constituency', 'county', 'owner', 'owner_type',
+    'facility_type', 'operation_status', 'keph_level', 'sub_county',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Prints the query plans of the facility listing id filters; '
+        'use --facilities to run them against a larger ( throw away ) '
+        'data set'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--facilities',
+            type=int,
+            dest='facilities',
+            default=0,
+            help='The number of facilities to add, copied off the existing '
+                 'ones; they are rolled back once the plans are printed')
+
+    def _add_facilities(self, total, batch_size=1000):
+        templates = list(Facility.objects.all()[:100])
+        if not templates:
+            raise CommandError(
+                'There are no facilities to copy; load some data first')
+        next_code = Facility.objects.aggregate(Max('code'))['code__max']
+        batch = []
+        for i in range(total):
+            facility = copy.copy(templates[i % len(templates)])
+            facility.id = uuid.uuid4()
+            facility.code = next_code + i + 1
+            batch.append(facility)
+            if len(batch) == batch_size:
+                Facility.objects.bulk_create(batch)
+                batch = []
+        Facility.objects.bulk_create(batch)
+
+    def _explain(self, cursor, name):
+        path = FacilityFilter.base_filters[name].name
+        value = Facility.objects.exclude(**{path: None}).values_list(
+            path, flat=True).first()
+        if value is None:
+            self.stdout.write('{}: no data to filter by'.format(name))
+            return
+
+        queryset = FacilityFilter(
+            {name: str(value)}, queryset=Facility.objects.all()).qs
+        sql, params = queryset.query.sql_with_params()
+        cursor.execute('EXPLAIN ANALYZE ' + sql, params)
+        self.stdout.write('?{}={}'.format(name, value))
+        for row in cursor.fetchall():
+            self.stdout.write('    ' + row[0])
+        self.stdout.write('')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['facilities']:
+                self._add_facilities(options['facilities'])
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE facilities_facility')
+                self.stdout.write(
+                    'Facilities: {}\n'.format(Facility.objects.count()))
+                for name in ID_FILTERS:
+                    self._explain(cursor, name)
+            # the added facilities are only there for the plans
+            transaction.set_rollback(True)
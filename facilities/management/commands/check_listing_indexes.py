@@ -0,0 +1,81 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from django.core.urlresolvers import reverse
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.test import APIClient
+
+
+# ( url name, query string, table, the index the listing should read )
+CHECKED_LISTINGS = (
+    ('api:facilities:facilities_list', '',
+     'facilities_facility', 'facilities_facility_listing_idx'),
+    ('api:facilities:facilities_list', '?cursor=',
+     'facilities_facility', 'facilities_facility_listing_idx'),
+    ('api:facilities:facility_approvals_list', '',
+     'facilities_facilityapproval', 'facilities_facilityapproval_listing_idx'),
+    ('api:facilities:facility_services_list', '',
+     'facilities_facilityservice', 'facilities_facilityservice_listing_idx'),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Checks that the facility listings read their tables through the '
+        'listing indexes instead of scanning them'
+    )
+
+    def _get_plans(self, client, path, table):
+        """EXPLAIN the queries that a GET of `path` runs against `table`"""
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                # the plans should not depend on how much data there is
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.get(path)
+                if response.status_code != 200:
+                    raise CommandError('{} returned {}'.format(
+                        path, response.status_code))
+
+                plans = []
+                for query in queries:
+                    sql = query['sql']
+                    if sql.startswith('SELECT') and \
+                            'FROM "{}"'.format(table) in sql:
+                        cursor.execute('EXPLAIN ' + sql)
+                        plans.append(
+                            '\n'.join(row[0] for row in cursor.fetchall()))
+            transaction.set_rollback(True)
+        return plans
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.filter(
+            is_superuser=True, is_active=True).first()
+        if user is None:
+            raise CommandError('The check needs an active superuser')
+        client = APIClient()
+        client.force_authenticate(user)
+
+        failures = 0
+        for name, query, table, index in CHECKED_LISTINGS:
+            path = reverse(name) + query
+            plans = self._get_plans(client, path, table)
+            seq_scan = re.compile(r'Seq Scan on {}\b'.format(table))
+            if any(seq_scan.search(plan) for plan in plans) or \
+                    not any(index in plan for plan in plans):
+                failures += 1
+                self.stdout.write(
+                    '{} does not read {} through {}'.format(
+                        path, table, index))
+                for plan in plans:
+                    self.stdout.write(plan)
+            else:
+                self.stdout.write('{} uses {}'.format(path, index))
+
+        if failures:
+            raise CommandError(
+                '{} of {} listings scan their tables'.format(
+                    failures, len(CHECKED_LISTINGS)))
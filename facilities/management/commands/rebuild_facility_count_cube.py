@@ -0,0 +1,11 @@
+from django.core.management import BaseCommand
+
+from facilities.models import rebuild_facility_count_cube
+
+
+class Command(BaseCommand):
+    help = 'Recreates the facility count cube from the facilities'
+
+    def handle(self, *args, **options):
+        total = rebuild_facility_count_cube()
+        self.stdout.write("Built {} cube rows".format(total))
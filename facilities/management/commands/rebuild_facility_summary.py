@@ -0,0 +1,19 @@
+from django.core.management import BaseCommand
+
+from facilities.models import rebuild_facility_summaries
+
+
+class Command(BaseCommand):
+    help = 'Recreates the denormalized facility summary table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            dest='chunk_size',
+            default=500,
+            help='The number of facilities to summarize per query')
+
+    def handle(self, *args, **options):
+        total = rebuild_facility_summaries(chunk_size=options['chunk_size'])
+        self.stdout.write("Summarized {} facilities".format(total))
@@ -0,0 +1,11 @@
+from django.core.management import BaseCommand
+
+from facilities.models import snapshot_facility_stats
+
+
+class Command(BaseCommand):
+    help = "Stores today's facility counts for the trend reports"
+
+    def handle(self, *args, **options):
+        total = snapshot_facility_stats()
+        self.stdout.write("Stored {} snapshot rows".format(total))
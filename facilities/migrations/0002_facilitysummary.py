@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+import django.contrib.postgres.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', 'admin_unit_codes'),
+        ('facilities', '0001_auto_20150831_1330'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacilitySummary',
+            fields=[
+                ('facility', models.OneToOneField(related_name='summary', primary_key=True, serialize=False, to='facilities.Facility')),
+                ('name', models.CharField(max_length=100)),
+                ('official_name', models.CharField(max_length=150, null=True, blank=True)),
+                ('code', models.IntegerField(null=True, blank=True)),
+                ('number_of_beds', models.PositiveIntegerField(default=0)),
+                ('number_of_cots', models.PositiveIntegerField(default=0)),
+                ('county_name', models.CharField(max_length=100, null=True, blank=True)),
+                ('constituency_name', models.CharField(max_length=100, null=True, blank=True)),
+                ('ward_name', models.CharField(max_length=100, null=True, blank=True)),
+                ('owner_name', models.CharField(max_length=100, null=True, blank=True)),
+                ('owner_type_name', models.CharField(max_length=100, null=True, blank=True)),
+                ('facility_type_name', models.CharField(max_length=100, null=True, blank=True)),
+                ('keph_level_name', models.CharField(max_length=30, null=True, blank=True)),
+                ('operation_status_name', models.CharField(max_length=100, null=True, blank=True)),
+                ('regulatory_status_name', models.CharField(max_length=100, null=True, blank=True)),
+                ('is_approved', models.BooleanField(default=False)),
+                ('approved', models.BooleanField(default=False)),
+                ('rejected', models.BooleanField(default=False)),
+                ('regulated', models.BooleanField(default=False)),
+                ('has_edits', models.BooleanField(default=False)),
+                ('is_published', models.BooleanField(default=False)),
+                ('is_classified', models.BooleanField(default=False)),
+                ('closed', models.BooleanField(default=False)),
+                ('average_rating', models.FloatField(default=0)),
+                ('service_categories', django.contrib.postgres.fields.ArrayField(default=list, help_text=b'The categories of the services offered by the facility', base_field=models.UUIDField(), size=None, blank=True)),
+                ('created', models.DateTimeField()),
+                ('updated', models.DateTimeField()),
+                ('constituency', models.ForeignKey(related_name='+', to='common.Constituency', null=True)),
+                ('county', models.ForeignKey(related_name='+', to='common.County', null=True)),
+                ('facility_type', models.ForeignKey(related_name='+', to='facilities.FacilityType', null=True)),
+                ('keph_level', models.ForeignKey(related_name='+', to='facilities.KephLevel', null=True)),
+                ('operation_status', models.ForeignKey(related_name='+', to='facilities.FacilityStatus', null=True)),
+                ('owner', models.ForeignKey(related_name='+', to='facilities.Owner', null=True)),
+                ('owner_type', models.ForeignKey(related_name='+', to='facilities.OwnerType', null=True)),
+                ('regulatory_body', models.ForeignKey(related_name='+', to='facilities.RegulatingBody', null=True)),
+                ('ward', models.ForeignKey(related_name='+', to='common.Ward', null=True)),
+            ],
+            options={
+                'ordering': ('-updated', '-created'),
+                'default_permissions': ('add', 'change', 'delete', 'view'),
+                'verbose_name_plural': 'facility summaries',
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+# ( index, table, columns ); every index only covers the rows the default
+# managers return i.e. `deleted = false`
+LISTING_INDEXES = (
+    # the default ( -updated, -created ) and keyset orderings
+    ('facilities_facility_listing_idx', 'facilities_facility',
+     'updated DESC, created DESC, id DESC'),
+    ('facilities_facility_ward_listing_idx', 'facilities_facility',
+     'ward_id, updated DESC, created DESC'),
+    # the visibility and approval flags
+    ('facilities_facility_flags_idx', 'facilities_facility',
+     'is_published, approved, rejected, closed, has_edits'),
+    ('facilities_facilityapproval_listing_idx',
+     'facilities_facilityapproval', 'updated DESC, created DESC, id DESC'),
+    ('facilities_facilityapproval_facility_idx',
+     'facilities_facilityapproval', 'facility_id, is_cancelled'),
+    ('facilities_facilityservice_listing_idx',
+     'facilities_facilityservice', 'updated DESC, created DESC, id DESC'),
+    ('facilities_facilityservice_facility_idx',
+     'facilities_facilityservice', 'facility_id, is_cancelled'),
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('facilities', '0002_facilitysummary'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX {} ON {} ({}) WHERE deleted = false'.format(
+                index, table, columns),
+            'DROP INDEX IF EXISTS {}'.format(index)
+        )
+        for index, table, columns in LISTING_INDEXES
+    ]
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import hashlib
+import uuid
+
+from django.db import models, migrations
+from django.db.models import Count, Sum
+from django.utils import encoding
+
+
+# The cube key and derived fields as they were when the cube was added;
+# the models may change after this migration
+CUBE_KEY_FIELDS = (
+    'ward_id', 'facility_type_id', 'keph_level_id', 'owner_id',
+    'operation_status_id', 'regulated', 'is_published', 'approved',
+    'closed', 'rejected', 'is_classified',
+)
+
+CUBE_DERIVED_FIELDS = (
+    ('constituency_id', 'ward__constituency'),
+    ('county_id', 'ward__constituency__county'),
+    ('owner_type_id', 'owner__owner_type'),
+)
+
+
+def _get_cube_key(values):
+    parts = []
+    for field in CUBE_KEY_FIELDS:
+        value = values[field]
+        if value is None:
+            value = ''
+        elif field.endswith('_id'):
+            value = uuid.UUID(encoding.force_text(value)).hex
+        parts.append(encoding.force_text(value))
+    return hashlib.md5(encoding.force_bytes('|'.join(parts))).hexdigest()
+
+
+def build_cube(apps, schema_editor):
+    facility_model = apps.get_model('facilities', 'Facility')
+    cube_model = apps.get_model('facilities', 'FacilityCountCube')
+    fields = [
+        field[:-len('_id')] if field.endswith('_id') else field
+        for field in CUBE_KEY_FIELDS
+    ]
+    groups = facility_model._base_manager.filter(deleted=False).values(
+        *fields + [path for _, path in CUBE_DERIVED_FIELDS]
+    ).annotate(
+        count=Count('id'), beds=Sum('number_of_beds'),
+        cots=Sum('number_of_cots')
+    ).order_by()
+
+    rows = []
+    for group in groups:
+        values = dict(
+            (key_field, group[field])
+            for key_field, field in zip(CUBE_KEY_FIELDS, fields))
+        values.update(
+            (field, group[path]) for field, path in CUBE_DERIVED_FIELDS)
+        rows.append(cube_model(
+            key=_get_cube_key(values), facilities=group['count'],
+            beds=group['beds'] or 0, cots=group['cots'] or 0, **values))
+    cube_model.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', 'admin_unit_codes'),
+        ('facilities', '0003_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacilityCountCube',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('key', models.CharField(unique=True, max_length=32)),
+                ('regulated', models.BooleanField(default=False)),
+                ('is_published', models.BooleanField(default=False)),
+                ('approved', models.BooleanField(default=False)),
+                ('closed', models.BooleanField(default=False)),
+                ('rejected', models.BooleanField(default=False)),
+                ('is_classified', models.BooleanField(default=False)),
+                ('facilities', models.IntegerField(default=0)),
+                ('beds', models.IntegerField(default=0)),
+                ('cots', models.IntegerField(default=0)),
+                ('constituency', models.ForeignKey(related_name='+', to='common.Constituency', null=True)),
+                ('county', models.ForeignKey(related_name='+', to='common.County', null=True)),
+                ('facility_type', models.ForeignKey(related_name='+', to='facilities.FacilityType', null=True)),
+                ('keph_level', models.ForeignKey(related_name='+', to='facilities.KephLevel', null=True)),
+                ('operation_status', models.ForeignKey(related_name='+', to='facilities.FacilityStatus', null=True)),
+                ('owner', models.ForeignKey(related_name='+', to='facilities.Owner', null=True)),
+                ('owner_type', models.ForeignKey(related_name='+', to='facilities.OwnerType', null=True)),
+                ('ward', models.ForeignKey(related_name='+', to='common.Ward', null=True)),
+            ],
+            options={
+                'default_permissions': ('add', 'change', 'delete', 'view'),
+            },
+        ),
+        migrations.RunPython(build_cube, migrations.RunPython.noop),
+    ]
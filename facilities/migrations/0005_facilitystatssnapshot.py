@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', 'admin_unit_codes'),
+        ('facilities', '0004_facilitycountcube'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacilityStatsSnapshot',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('date', models.DateField(db_index=True)),
+                ('is_published', models.BooleanField(default=False)),
+                ('approved', models.BooleanField(default=False)),
+                ('closed', models.BooleanField(default=False)),
+                ('rejected', models.BooleanField(default=False)),
+                ('is_classified', models.BooleanField(default=False)),
+                ('facilities', models.IntegerField(default=0)),
+                ('beds', models.IntegerField(default=0)),
+                ('cots', models.IntegerField(default=0)),
+                ('county', models.ForeignKey(related_name='+', to='common.County', null=True)),
+                ('facility_type', models.ForeignKey(related_name='+', to='facilities.FacilityType', null=True)),
+                ('keph_level', models.ForeignKey(related_name='+', to='facilities.KephLevel', null=True)),
+                ('operation_status', models.ForeignKey(related_name='+', to='facilities.FacilityStatus', null=True)),
+                ('owner_type', models.ForeignKey(related_name='+', to='facilities.OwnerType', null=True)),
+            ],
+            options={
+                'ordering': ('date',),
+                'default_permissions': ('add', 'change', 'delete', 'view'),
+            },
+        ),
+    ]
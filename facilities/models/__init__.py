@@ -1 +1,4 @@
 from .facility_models import *  # noqa
+from .facility_summary import *  # noqa
+from .facility_cube import *  # noqa
+from .facility_snapshots import *  # noqa
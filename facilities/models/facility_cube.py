@@ -0,0 +1,239 @@
+import hashlib
+import uuid
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import encoding
+
+from common.models import County, Constituency, Ward, bump_model_version
+
+from .facility_models import (
+    Facility,
+    FacilityType,
+    FacilityStatus,
+    KephLevel,
+    Owner,
+    OwnerType
+)
+
+
+# The facility fields that a cube row is keyed on
+CUBE_KEY_FIELDS = (
+    'ward_id', 'facility_type_id', 'keph_level_id', 'owner_id',
+    'operation_status_id', 'regulated', 'is_published', 'approved',
+    'closed', 'rejected', 'is_classified',
+)
+
+# Cube fields that are derived from the key: ( cube field, facility path )
+CUBE_DERIVED_FIELDS = (
+    ('constituency_id', 'ward__constituency'),
+    ('county_id', 'ward__constituency__county'),
+    ('owner_type_id', 'owner__owner_type'),
+)
+
+
+def get_cube_key(values):
+    """The cube key of a `{key field: value}` dict"""
+    parts = []
+    for field in CUBE_KEY_FIELDS:
+        value = values[field]
+        if value is None:
+            value = ''
+        elif field.endswith('_id'):
+            value = uuid.UUID(encoding.force_text(value)).hex
+        parts.append(encoding.force_text(value))
+    return hashlib.md5(encoding.force_bytes('|'.join(parts))).hexdigest()
+
+
+@encoding.python_2_unicode_compatible
+class FacilityCountCube(models.Model):
+
+    """
+    Facility, bed and cot counts pre-aggregated by the facility dimensions.
+
+    There is one row per combination of the `CUBE_KEY_FIELDS` that has
+    facilities, so county, constituency and ward rollups are answered by
+    summing a few cube rows instead of joining and scanning the
+    facilities. The visibility flags are part of the key, which lets
+    `facilities.visibility` scope the cube the way it scopes facilities.
+
+    Rows are updated with the difference that each facility write makes
+    ( see `apply_facility_delta` ); writes that do not send signals e.g.
+    bulk updates are only picked up by the `rebuild_facility_count_cube`
+    management command.
+    """
+    key = models.CharField(max_length=32, unique=True)
+
+    ward = models.ForeignKey(Ward, null=True, related_name='+')
+    facility_type = models.ForeignKey(
+        FacilityType, null=True, related_name='+')
+    keph_level = models.ForeignKey(KephLevel, null=True, related_name='+')
+    owner = models.ForeignKey(Owner, null=True, related_name='+')
+    operation_status = models.ForeignKey(
+        FacilityStatus, null=True, related_name='+')
+    regulated = models.BooleanField(default=False)
+    is_published = models.BooleanField(default=False)
+    approved = models.BooleanField(default=False)
+    closed = models.BooleanField(default=False)
+    rejected = models.BooleanField(default=False)
+    is_classified = models.BooleanField(default=False)
+
+    constituency = models.ForeignKey(
+        Constituency, null=True, related_name='+')
+    county = models.ForeignKey(County, null=True, related_name='+')
+    owner_type = models.ForeignKey(OwnerType, null=True, related_name='+')
+
+    facilities = models.IntegerField(default=0)
+    beds = models.IntegerField(default=0)
+    cots = models.IntegerField(default=0)
+
+    # see facilities.visibility
+    visibility_flags = Facility.visibility_flags
+
+    def __str__(self):
+        return self.key
+
+    class Meta(object):
+        default_permissions = ('add', 'change', 'delete', 'view', )
+
+
+def _get_contribution(facility):
+    """
+    What a saved facility adds to the cube: `( facility id, key values,
+    beds, cots )`, or `None` if the facility is not counted.
+    """
+    if facility is None or facility.deleted:
+        return None
+    values = dict(
+        (field, getattr(facility, field)) for field in CUBE_KEY_FIELDS)
+    return (
+        facility.id, values, facility.number_of_beds or 0,
+        facility.number_of_cots or 0)
+
+
+def _create_cube_row(facility_id, values, beds, cots):
+    derived = Facility._base_manager.filter(id=facility_id).values_list(
+        *[path for _, path in CUBE_DERIVED_FIELDS]).get()
+    row = dict(
+        (field, value)
+        for (field, _), value in zip(CUBE_DERIVED_FIELDS, derived))
+    row.update(values)
+    FacilityCountCube.objects.create(
+        key=get_cube_key(values), facilities=1, beds=beds, cots=cots, **row)
+
+
+def _add_to_cube(contribution, sign):
+    facility_id, values, beds, cots = contribution
+    updated = FacilityCountCube.objects.filter(
+        key=get_cube_key(values)
+    ).update(
+        facilities=F('facilities') + sign, beds=F('beds') + sign * beds,
+        cots=F('cots') + sign * cots)
+    if updated or sign < 0:
+        # only a stale cube lacks the row that a facility is taken out of
+        return
+    try:
+        with transaction.atomic():
+            _create_cube_row(facility_id, values, beds, cots)
+    except IntegrityError:
+        # created by a concurrent write
+        _add_to_cube(contribution, sign)
+
+
+def apply_facility_delta(old, new):
+    """
+    Move a facility's counts from its `old` to its `new` contribution
+    ( see `_get_contribution` ) in a single transaction.
+    """
+    if old == new:
+        return
+    with transaction.atomic():
+        if old is not None:
+            _add_to_cube(old, -1)
+        if new is not None:
+            _add_to_cube(new, 1)
+
+
+def rebuild_facility_count_cube(facility_model=Facility,
+                                cube_model=FacilityCountCube):
+    """Recreate the whole cube; returns the number of rows"""
+    fields = [
+        field[:-len('_id')] if field.endswith('_id') else field
+        for field in CUBE_KEY_FIELDS
+    ]
+    groups = facility_model._base_manager.filter(deleted=False).values(
+        *fields + [path for _, path in CUBE_DERIVED_FIELDS]
+    ).annotate(
+        count=Count('id'), beds=Sum('number_of_beds'),
+        cots=Sum('number_of_cots')
+    ).order_by()
+
+    rows = []
+    for group in groups:
+        values = dict(
+            (key_field, group[field])
+            for key_field, field in zip(CUBE_KEY_FIELDS, fields))
+        values.update(
+            (field, group[path]) for field, path in CUBE_DERIVED_FIELDS)
+        rows.append(cube_model(
+            key=get_cube_key(values), facilities=group['count'],
+            beds=group['beds'] or 0, cots=group['cots'] or 0, **values))
+    with transaction.atomic():
+        cube_model.objects.all().delete()
+        cube_model.objects.bulk_create(rows)
+    # bulk creates send no signals
+    bump_model_version(cube_model)
+    return len(rows)
+
+
+@receiver(pre_save, sender=Facility)
+def _remember_cube_contribution(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+    old = None
+    if not instance._state.adding:
+        old = Facility.objects.filter(id=instance.id).first()
+    instance._cube_contribution = _get_contribution(old)
+
+
+@receiver(post_save, sender=Facility)
+def _update_cube_on_facility_save(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        # fixtures are only counted by a rebuild
+        return
+    apply_facility_delta(
+        getattr(instance, '_cube_contribution', None),
+        _get_contribution(instance))
+
+
+@receiver(post_delete, sender=Facility)
+def _update_cube_on_facility_delete(sender, instance, **kwargs):
+    apply_facility_delta(_get_contribution(instance), None)
+
+
+# Moving a ward or an owner moves the cube rows derived from it
+@receiver(post_save, sender=Ward)
+def _move_ward(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+    FacilityCountCube.objects.filter(ward=instance).update(
+        constituency=instance.constituency_id,
+        county=instance.constituency.county_id)
+
+
+@receiver(post_save, sender=Constituency)
+def _move_constituency(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+    FacilityCountCube.objects.filter(constituency=instance).update(
+        county=instance.county_id)
+
+
+@receiver(post_save, sender=Owner)
+def _move_owner(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+    FacilityCountCube.objects.filter(owner=instance).update(
+        owner_type=instance.owner_type_id)
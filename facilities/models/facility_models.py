@@ -4,6 +4,8 @@ import reversion
 import json
 import logging
 
+from collections import OrderedDict
+
 from django.conf import settings
 from django.core import validators
 from django.db import models
@@ -11,7 +13,8 @@ from django.core.exceptions import ValidationError
 from django.utils import encoding
 
 from common.models import (
-    AbstractBase, Ward, Contact, SequenceMixin, SubCounty, Town
+    AbstractBase, Ward, Contact, SequenceMixin, SubCounty, Town,
+    CustomDefaultManager
 )
 from common.fields import SequenceField
 
@@ -519,6 +522,114 @@ class FacilityContact(AbstractBase):
         return "{}: ({})".format(self.facility, self.contact)
 
 
+class FacilityManager(CustomDefaultManager):
+
+    """
+    Adds a listing queryset that avoids per-row lookups when serializing.
+
+    The `annotated_*` values are computed by correlated sub-selects and are
+    read by the matching `Facility` properties; instances that do not carry
+    them fall back to the per-instance queries.
+    """
+    list_annotations = OrderedDict([
+        ('annotated_is_approved', """
+            SELECT EXISTS (
+                SELECT 1 FROM facilities_facilityapproval
+                WHERE facilities_facilityapproval.facility_id =
+                    facilities_facility.id
+                AND facilities_facilityapproval.is_cancelled = false
+                AND facilities_facilityapproval.deleted = false
+            )
+        """),
+        ('annotated_latest_approval_date', """
+            SELECT facilities_facilityapproval.created
+            FROM facilities_facilityapproval
+            WHERE facilities_facilityapproval.facility_id =
+                facilities_facility.id
+            AND facilities_facilityapproval.is_cancelled = false
+            AND facilities_facilityapproval.deleted = false
+            ORDER BY facilities_facilityapproval.updated DESC,
+                facilities_facilityapproval.created DESC
+            LIMIT 1
+        """),
+        ('annotated_latest_approval_or_rejection_id', """
+            SELECT CAST(facilities_facilityapproval.id AS text)
+            FROM facilities_facilityapproval
+            WHERE facilities_facilityapproval.facility_id =
+                facilities_facility.id
+            AND facilities_facilityapproval.deleted = false
+            ORDER BY facilities_facilityapproval.updated DESC,
+                facilities_facilityapproval.created DESC
+            LIMIT 1
+        """),
+        ('annotated_latest_approval_or_rejection_comment', """
+            SELECT facilities_facilityapproval.comment
+            FROM facilities_facilityapproval
+            WHERE facilities_facilityapproval.facility_id =
+                facilities_facility.id
+            AND facilities_facilityapproval.deleted = false
+            ORDER BY facilities_facilityapproval.updated DESC,
+                facilities_facilityapproval.created DESC
+            LIMIT 1
+        """),
+        ('annotated_latest_update', """
+            SELECT CAST(facilities_facilityupdates.id AS text)
+            FROM facilities_facilityupdates
+            WHERE facilities_facilityupdates.facility_id =
+                facilities_facility.id
+            AND facilities_facilityupdates.approved = false
+            AND facilities_facilityupdates.cancelled = false
+            AND facilities_facilityupdates.deleted = false
+            ORDER BY facilities_facilityupdates.updated DESC,
+                facilities_facilityupdates.created DESC
+            LIMIT 1
+        """),
+        ('annotated_regulatory_status_name', """
+            SELECT COALESCE(
+                (
+                    SELECT facilities_regulationstatus.name
+                    FROM facilities_facilityregulationstatus
+                    INNER JOIN facilities_regulationstatus ON
+                        facilities_regulationstatus.id =
+                        facilities_facilityregulationstatus.regulation_status_id
+                    WHERE facilities_facilityregulationstatus.facility_id =
+                        facilities_facility.id
+                    AND facilities_facilityregulationstatus.deleted = false
+                    AND facilities_regulationstatus.is_default = false
+                    ORDER BY facilities_facilityregulationstatus.updated DESC,
+                        facilities_facilityregulationstatus.created DESC
+                    LIMIT 1
+                ),
+                (
+                    SELECT facilities_regulationstatus.name
+                    FROM facilities_regulationstatus
+                    WHERE facilities_regulationstatus.is_default = true
+                    AND facilities_regulationstatus.deleted = false
+                    LIMIT 1
+                )
+            )
+        """),
+    ])
+
+    def with_list_annotations(self):
+        """
+        Facilities with everything the list serializers need.
+
+        Serializing a page of these takes a fixed number of queries
+        regardless of the page size.
+        """
+        facility_services = FacilityService.objects.select_related(
+            'service__category', 'option'
+        ).extra(select=FacilityService.rating_annotations)
+        return self.get_queryset().select_related(
+            'ward__constituency__county', 'facility_type',
+            'owner__owner_type', 'operation_status', 'regulatory_body'
+        ).prefetch_related(
+            models.Prefetch('facility_services', queryset=facility_services),
+            'contacts'
+        ).extra(select=self.list_annotations)
+
+
 @reversion.register(follow=[
     'facility_type', 'operation_status', 'ward', 'owner', 'contacts',
     'parent', 'regulatory_body', 'keph_level', 'sub_county', 'town'
@@ -649,6 +760,47 @@ class Facility(SequenceMixin, AbstractBase):
     closing_reason = models.TextField(
         null=True, blank=True, help_text="Reason for closing the facility")
 
+    objects = FacilityManager()
+
+    # see facilities.visibility
+    visibility_flags = (
+        'approved', 'closed', 'is_classified', 'is_published', 'rejected')
+
+    # What the computed properties read; partial responses ( `?fields=` )
+    # use it to load only what the requested fields need
+    partial_response_requirements = {
+        'county': {'select_related': ['ward__constituency__county']},
+        'get_county': {'select_related': ['ward__constituency__county']},
+        'constituency': {'select_related': ['ward__constituency']},
+        'get_constituency': {'select_related': ['ward__constituency']},
+        'ward_name': {'select_related': ['ward']},
+        'facility_type_name': {'select_related': ['facility_type']},
+        'owner_name': {'select_related': ['owner']},
+        'owner_type_name': {'select_related': ['owner__owner_type']},
+        'operation_status_name': {'select_related': ['operation_status']},
+        'regulatory_status_name': {
+            'extra': ['annotated_regulatory_status_name']},
+        'is_approved': {'extra': ['annotated_is_approved']},
+        'latest_update': {'extra': ['annotated_latest_update']},
+        'latest_approval_date': {
+            'extra': ['annotated_latest_approval_date']},
+        'latest_approval_or_rejection': {
+            'extra': [
+                'annotated_latest_approval_or_rejection_id',
+                'annotated_latest_approval_or_rejection_comment'
+            ]},
+        'average_rating': {'prefetch_related': ['facility_services']},
+        'get_facility_services': {'prefetch_related': ['facility_services']},
+        'get_facility_contacts': {
+            'prefetch_related': ['facility_contacts__contact__contact_type']},
+        'boundaries': {'select_related': ['ward__constituency__county']},
+        'service_catalogue_active': {'select_related': ['operation_status']},
+        # these run queries of their own
+        'officer_in_charge': {},
+        'latest_approval': {},
+        'coordinates': {},
+    }
+
     # hard code the operational status name in order to avoid more crud
     @property
     def service_catalogue_active(self):
@@ -672,6 +824,8 @@ class Facility(SequenceMixin, AbstractBase):
 
     @property
     def latest_update(self):
+        if hasattr(self, 'annotated_latest_update'):
+            return self.annotated_latest_update
         facility_updates = FacilityUpdates.objects.filter(
             facility=self, approved=False, cancelled=False)
         if facility_updates:
@@ -727,6 +881,8 @@ class Facility(SequenceMixin, AbstractBase):
 
     @property
     def regulatory_status_name(self):
+        if hasattr(self, 'annotated_regulatory_status_name'):
+            return self.annotated_regulatory_status_name
         if hasattr(self.current_regulatory_status, 'regulation_status'):
             return self.current_regulatory_status.regulation_status.name
         else:
@@ -746,12 +902,14 @@ class Facility(SequenceMixin, AbstractBase):
 
     @property
     def is_approved(self):
+        if hasattr(self, 'annotated_is_approved'):
+            return self.annotated_is_approved
         approvals = FacilityApproval.objects.filter(
             facility=self, is_cancelled=False).count()
         if approvals:
             return True
         else:
-            False
+            return False
 
     @property
     def latest_approval(self):
@@ -762,8 +920,23 @@ class Facility(SequenceMixin, AbstractBase):
         else:
             return None
 
+    @property
+    def latest_approval_date(self):
+        if hasattr(self, 'annotated_latest_approval_date'):
+            return self.annotated_latest_approval_date
+        latest_approval = self.latest_approval
+        return latest_approval.created if latest_approval else None
+
     @property
     def latest_approval_or_rejection(self):
+        if hasattr(self, 'annotated_latest_approval_or_rejection_id'):
+            if self.annotated_latest_approval_or_rejection_id is None:
+                return None
+            return {
+                "id": self.annotated_latest_approval_or_rejection_id,
+                "comment": str(
+                    self.annotated_latest_approval_or_rejection_comment)
+            }
         approvals = FacilityApproval.objects.filter(facility=self)
         if approvals:
             return {
@@ -1391,12 +1564,32 @@ class FacilityService(AbstractBase):
     # directly to the
     service = models.ForeignKey(Service)
 
+    # used by `FacilityManager.with_list_annotations` to prefetch services
+    rating_annotations = OrderedDict([
+        ('annotated_average_rating', """
+            SELECT AVG(facilities_facilityservicerating.rating)
+            FROM facilities_facilityservicerating
+            WHERE facilities_facilityservicerating.facility_service_id =
+                facilities_facilityservice.id
+            AND facilities_facilityservicerating.deleted = false
+        """),
+        ('annotated_number_of_ratings', """
+            SELECT COUNT(*)
+            FROM facilities_facilityservicerating
+            WHERE facilities_facilityservicerating.facility_service_id =
+                facilities_facilityservice.id
+            AND facilities_facilityservicerating.deleted = false
+        """),
+    ])
+
     @property
     def service_has_options(self):
         return True if self.option else False
 
     @property
     def number_of_ratings(self):
+        if hasattr(self, 'annotated_number_of_ratings'):
+            return self.annotated_number_of_ratings
         return self.facility_service_ratings.count()
 
     @property
@@ -1409,6 +1602,9 @@ class FacilityService(AbstractBase):
 
     @property
     def average_rating(self):
+        if hasattr(self, 'annotated_average_rating'):
+            avg = self.annotated_average_rating
+            return float(avg) if avg is not None else 0.0
         avg = self.facility_service_ratings.aggregate(models.Avg('rating'))
         return avg['rating__avg'] or 0.0
 
@@ -0,0 +1,87 @@
+from django.db import models, transaction
+from django.db.models import Count, Sum
+from django.utils import encoding, timezone
+
+from common.models import County, bump_model_version
+
+from .facility_models import (
+    Facility,
+    FacilityType,
+    FacilityStatus,
+    KephLevel,
+    OwnerType
+)
+
+
+# ( snapshot field, facility path ) of the snapshot dimensions
+SNAPSHOT_FIELDS = (
+    ('county_id', 'ward__constituency__county'),
+    ('facility_type_id', 'facility_type'),
+    ('keph_level_id', 'keph_level'),
+    ('owner_type_id', 'owner__owner_type'),
+    ('operation_status_id', 'operation_status'),
+) + tuple((flag, flag) for flag in Facility.visibility_flags)
+
+
+@encoding.python_2_unicode_compatible
+class FacilityStatsSnapshot(models.Model):
+
+    """
+    A day's facility, bed and cot counts for one combination of county,
+    facility type, KEPH level, owner type and operation status.
+
+    The visibility flags are part of the combination so that trend
+    reports can be scoped with `facilities.visibility`.
+    """
+    date = models.DateField(db_index=True)
+    county = models.ForeignKey(County, null=True, related_name='+')
+    facility_type = models.ForeignKey(
+        FacilityType, null=True, related_name='+')
+    keph_level = models.ForeignKey(KephLevel, null=True, related_name='+')
+    owner_type = models.ForeignKey(OwnerType, null=True, related_name='+')
+    operation_status = models.ForeignKey(
+        FacilityStatus, null=True, related_name='+')
+    is_published = models.BooleanField(default=False)
+    approved = models.BooleanField(default=False)
+    closed = models.BooleanField(default=False)
+    rejected = models.BooleanField(default=False)
+    is_classified = models.BooleanField(default=False)
+
+    facilities = models.IntegerField(default=0)
+    beds = models.IntegerField(default=0)
+    cots = models.IntegerField(default=0)
+
+    def __str__(self):
+        return "{}: {} facilities".format(self.date, self.facilities)
+
+    class Meta(object):
+        ordering = ('date', )
+        default_permissions = ('add', 'change', 'delete', 'view', )
+
+
+def snapshot_facility_stats(date=None):
+    """
+    Store the current facility counts as the snapshot of `date` ( today by
+    default ), replacing any earlier snapshot of the same day; returns the
+    number of snapshot rows.
+    """
+    date = date or timezone.localtime(timezone.now()).date()
+    groups = Facility.objects.values(
+        *[path for _, path in SNAPSHOT_FIELDS]
+    ).annotate(
+        count=Count('id'), beds=Sum('number_of_beds'),
+        cots=Sum('number_of_cots')
+    ).order_by()
+    rows = [
+        FacilityStatsSnapshot(
+            date=date, facilities=group['count'], beds=group['beds'] or 0,
+            cots=group['cots'] or 0,
+            **dict((field, group[path]) for field, path in SNAPSHOT_FIELDS))
+        for group in groups
+    ]
+    with transaction.atomic():
+        FacilityStatsSnapshot.objects.filter(date=date).delete()
+        FacilityStatsSnapshot.objects.bulk_create(rows)
+    # bulk creates send no signals
+    bump_model_version(FacilityStatsSnapshot)
+    return len(rows)
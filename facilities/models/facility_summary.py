@@ -0,0 +1,265 @@
+from django.contrib.postgres.fields import ArrayField
+from django.db import models, transaction
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+from django.utils import encoding
+
+from common.models import County, Constituency, Ward, bump_model_version
+
+from .facility_models import (
+    Facility,
+    FacilityType,
+    FacilityStatus,
+    FacilityService,
+    FacilityServiceRating,
+    FacilityApproval,
+    FacilityRegulationStatus,
+    KephLevel,
+    Owner,
+    OwnerType,
+    RegulatingBody,
+    RegulationStatus
+)
+
+
+@encoding.python_2_unicode_compatible
+class FacilitySummary(models.Model):
+
+    """
+    A flat, read-only projection of a facility.
+
+    Listing, searching and exporting facilities needs values from eight or
+    so joined tables. This table holds one pre-joined row per facility so
+    that read-only endpoints can be served by single table scans.
+
+    Rows are refreshed whenever the facility or the records that feed the
+    derived values ( services, ratings, approvals and regulation statuses )
+    are saved. The `rebuild_facility_summary` management command recreates
+    the whole table.
+    """
+    facility = models.OneToOneField(
+        Facility, primary_key=True, related_name='summary')
+    name = models.CharField(max_length=100)
+    official_name = models.CharField(max_length=150, null=True, blank=True)
+    code = models.IntegerField(null=True, blank=True)
+    number_of_beds = models.PositiveIntegerField(default=0)
+    number_of_cots = models.PositiveIntegerField(default=0)
+
+    county = models.ForeignKey(County, null=True, related_name='+')
+    county_name = models.CharField(max_length=100, null=True, blank=True)
+    constituency = models.ForeignKey(
+        Constituency, null=True, related_name='+')
+    constituency_name = models.CharField(
+        max_length=100, null=True, blank=True)
+    ward = models.ForeignKey(Ward, null=True, related_name='+')
+    ward_name = models.CharField(max_length=100, null=True, blank=True)
+    owner = models.ForeignKey(Owner, null=True, related_name='+')
+    owner_name = models.CharField(max_length=100, null=True, blank=True)
+    owner_type = models.ForeignKey(OwnerType, null=True, related_name='+')
+    owner_type_name = models.CharField(max_length=100, null=True, blank=True)
+    facility_type = models.ForeignKey(
+        FacilityType, null=True, related_name='+')
+    facility_type_name = models.CharField(
+        max_length=100, null=True, blank=True)
+    keph_level = models.ForeignKey(KephLevel, null=True, related_name='+')
+    keph_level_name = models.CharField(max_length=30, null=True, blank=True)
+    operation_status = models.ForeignKey(
+        FacilityStatus, null=True, related_name='+')
+    operation_status_name = models.CharField(
+        max_length=100, null=True, blank=True)
+    regulatory_body = models.ForeignKey(
+        RegulatingBody, null=True, related_name='+')
+    regulatory_status_name = models.CharField(
+        max_length=100, null=True, blank=True)
+
+    is_approved = models.BooleanField(default=False)
+    approved = models.BooleanField(default=False)
+    rejected = models.BooleanField(default=False)
+    regulated = models.BooleanField(default=False)
+    has_edits = models.BooleanField(default=False)
+    is_published = models.BooleanField(default=False)
+    is_classified = models.BooleanField(default=False)
+    closed = models.BooleanField(default=False)
+
+    average_rating = models.FloatField(default=0)
+    service_categories = ArrayField(
+        models.UUIDField(), default=list, blank=True,
+        help_text='The categories of the services offered by the facility')
+
+    created = models.DateTimeField()
+    updated = models.DateTimeField()
+
+    # see facilities.visibility
+    visibility_flags = Facility.visibility_flags
+
+    @classmethod
+    def from_facility(cls, facility):
+        """
+        Build an unsaved summary from a facility.
+
+        `facility` should come from `Facility.objects.with_list_annotations`
+        otherwise every derived value costs a query.
+        """
+        ward = facility.ward
+        constituency = ward.constituency
+        owner = facility.owner
+        return cls(
+            facility=facility,
+            name=facility.name,
+            official_name=facility.official_name,
+            code=facility.code,
+            number_of_beds=facility.number_of_beds,
+            number_of_cots=facility.number_of_cots,
+            county_id=constituency.county_id,
+            county_name=constituency.county.name,
+            constituency=constituency,
+            constituency_name=constituency.name,
+            ward=ward,
+            ward_name=ward.name,
+            owner=owner,
+            owner_name=owner.name,
+            owner_type_id=owner.owner_type_id,
+            owner_type_name=owner.owner_type.name,
+            facility_type=facility.facility_type,
+            facility_type_name=facility.facility_type.name,
+            keph_level_id=facility.keph_level_id,
+            keph_level_name=(
+                facility.keph_level.name if facility.keph_level else None),
+            operation_status_id=facility.operation_status_id,
+            operation_status_name=(
+                facility.operation_status.name
+                if facility.operation_status else None),
+            regulatory_body_id=facility.regulatory_body_id,
+            regulatory_status_name=facility.regulatory_status_name,
+            is_approved=bool(facility.is_approved),
+            approved=facility.approved,
+            rejected=facility.rejected,
+            regulated=facility.regulated,
+            has_edits=facility.has_edits,
+            is_published=facility.is_published,
+            is_classified=facility.is_classified,
+            closed=facility.closed,
+            average_rating=facility.average_rating,
+            service_categories=sorted(set(
+                facility_service.service.category_id
+                for facility_service in facility.facility_services.all()
+            )),
+            created=facility.created,
+            updated=facility.updated
+        )
+
+    def __str__(self):
+        return self.name
+
+    class Meta(object):
+        ordering = ('-updated', '-created',)
+        default_permissions = ('add', 'change', 'delete', 'view', )
+        verbose_name_plural = 'facility summaries'
+
+
+def _summary_queryset():
+    return Facility.objects.with_list_annotations().select_related(
+        'keph_level')
+
+
+def refresh_facility_summary(facility_id):
+    """Recompute the summary row of a single facility"""
+    try:
+        facility = _summary_queryset().get(id=facility_id)
+    except Facility.DoesNotExist:
+        # deleted facilities are not listed anywhere
+        FacilitySummary.objects.filter(facility_id=facility_id).delete()
+        return None
+
+    summary = FacilitySummary.from_facility(facility)
+    summary.save()
+    return summary
+
+
+def rebuild_facility_summaries(chunk_size=500):
+    """Recreate the whole summary table; returns the number of rows"""
+    facility_ids = list(
+        Facility.objects.order_by('id').values_list('id', flat=True))
+    total = 0
+    with transaction.atomic():
+        FacilitySummary.objects.all().delete()
+        for start in range(0, len(facility_ids), chunk_size):
+            chunk = facility_ids[start:start + chunk_size]
+            summaries = [
+                FacilitySummary.from_facility(facility)
+                for facility in _summary_queryset().filter(id__in=chunk)
+            ]
+            FacilitySummary.objects.bulk_create(summaries)
+            total += len(summaries)
+    return total
+
+
+@receiver(post_save, sender=Facility)
+def _refresh_on_facility_save(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        # fixtures are loaded before the records they reference
+        return
+    refresh_facility_summary(instance.id)
+
+
+@receiver(post_save, sender=FacilityService)
+@receiver(post_save, sender=FacilityApproval)
+@receiver(post_save, sender=FacilityRegulationStatus)
+def _refresh_on_facility_child_save(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+    refresh_facility_summary(instance.facility_id)
+
+
+@receiver(post_save, sender=FacilityServiceRating)
+def _refresh_on_rating_save(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+    refresh_facility_summary(instance.facility_service.facility_id)
+
+
+# The names copied from the lookup tables into the summary
+SUMMARY_NAME_FIELDS = {
+    County: 'county',
+    Constituency: 'constituency',
+    Ward: 'ward',
+    Owner: 'owner',
+    OwnerType: 'owner_type',
+    FacilityType: 'facility_type',
+    KephLevel: 'keph_level',
+    FacilityStatus: 'operation_status'
+}
+
+
+def _propagate_name_change(sender, instance, **kwargs):
+    field_name = SUMMARY_NAME_FIELDS[sender]
+    FacilitySummary.objects.filter(**{field_name: instance}).exclude(
+        **{field_name + '_name': instance.name}
+    ).update(**{field_name + '_name': instance.name})
+    # bulk updates do not send the signals that maintain the version
+    bump_model_version(FacilitySummary)
+
+
+for lookup_model in SUMMARY_NAME_FIELDS:
+    post_save.connect(
+        _propagate_name_change, sender=lookup_model,
+        dispatch_uid='facility_summary_{}'.format(lookup_model.__name__))
+
+
+# The summary holds no regulation status column; names are unique, so the
+# rows showing a renamed status are found by its previous name
+@receiver(pre_save, sender=RegulationStatus)
+def _remember_regulation_status_name(sender, instance, **kwargs):
+    instance._summary_name = None if instance._state.adding else (
+        RegulationStatus.objects.filter(id=instance.id).values_list(
+            'name', flat=True).first())
+
+
+@receiver(post_save, sender=RegulationStatus)
+def _propagate_regulation_status_rename(sender, instance, **kwargs):
+    old_name = getattr(instance, '_summary_name', None)
+    if kwargs.get('raw') or old_name is None or old_name == instance.name:
+        return
+    FacilitySummary.objects.filter(regulatory_status_name=old_name).update(
+        regulatory_status_name=instance.name)
+    bump_model_version(FacilitySummary)
@@ -43,7 +43,8 @@ from ..models import (
     FacilityUpdates,
     KephLevel,
     OptionGroup,
-    FacilityLevelChangeReason
+    FacilityLevelChangeReason,
+    FacilitySummary
 )
 
 
@@ -472,8 +473,7 @@ class FacilitySerializer(
     owner = serializers.PrimaryKeyRelatedField(
         required=False, queryset=Owner.objects.all())
     date_requested = serializers.ReadOnlyField(source='created')
-    date_approved = serializers.ReadOnlyField(
-        source='latest_approval.created')
+    date_approved = serializers.ReadOnlyField(source='latest_approval_date')
     latest_approval_or_rejection = serializers.ReadOnlyField()
 
     class Meta(object):
@@ -654,6 +654,21 @@ class FacilityListSerializer(FacilitySerializer):
         ]
 
 
+class FacilitySummarySerializer(
+        AbstractFieldsMixin, serializers.ModelSerializer):
+    """
+    Renders a facility summary row in the same shape as the slim list
+    payload of a facility.
+    """
+    id = serializers.ReadOnlyField(source='facility_id')
+    county = serializers.ReadOnlyField(source='county_name')
+    constituency = serializers.ReadOnlyField(source='constituency_name')
+
+    class Meta(object):
+        model = FacilitySummary
+        exclude = ('facility', )
+
+
 class FacilityServiceRatingSerializer(
         AbstractFieldsMixin, serializers.ModelSerializer):
 
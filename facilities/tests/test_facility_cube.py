@@ -0,0 +1,149 @@
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.utils.six import StringIO
+
+from model_mommy import mommy
+
+from common.models import County, Constituency, Ward
+from common.tests.test_models import BaseTestCase
+
+from ..models import (
+    Facility,
+    FacilityCountCube,
+    Owner,
+    OwnerType,
+    rebuild_facility_count_cube
+)
+from ..models import facility_cube
+
+
+class TestFacilityCountCube(BaseTestCase):
+
+    def setUp(self):
+        super(TestFacilityCountCube, self).setUp()
+        self.county = mommy.make(County)
+        self.constituency = mommy.make(Constituency, county=self.county)
+        self.ward = mommy.make(Ward, constituency=self.constituency)
+        self.owner = mommy.make(Owner)
+
+    def _make_facility(self, **kwargs):
+        return mommy.make(
+            Facility, ward=self.ward, owner=self.owner, **kwargs)
+
+    def _totals(self, **filters):
+        rows = FacilityCountCube.objects.filter(**filters)
+        return (
+            sum(row.facilities for row in rows),
+            sum(row.beds for row in rows),
+            sum(row.cots for row in rows))
+
+    def test_facilities_are_counted_when_saved(self):
+        self._make_facility(number_of_beds=3, number_of_cots=1)
+        self._make_facility(number_of_beds=2, number_of_cots=None)
+        row = FacilityCountCube.objects.get()
+        self.assertEquals(row.key, str(row))
+        self.assertEquals((2, 5, 1), (row.facilities, row.beds, row.cots))
+        self.assertEquals(self.county, row.county)
+        self.assertEquals(self.constituency, row.constituency)
+        self.assertEquals(self.owner.owner_type, row.owner_type)
+
+    def test_updates_move_facilities_between_rows(self):
+        facility = self._make_facility(number_of_beds=3)
+        other_ward = mommy.make(Ward, constituency=self.constituency)
+        facility.ward = other_ward
+        facility.is_published = True
+        facility.save()
+        self.assertEquals((0, 0, 0), self._totals(ward=self.ward))
+        self.assertEquals(
+            (1, 3, 0), self._totals(ward=other_ward, is_published=True))
+
+        facility.number_of_beds = 4
+        facility.save()
+        self.assertEquals((1, 4, 0), self._totals())
+
+    def test_unchanged_saves_leave_the_cube_alone(self):
+        facility = self._make_facility()
+        row = FacilityCountCube.objects.get()
+        facility.name = 'Renamed'
+        facility.save()
+        self.assertEquals(row.facilities, FacilityCountCube.objects.get(
+            pk=row.pk).facilities)
+
+    def test_deleted_facilities_are_not_counted(self):
+        facility = self._make_facility()
+        facility.delete()
+        self.assertEquals((0, 0, 0), self._totals())
+
+        facility = self._make_facility()
+        Facility.everything.filter(pk=facility.pk).delete()
+        self.assertEquals((0, 0, 0), self._totals())
+
+    def test_concurrently_created_rows(self):
+        create_cube_row = facility_cube._create_cube_row
+
+        def lose_race(*args):
+            # as if another write had created the row first
+            facility_cube._create_cube_row = create_cube_row
+            raise IntegrityError
+
+        facility_cube._create_cube_row = lose_race
+        try:
+            self._make_facility(number_of_beds=1)
+        finally:
+            facility_cube._create_cube_row = create_cube_row
+        self.assertEquals((1, 1, 0), self._totals())
+
+    def test_moving_admin_units_and_owners(self):
+        self._make_facility()
+        county = mommy.make(County)
+        self.constituency.county = county
+        self.constituency.save()
+        self.assertEquals((1, 0, 0), self._totals(county=county))
+
+        constituency = mommy.make(Constituency, county=self.county)
+        self.ward.constituency = constituency
+        self.ward.save()
+        self.assertEquals(
+            (1, 0, 0),
+            self._totals(constituency=constituency, county=self.county))
+
+        owner_type = mommy.make(OwnerType)
+        self.owner.owner_type = owner_type
+        self.owner.save()
+        self.assertEquals((1, 0, 0), self._totals(owner_type=owner_type))
+
+    def test_raw_saves_are_left_to_rebuilds(self):
+        facility = self._make_facility()
+        facility.number_of_beds = 5
+        facility.save_base(raw=True)
+        self.constituency.county = mommy.make(County)
+        self.constituency.save_base(raw=True)
+        self.ward.constituency = mommy.make(Constituency, county=self.county)
+        self.ward.save_base(raw=True)
+        self.owner.owner_type = mommy.make(OwnerType)
+        self.owner.save_base(raw=True)
+
+        row = FacilityCountCube.objects.get()
+        self.assertEquals(0, row.beds)
+        self.assertEquals(self.county, row.county)
+        self.assertNotEquals(self.ward.constituency, row.constituency)
+        self.assertNotEquals(self.owner.owner_type, row.owner_type)
+
+    def test_rebuild(self):
+        self._make_facility(number_of_beds=2)
+        self._make_facility(number_of_beds=1, is_published=True)
+        deleted = self._make_facility()
+        Facility.objects.filter(pk=deleted.pk).update(deleted=True)
+        FacilityCountCube.objects.update(facilities=10)
+
+        self.assertEquals(2, rebuild_facility_count_cube())
+        self.assertEquals((2, 3, 0), self._totals())
+        self.assertEquals((1, 1, 0), self._totals(is_published=True))
+
+    def test_rebuild_command(self):
+        self._make_facility()
+        FacilityCountCube.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_facility_count_cube', stdout=out)
+        self.assertIn('Built 1 cube rows', out.getvalue())
+        self.assertEquals((1, 0, 0), self._totals())
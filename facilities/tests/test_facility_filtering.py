@@ -1,11 +1,24 @@
 from django.contrib.auth.models import Group, Permission
+from django.core.management import call_command
 from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils.six import StringIO
 
 from rest_framework.test import APITestCase
 from model_mommy import mommy
 
+from common.models import County, Constituency, Ward
 from users.models import MflUser
-from facilities.models import Facility, FacilityApproval
+from facilities.models import (
+    Facility,
+    FacilityApproval,
+    FacilityService,
+    Service,
+    ServiceCategory
+)
+from facilities.filters import FacilityFilter
 from facilities.tests.test_facility_views import load_dump
 from facilities.serializers import FacilitySerializer
 
@@ -244,3 +257,114 @@ class TestFacilitiesPendingApprovalFilter(LoginMixin, APITestCase):
             FacilitySerializer(facility_2).data
         ]
         self.assertListEqual(expected_results, response.data.get("results"))
+
+
+class TestFacilityServiceCategoryFilter(TestCase):
+
+    def setUp(self):
+        self.category = mommy.make(ServiceCategory)
+        self.category_2 = mommy.make(ServiceCategory)
+        self.service = mommy.make(Service, category=self.category)
+        self.service_2 = mommy.make(Service, category=self.category_2)
+        self.facility = mommy.make(Facility)
+        self.facility_2 = mommy.make(Facility)
+        mommy.make(
+            FacilityService, facility=self.facility, service=self.service)
+        mommy.make(
+            FacilityService, facility=self.facility, service=self.service_2)
+        mommy.make(
+            FacilityService, facility=self.facility_2, service=self.service)
+        self.categories = "{},{}".format(self.category.id, self.category_2.id)
+        super(TestFacilityServiceCategoryFilter, self).setUp()
+
+    def _filter(self, data, queryset=None):
+        queryset = Facility.objects.all() if queryset is None else queryset
+        return FacilityFilter(data, queryset=queryset).qs
+
+    def test_all_categories_is_the_default_mode(self):
+        facilities = self._filter({"service_category": self.categories})
+        self.assertEquals([self.facility], list(facilities))
+
+    def test_any_category_mode(self):
+        facilities = self._filter({
+            "service_category": self.categories,
+            "service_category_mode": "any"
+        })
+        self.assertEquals(
+            sorted([self.facility.id, self.facility_2.id]),
+            sorted(facility.id for facility in facilities))
+
+    def test_composes_with_incoming_queryset(self):
+        queryset = Facility.objects.exclude(id=self.facility.id)
+        facilities = self._filter(
+            {"service_category": str(self.category.id)}, queryset=queryset)
+        self.assertEquals([self.facility_2], list(facilities))
+
+    def test_empty_value_does_not_filter(self):
+        facilities = self._filter({"service_category": ","})
+        self.assertEquals(2, facilities.count())
+
+    def test_query_count_is_independent_of_facility_count(self):
+        with self.assertNumQueries(1):
+            list(self._filter({"service_category": self.categories}))
+
+        for i in range(10):
+            facility = mommy.make(Facility)
+            mommy.make(
+                FacilityService, facility=facility, service=self.service)
+            mommy.make(
+                FacilityService, facility=facility, service=self.service_2)
+
+        with self.assertNumQueries(1):
+            facilities = list(
+                self._filter({"service_category": self.categories}))
+        self.assertEquals(11, len(facilities))
+
+
+class TestFacilityIdFilters(LoginMixin, APITestCase):
+
+    def setUp(self):
+        super(TestFacilityIdFilters, self).setUp()
+        self.url = reverse("api:facilities:facilities_list")
+        self.county = mommy.make(County)
+        self.ward = mommy.make(
+            Ward, constituency=mommy.make(Constituency, county=self.county))
+        self.facility = mommy.make(Facility, ward=self.ward)
+        self.other_facility = mommy.make(Facility)
+
+    def test_filter_by_ids(self):
+        facilities = FacilityFilter(
+            {"county": "{},".format(self.county.id)},
+            queryset=Facility.objects.all()).qs
+        self.assertEquals([self.facility], list(facilities))
+
+        facilities = FacilityFilter(
+            {"id": "{},{}".format(self.facility.id, self.other_facility.id)},
+            queryset=Facility.objects.all()).qs
+        self.assertEquals(2, facilities.count())
+
+    def test_ids_are_matched_exactly(self):
+        with CaptureQueriesContext(connection) as queries:
+            list(FacilityFilter(
+                {"ward": str(self.ward.id)},
+                queryset=Facility.objects.all()).qs)
+        sql = queries[0]['sql']
+        self.assertIn('"ward_id" IN', sql)
+        self.assertNotIn('LIKE', sql.upper())
+
+    def test_malformed_ids_are_rejected(self):
+        response = self.client.get(self.url + "?ward=nairobi")
+        self.assertEquals(400, response.status_code)
+        response = self.client.get(
+            self.url + "?county={},{}".format(self.county.id, "1"))
+        self.assertEquals(400, response.status_code)
+        # reported against the parameter that was sent, not the lookup
+        self.assertEquals(["county"], list(response.data.keys()))
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_facility_filters', facilities=20, stdout=out)
+        self.assertIn('Facilities: 22', out.getvalue())
+        self.assertIn('?ward={}'.format(self.ward.id), out.getvalue())
+        # the facilities added for the benchmark are rolled back
+        self.assertEquals(2, Facility.objects.count())
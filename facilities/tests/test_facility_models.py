@@ -17,6 +17,7 @@ from common.models import (
     Town
 )
 
+from ..serializers import FacilitySerializer, FacilityListSerializer
 from ..models import (
     OwnerType,
     Owner,
@@ -1074,3 +1075,54 @@ class TestFacilityUpgrade(BaseTestCase):
         self.assertEquals(1, FacilityUpgrade.objects.count())
         facility_level_change.is_cancelled = True
         facility_level_change.save()
+
+
+class TestFacilityListAnnotations(BaseTestCase):
+
+    def _make_facility(self):
+        facility = mommy.make(Facility)
+        service = mommy.make(FacilityService, facility=facility)
+        mommy.make(FacilityServiceRating, rating=2, facility_service=service)
+        mommy.make(FacilityServiceRating, rating=5, facility_service=service)
+        mommy.make(FacilityApproval, facility=facility, comment="okay")
+        regulation_status = mommy.make(RegulationStatus)
+        mommy.make(
+            FacilityRegulationStatus, facility=facility,
+            regulation_status=regulation_status)
+        return facility
+
+    def test_annotated_values_match_per_instance_lookups(self):
+        facility = self._make_facility()
+        mommy.make(Facility)
+        annotated = Facility.objects.with_list_annotations().get(
+            id=facility.id)
+        plain = Facility.objects.get(id=facility.id)
+        for attr in [
+                'is_approved', 'latest_approval_date', 'latest_update',
+                'latest_approval_or_rejection', 'regulatory_status_name',
+                'average_rating', 'get_facility_services']:
+            self.assertEquals(getattr(plain, attr), getattr(annotated, attr))
+
+    def test_annotated_values_without_related_records(self):
+        facility = mommy.make(Facility)
+        annotated = Facility.objects.with_list_annotations().get(
+            id=facility.id)
+        self.assertFalse(annotated.is_approved)
+        self.assertIsNone(annotated.latest_approval_date)
+        self.assertIsNone(annotated.latest_update)
+        self.assertIsNone(annotated.latest_approval_or_rejection)
+        self.assertEquals(0, annotated.average_rating)
+        self.assertEquals(
+            self.default_regulation_status.name,
+            annotated.regulatory_status_name)
+
+    def test_serializing_a_page_takes_a_fixed_number_of_queries(self):
+        for i in range(5):
+            self._make_facility()
+        # main query + facility services and contacts prefetches
+        with self.assertNumQueries(3):
+            FacilitySerializer(
+                Facility.objects.with_list_annotations(), many=True).data
+        with self.assertNumQueries(3):
+            FacilityListSerializer(
+                Facility.objects.with_list_annotations(), many=True).data
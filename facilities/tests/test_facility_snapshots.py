@@ -0,0 +1,67 @@
+from datetime import date
+
+from django.core.management import call_command
+from django.utils.six import StringIO
+
+from model_mommy import mommy
+
+from common.models import County, Constituency, Ward
+from common.tests.test_models import BaseTestCase
+
+from ..models import (
+    Facility,
+    FacilityStatsSnapshot,
+    FacilityStatus,
+    FacilityType,
+    Owner,
+    snapshot_facility_stats
+)
+
+
+class TestFacilityStatsSnapshot(BaseTestCase):
+
+    def setUp(self):
+        super(TestFacilityStatsSnapshot, self).setUp()
+        self.county = mommy.make(County)
+        constituency = mommy.make(Constituency, county=self.county)
+        self.ward = mommy.make(Ward, constituency=constituency)
+        self.facility_type = mommy.make(FacilityType)
+        self.owner = mommy.make(Owner)
+        self.status = mommy.make(FacilityStatus)
+
+    def _make_facility(self, **kwargs):
+        return mommy.make(
+            Facility, ward=self.ward, facility_type=self.facility_type,
+            owner=self.owner, operation_status=self.status, **kwargs)
+
+    def test_snapshot(self):
+        self._make_facility(number_of_beds=2, number_of_cots=1)
+        self._make_facility(number_of_beds=2, number_of_cots=1)
+        self.assertEquals(1, snapshot_facility_stats(date(2015, 9, 1)))
+        snapshot = FacilityStatsSnapshot.objects.get()
+        self.assertEquals(self.county, snapshot.county)
+        self.assertEquals(self.owner.owner_type, snapshot.owner_type)
+        self.assertEquals(
+            (date(2015, 9, 1), 2, 4, 2),
+            (snapshot.date, snapshot.facilities, snapshot.beds,
+             snapshot.cots))
+        self.assertEquals('2015-09-01: 2 facilities', str(snapshot))
+
+    def test_snapshots_replace_the_days_earlier_snapshot(self):
+        self._make_facility()
+        snapshot_facility_stats(date(2015, 9, 1))
+        self._make_facility()
+        snapshot_facility_stats(date(2015, 9, 1))
+        snapshot_facility_stats(date(2015, 9, 2))
+        self.assertEquals(
+            [2, 2],
+            list(FacilityStatsSnapshot.objects.values_list(
+                'facilities', flat=True)))
+
+    def test_snapshot_command(self):
+        self._make_facility()
+        out = StringIO()
+        call_command('snapshot_facility_stats', stdout=out)
+        call_command('snapshot_facility_stats', stdout=out)
+        self.assertIn('Stored 1 snapshot rows', out.getvalue())
+        self.assertEquals(1, FacilityStatsSnapshot.objects.count())
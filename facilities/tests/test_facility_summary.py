@@ -0,0 +1,245 @@
+import csv
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.six import StringIO
+
+from rest_framework.test import APITestCase
+from model_mommy import mommy
+
+from common.models import County, UserCounty
+from common.tests.test_models import BaseTestCase
+from common.tests.test_views import LoginMixin
+
+from ..models import (
+    Facility,
+    FacilityApproval,
+    FacilityRegulationStatus,
+    FacilityService,
+    FacilityServiceRating,
+    FacilitySummary,
+    FacilityType,
+    Service,
+    ServiceCategory,
+    RegulationStatus,
+    rebuild_facility_summaries
+)
+from ..views import FacilitySummaryListView
+
+
+class TestFacilitySummary(BaseTestCase):
+
+    def test_summary_created_on_facility_save(self):
+        facility = mommy.make(Facility, name='Mama Lucy')
+        summary = FacilitySummary.objects.get(facility=facility)
+        self.assertEquals('Mama Lucy', summary.name)
+        self.assertEquals('Mama Lucy', str(summary))
+        self.assertEquals(facility.county, summary.county_name)
+        self.assertEquals(facility.constituency, summary.constituency_name)
+        self.assertEquals(facility.ward_name, summary.ward_name)
+        self.assertEquals(
+            facility.facility_type_name, summary.facility_type_name)
+        self.assertEquals(
+            self.default_regulation_status.name,
+            summary.regulatory_status_name)
+        self.assertFalse(summary.is_approved)
+
+        facility.name = 'Mama Lucy Kibaki'
+        facility.save()
+        self.assertEquals(
+            'Mama Lucy Kibaki',
+            FacilitySummary.objects.get(facility=facility).name)
+
+    def test_summary_follows_child_records(self):
+        facility = mommy.make(Facility)
+        category = mommy.make(ServiceCategory)
+        facility_service = mommy.make(
+            FacilityService, facility=facility,
+            service=mommy.make(Service, category=category))
+        mommy.make(
+            FacilityServiceRating, rating=4, facility_service=facility_service)
+        mommy.make(FacilityApproval, facility=facility)
+
+        summary = FacilitySummary.objects.get(facility=facility)
+        self.assertEquals([category.id], summary.service_categories)
+        self.assertEquals(4, summary.average_rating)
+        self.assertTrue(summary.is_approved)
+
+    def test_summary_removed_with_facility(self):
+        facility = mommy.make(Facility)
+        facility.delete()
+        self.assertFalse(
+            FacilitySummary.objects.filter(facility=facility).exists())
+
+    def test_lookup_renames_propagate(self):
+        facility = mommy.make(Facility)
+        county = County.objects.get(id=facility.ward.constituency.county_id)
+        county.name = 'Renamed County'
+        county.save()
+        facility_type = facility.facility_type
+        facility_type.name = 'Renamed Type'
+        facility_type.save()
+
+        summary = FacilitySummary.objects.get(facility=facility)
+        self.assertEquals('Renamed County', summary.county_name)
+        self.assertEquals('Renamed Type', summary.facility_type_name)
+
+    def test_regulation_status_renames_propagate(self):
+        facility = mommy.make(Facility)
+        status = mommy.make(RegulationStatus, name='Licensed')
+        mommy.make(
+            FacilityRegulationStatus, facility=facility,
+            regulation_status=status)
+        self.assertEquals(
+            'Licensed',
+            FacilitySummary.objects.get(
+                facility=facility).regulatory_status_name)
+
+        status.name = 'Licensed and gazetted'
+        status.save()
+        self.assertEquals(
+            'Licensed and gazetted',
+            FacilitySummary.objects.get(
+                facility=facility).regulatory_status_name)
+
+    def test_rebuild(self):
+        mommy.make(Facility, _quantity=3)
+        FacilitySummary.objects.all().delete()
+        self.assertEquals(3, rebuild_facility_summaries(chunk_size=2))
+        self.assertEquals(3, FacilitySummary.objects.count())
+
+    def test_rebuild_command(self):
+        mommy.make(Facility, _quantity=2)
+        FacilitySummary.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_facility_summary', stdout=out)
+        self.assertIn('Summarized 2 facilities', out.getvalue())
+        self.assertEquals(2, FacilitySummary.objects.count())
+
+
+class TestFacilitySummaryView(LoginMixin, APITestCase):
+
+    def setUp(self):
+        super(TestFacilitySummaryView, self).setUp()
+        self.url = reverse('api:facilities:facility_summaries_list')
+
+    def test_listing(self):
+        facility = mommy.make(Facility, name='Kenyatta')
+        response = self.client.get(self.url)
+        self.assertEquals(200, response.status_code)
+        self.assertEquals(1, response.data['count'])
+        result = response.data['results'][0]
+        self.assertEquals(str(facility.id), str(result['id']))
+        self.assertEquals('Kenyatta', result['name'])
+        self.assertEquals(facility.county, result['county'])
+        self.assertEquals(facility.constituency, result['constituency'])
+
+    def _make_tied_summaries(self):
+        """Summaries that only their facility ids tell apart"""
+        mommy.make(Facility, _quantity=5)
+        now = timezone.now()
+        FacilitySummary.objects.update(updated=now, created=now)
+        return [
+            str(facility_id) for facility_id in
+            FacilitySummary.objects.order_by('-facility_id').values_list(
+                'facility_id', flat=True)
+        ]
+
+    def test_cursor_pages_with_equal_timestamps(self):
+        expected = self._make_tied_summaries()
+        response = self.client.get(self.url + '?cursor=&page_size=2')
+        seen = [str(result['id']) for result in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            seen.extend(
+                str(result['id']) for result in response.data['results'])
+        self.assertEquals(expected, seen)
+
+        previous = self.client.get(response.data['previous'])
+        self.assertEquals(
+            expected[2:4],
+            [str(result['id']) for result in previous.data['results']])
+
+    def test_stream_chunks_with_equal_timestamps(self):
+        expected = self._make_tied_summaries()
+        chunk_size = FacilitySummaryListView.stream_chunk_size
+        FacilitySummaryListView.stream_chunk_size = 2
+        try:
+            response = self.client.get(self.url + '?format=csv&stream=true')
+            lines = b''.join(response.streaming_content).splitlines()
+        finally:
+            FacilitySummaryListView.stream_chunk_size = chunk_size
+        self.assertEquals(200, response.status_code)
+        self.assertEquals(
+            expected, [row['id'] for row in csv.DictReader(lines)])
+
+    def test_filtering(self):
+        facility_type = mommy.make(FacilityType)
+        facility = mommy.make(Facility, facility_type=facility_type)
+        mommy.make(Facility)
+        response = self.client.get(
+            self.url + '?facility_type={}'.format(facility_type.id))
+        self.assertEquals(200, response.status_code)
+        self.assertEquals(1, response.data['count'])
+        self.assertEquals(
+            str(facility.id), str(response.data['results'][0]['id']))
+
+    def test_filtering_by_service_category(self):
+        category_a = mommy.make(ServiceCategory)
+        category_b = mommy.make(ServiceCategory)
+        both = mommy.make(Facility)
+        only_a = mommy.make(Facility)
+        mommy.make(Facility)
+        for facility, category in [
+                (both, category_a), (both, category_b), (only_a, category_a)]:
+            mommy.make(
+                FacilityService, facility=facility,
+                service=mommy.make(Service, category=category))
+
+        categories = '{},{}'.format(category_a.id, category_b.id)
+        response = self.client.get(
+            self.url + '?service_category={}'.format(categories))
+        self.assertEquals(1, response.data['count'])
+
+        response = self.client.get(
+            self.url + '?service_category={}&service_category_mode=any'.format(
+                categories))
+        self.assertEquals(2, response.data['count'])
+
+        response = self.client.get(self.url + '?service_category=')
+        self.assertEquals(3, response.data['count'])
+
+
+class TestFacilitySummaryScope(APITestCase):
+
+    def setUp(self):
+        password = 'mtihani123'
+        self.user = get_user_model().objects.create_superuser(
+            email='tester@ehealth.or.ke', first_name='Test',
+            username='test', employee_number='1241414141',
+            password=password, is_national=False)
+        self.facility = mommy.make(Facility)
+        mommy.make(Facility)
+        mommy.make(
+            UserCounty, user=self.user,
+            county_id=self.facility.ward.constituency.county_id)
+        self.client.login(email='tester@ehealth.or.ke', password=password)
+        self.url = reverse('api:facilities:facility_summaries_list')
+
+    def test_scoped_without_joins(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEquals(200, response.status_code)
+        self.assertEquals(
+            [str(self.facility.id)],
+            [str(result['id']) for result in response.data['results']])
+        summary_queries = [
+            query['sql'] for query in queries
+            if 'facilities_facilitysummary' in query['sql']]
+        self.assertTrue(summary_queries)
+        for sql in summary_queries:
+            self.assertNotIn('common_ward', sql)
@@ -3,15 +3,22 @@ from datetime import timedelta
 
 from django.core.urlresolvers import reverse
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.signals import request_finished
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
 from django.utils import timezone
 
-from rest_framework.test import APITestCase
+from rest_framework import serializers
+from rest_framework.test import (
+    APIRequestFactory, APITestCase, force_authenticate)
 from model_mommy import mommy
 
 from common.tests.test_views import (
     LoginMixin,
     default
 )
+from common.serializers import narrow_queryset
 from common.models import (
     Ward, UserCounty,
     County,
@@ -32,11 +39,13 @@ from ..serializers import (
     FacilityUnitRegulationSerializer,
     FacilityUpdatesSerializer
 )
+from ..views import facility_dashboard
 from ..models import (
     OwnerType,
     Owner,
     FacilityStatus,
     Facility,
+    FacilityCountCube,
     FacilityUnit,
     FacilityRegulationStatus,
     FacilityType,
@@ -575,6 +584,53 @@ class TestFacilityView(LoginMixin, TestGroupAndPermissions, APITestCase):
             ],
             response.data.get("results"))
 
+    def test_partial_response_reads_only_the_requested_columns(self):
+        facility = mommy.make(Facility)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url + "?fields=id,name,code")
+        self.assertEquals(
+            [
+                {
+                    "id": str(facility.id),
+                    "name": facility.name,
+                    "code": facility.code
+                }
+            ],
+            response.data.get("results"))
+
+        listing = [
+            query['sql'] for query in queries.captured_queries
+            if '"facilities_facility"."name"' in query['sql']
+        ]
+        self.assertEquals(1, len(listing))
+        self.assertNotIn('JOIN', listing[0])
+        self.assertNotIn('annotated_', listing[0])
+        self.assertNotIn('"facilities_facility"."description"', listing[0])
+
+    def test_partial_response_keeps_what_computed_fields_need(self):
+        facility = mommy.make(Facility)
+        fields = FacilitySerializer().fields
+        queryset = narrow_queryset(
+            Facility.objects.with_list_annotations(),
+            [fields['county'], fields['is_approved']])
+        self.assertEquals(
+            {'ward': {'constituency': {'county': {}}}},
+            queryset.query.select_related)
+        self.assertEquals([], queryset._prefetch_related_lookups)
+        sql = str(queryset.query)
+        self.assertIn('annotated_is_approved', sql)
+        self.assertNotIn('annotated_latest_update', sql)
+
+        with self.assertNumQueries(1):
+            narrowed = queryset.get(pk=facility.pk)
+            self.assertEquals(facility.county, narrowed.county)
+            self.assertFalse(narrowed.is_approved)
+
+        # what method fields read can not be told
+        unchanged = Facility.objects.with_list_annotations()
+        self.assertIs(unchanged, narrow_queryset(
+            unchanged, [serializers.SerializerMethodField()]))
+
     def test_partial_response_on_get_single_endpoint(self):
         facility = mommy.make(Facility)
         url = self.url + "{}/?fields=id,name".format(str(facility.id))
@@ -587,6 +643,43 @@ class TestFacilityView(LoginMixin, TestGroupAndPermissions, APITestCase):
             response.data
         )
 
+    def test_nested_partial_response_on_get_single_endpoint(self):
+        facility = mommy.make(Facility)
+        unit = mommy.make(FacilityUnit, facility=facility)
+        facility_service = mommy.make(FacilityService, facility=facility)
+        url = self.url + "{}/?fields=name,facility_units(name),{}".format(
+            str(facility.id), "facility_services(service_name)")
+        response = self.client.get(url)
+        self.assertEquals(200, response.status_code)
+        self.assertEquals(
+            {
+                "name": facility.name,
+                "facility_units": [{"name": unit.name}],
+                "facility_services": [
+                    {"service_name": facility_service.service.name}
+                ]
+            },
+            load_dump(response.data, default=default)
+        )
+
+    def test_malformed_partial_response(self):
+        facility = mommy.make(Facility)
+        url = self.url + "{}/?fields=name,facility_units(name".format(
+            str(facility.id))
+        self.assertEquals(400, self.client.get(url).status_code)
+
+    def test_nested_serializers_are_prefetched(self):
+        fields = FacilityDetailSerializer().fields
+        queryset = narrow_queryset(
+            Facility.objects.all(),
+            [fields['name'], fields['facility_units']])
+        self.assertEquals(
+            ['facility_units'],
+            [
+                lookup.prefetch_to
+                for lookup in queryset._prefetch_related_lookups
+            ])
+
 
 class CountyAndNationalFilterBackendTest(APITestCase):
 
@@ -1132,6 +1225,133 @@ class TestDashBoardView(LoginMixin, APITestCase):
         self.assertEquals(200, response.status_code)
         self.assertEquals(response.data, {"recently_created": 3})
 
+    def _count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEquals(200, response.status_code)
+        return len(queries)
+
+    def test_query_count_is_independent_of_facility_count(self):
+        mommy.make(Facility)
+        query_count = self._count_queries(self.url)
+
+        for i in range(5):
+            mommy.make(
+                Facility,
+                ward=mommy.make(Ward),
+                facility_type=mommy.make(FacilityType),
+                owner=mommy.make(Owner),
+                operation_status=mommy.make(FacilityStatus))
+        self.assertEquals(query_count, self._count_queries(self.url))
+        self.assertEquals(
+            6, self.client.get(self.url).data["total_facilities"])
+
+    def test_unrequested_summaries_are_not_computed(self):
+        mommy.make(Facility)
+        query_count = self._count_queries(self.url)
+        url = self.url + "?fields=total_facilities"
+        self.assertLess(self._count_queries(url), query_count)
+        self.assertEquals(
+            {"total_facilities": 1}, self.client.get(url).data)
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    })
+class TestDashBoardCache(LoginMixin, APITestCase):
+
+    def setUp(self):
+        super(TestDashBoardCache, self).setUp()
+        cache.clear()
+        self.url = reverse('api:facilities:dashboard')
+        mommy.make(Facility)
+
+    def _count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEquals(200, response.status_code)
+        return len(queries), response.data
+
+    def test_dashboards_are_cached_per_variant(self):
+        cold_count, data = self._count_queries(self.url)
+        warm_count, cached = self._count_queries(self.url)
+        self.assertLess(warm_count, cold_count)
+        self.assertEquals(data, cached)
+
+        url = self.url + "?fields=total_facilities"
+        self.assertEquals({"total_facilities": 1}, self.client.get(url).data)
+        week_count, _ = self._count_queries(self.url + "?last_week=true")
+        self.assertGreater(week_count, warm_count)
+
+    def test_stale_dashboards_are_served_then_rebuilt(self):
+        url = self.url + "?fields=total_facilities"
+        self.client.get(url)
+        mommy.make(Facility)
+        # the rebuild happens once the stale response has been sent
+        self.assertEquals({"total_facilities": 1}, self.client.get(url).data)
+        self.assertEquals({"total_facilities": 2}, self.client.get(url).data)
+
+    def test_rebuilds_wait_for_the_request_to_finish(self):
+        url = self.url + "?fields=total_facilities"
+        self.client.get(url)
+        mommy.make(Facility)
+
+        def get_dashboard():
+            request = APIRequestFactory().get(url)
+            force_authenticate(request, user=self.user)
+            return facility_dashboard.DashBoard.as_view()(request).data
+
+        self.assertEquals({"total_facilities": 1}, get_dashboard())
+        self.assertEquals({"total_facilities": 1}, get_dashboard())
+        request_finished.send(sender=self.__class__)
+        self.assertEquals({"total_facilities": 2}, get_dashboard())
+
+    def test_old_dashboards_are_rebuilt(self):
+        url = self.url + "?fields=total_facilities"
+        self.client.get(url)
+        # bulk updates do not bump the data version
+        FacilityCountCube.objects.update(facilities=0)
+        self.assertEquals({"total_facilities": 1}, self.client.get(url).data)
+        self.assertEquals({"total_facilities": 1}, self.client.get(url).data)
+
+        fresh_seconds = facility_dashboard.DASHBOARD_FRESH_SECONDS
+        facility_dashboard.DASHBOARD_FRESH_SECONDS = -1
+        try:
+            self.assertEquals(
+                {"total_facilities": 1}, self.client.get(url).data)
+            self.assertEquals(
+                {"total_facilities": 0}, self.client.get(url).data)
+        finally:
+            facility_dashboard.DASHBOARD_FRESH_SECONDS = fresh_seconds
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    })
+class TestFacilityListCountCache(LoginMixin, APITestCase):
+
+    def setUp(self):
+        super(TestFacilityListCountCache, self).setUp()
+        cache.clear()
+        self.url = reverse('api:facilities:facilities_list')
+
+    def test_service_changes_invalidate_category_counts(self):
+        service = mommy.make(Service, category=mommy.make(ServiceCategory))
+        mommy.make(FacilityService, service=service)
+        facility = mommy.make(Facility)
+        url = self.url + "?service_category={}".format(service.category.id)
+        self.assertEquals(1, self.client.get(url).data['count'])
+
+        # only the subquery's table is written to
+        mommy.make(FacilityService, service=service, facility=facility)
+        self.assertEquals(2, self.client.get(url).data['count'])
+
 
 class TestFacilityContactView(LoginMixin, APITestCase):
 
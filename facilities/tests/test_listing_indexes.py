@@ -0,0 +1,56 @@
+from django.core.management import call_command, CommandError
+from django.test import TestCase
+from django.utils.six import StringIO
+
+from rest_framework.test import APITestCase
+from model_mommy import mommy
+
+from common.tests.test_views import LoginMixin
+
+from ..management.commands import check_listing_indexes
+from ..models import Facility, FacilityApproval, FacilityService
+
+
+class TestCheckListingIndexes(LoginMixin, APITestCase):
+
+    def setUp(self):
+        super(TestCheckListingIndexes, self).setUp()
+        facility = mommy.make(Facility)
+        mommy.make(FacilityApproval, facility=facility)
+        mommy.make(FacilityService, facility=facility)
+        self.checked_listings = check_listing_indexes.CHECKED_LISTINGS
+
+    def tearDown(self):
+        check_listing_indexes.CHECKED_LISTINGS = self.checked_listings
+        super(TestCheckListingIndexes, self).tearDown()
+
+    def test_listings_use_their_indexes(self):
+        out = StringIO()
+        call_command('check_listing_indexes', stdout=out)
+        self.assertIn('uses facilities_facility_listing_idx', out.getvalue())
+        self.assertNotIn('does not read', out.getvalue())
+
+    def test_unused_index(self):
+        check_listing_indexes.CHECKED_LISTINGS = (
+            ('api:facilities:facilities_list', '',
+             'facilities_facility', 'no_such_idx'),
+        )
+        out = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('check_listing_indexes', stdout=out)
+        self.assertIn('does not read facilities_facility', out.getvalue())
+
+    def test_failed_request(self):
+        check_listing_indexes.CHECKED_LISTINGS = (
+            ('api:facilities:facilities_list', '?ward=nairobi',
+             'facilities_facility', 'facilities_facility_listing_idx'),
+        )
+        with self.assertRaises(CommandError):
+            call_command('check_listing_indexes', stdout=StringIO())
+
+
+class TestCheckListingIndexesWithoutSuperuser(TestCase):
+
+    def test_needs_a_superuser(self):
+        with self.assertRaises(CommandError):
+            call_command('check_listing_indexes', stdout=StringIO())
@@ -0,0 +1,62 @@
+from django.test import TestCase
+
+from model_mommy import mommy
+
+from users.models import UserScope
+
+from ..models import Facility, FacilitySummary, FacilityUpdates
+from ..visibility import (
+    VISIBILITY_RULES,
+    filter_visible,
+    get_visibility_filter,
+    get_visibility_flags
+)
+
+
+class TestVisibilityPolicy(TestCase):
+
+    def _scope(self, *without):
+        permissions = [
+            permission for flag, (permission, _) in VISIBILITY_RULES.items()
+            if flag not in without
+        ]
+        return UserScope(is_active=True, permissions=permissions)
+
+    def test_flags(self):
+        self.assertEquals(
+            ('approved', 'closed', 'is_classified', 'is_published',
+             'rejected'),
+            get_visibility_flags(Facility))
+        self.assertEquals(
+            Facility.visibility_flags, get_visibility_flags(FacilitySummary))
+        # undeclared flags are read off the fields
+        self.assertEquals(
+            ('approved', ), get_visibility_flags(FacilityUpdates))
+
+    def test_filters_are_compiled_once(self):
+        scope = self._scope('rejected', 'closed')
+        visibility = get_visibility_filter(Facility, scope)
+        self.assertEquals(
+            sorted([('closed', False), ('rejected', False)]),
+            sorted(visibility.children))
+        self.assertIs(
+            visibility,
+            get_visibility_filter(Facility, self._scope('rejected', 'closed')))
+
+    def test_filter_visible(self):
+        visible = mommy.make(Facility, rejected=False)
+        mommy.make(Facility, rejected=True)
+        queryset = Facility.objects.all()
+
+        self.assertEquals(
+            [visible],
+            list(filter_visible(queryset, self._scope('rejected'))))
+        self.assertIs(queryset, filter_visible(queryset, self._scope()))
+        superuser = UserScope(is_active=True, is_superuser=True)
+        self.assertIs(queryset, filter_visible(queryset, superuser))
+
+    def test_related_models(self):
+        scope = self._scope('closed')
+        self.assertEquals(
+            [('facility__closed', False)],
+            get_visibility_filter(Facility, scope, 'facility__').children)
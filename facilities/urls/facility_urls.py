@@ -52,6 +52,7 @@ from ..views import (
     FacilityCorrectionTemplate,
     DashBoard,
     FacilityListReadOnlyView,
+    FacilitySummaryListView,
     FacilityOfficerDetailView,
     FacilityOfficerListView,
     RegulatoryBodyUserListView,
@@ -269,6 +270,8 @@ urlpatterns = patterns(
 
     url(r'^facilities_list/$', FacilityListReadOnlyView.as_view(),
         name='facilities_read_list'),
+    url(r'^facility_summaries/$', FacilitySummaryListView.as_view(),
+        name='facility_summaries_list'),
     url(r'^facilities/$', FacilityListView.as_view(), name='facilities_list'),
     url(r'^facilities/(?P<pk>[^/]+)/$', FacilityDetailView.as_view(),
         name='facility_detail'),
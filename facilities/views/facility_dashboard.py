@@ -1,9 +1,21 @@
+import hashlib
+import threading
+import time
+
 from datetime import timedelta
 
+from django.core.cache import cache
+from django.core.signals import request_finished
+from django.db.models import Sum
+from django.dispatch import receiver
 from django.utils import timezone
+from django.utils.encoding import force_bytes
 
+from rest_framework.compat import OrderedDict
 from rest_framework.views import APIView, Response
-from common.models import County, Constituency, Ward
+from common.constants import RECENT_PERIODS
+from common.models import County, Constituency, Ward, get_model_versions
+from users.middleware import get_request_scope
 
 from ..models import (
     OwnerType,
@@ -11,189 +23,229 @@ from ..models import (
     FacilityStatus,
     FacilityType,
     Facility,
+    FacilityCountCube,
+)
+from ..visibility import filter_visible
+
+
+DASHBOARD_CACHE_KEY = 'dashboard:{}'
+DASHBOARD_CACHE_SECONDS = 60 * 60 * 24
+DASHBOARD_FRESH_SECONDS = 60 * 15
+DASHBOARD_LOCK_SECONDS = 60 * 5
+
+# writing to any of these makes the cached dashboards stale
+DASHBOARD_MODELS = (
+    Facility, County, Constituency, Ward, Owner, OwnerType, FacilityType,
+    FacilityStatus, FacilityCountCube,
 )
 
 
+# the rebuilds waiting for the current thread's response to be sent
+_pending_revalidations = threading.local()
+
+
+class DashboardRevalidation(object):
+
+    """
+    Rebuilds a stale cached dashboard once the response has been sent.
+
+    Revalidations are queued per thread and run from `request_finished`,
+    which the server sends after the response of the thread's request has
+    been written out and closed.
+    """
+
+    def __init__(self, view, key, version):
+        self.view = view
+        self.key = key
+        self.version = version
+
+    def schedule(self):
+        if not hasattr(_pending_revalidations, 'queue'):
+            _pending_revalidations.queue = []
+        _pending_revalidations.queue.append(self)
+
+    def run(self):
+        try:
+            self.view.cache_dashboard(self.key, self.version)
+        finally:
+            cache.delete(self.key + ':lock')
+
+
+@receiver(request_finished, dispatch_uid='dashboard_revalidation')
+def _run_pending_revalidations(sender, **kwargs):
+    queue = getattr(_pending_revalidations, 'queue', None)
+    _pending_revalidations.queue = []
+    for revalidation in queue or []:
+        revalidation.run()
+
+
 class DashBoard(APIView):
+    @property
+    def scope(self):
+        return get_request_scope(self.request)
+
     def get_queryset(self, *args, **kwargs):
-        return Facility.objects.all()
+        return filter_visible(Facility.objects.all(), self.scope)
+
+    def get_cube(self):
+        """The `FacilityCountCube` rows of the facilities in scope"""
+        cube = filter_visible(FacilityCountCube.objects.all(), self.scope)
+        county = self.get_scope_county()
+        return cube.filter(county=county) if county else cube
+
+    def summarize(self, group_by, choices):
+        """
+        Count the facilities of each of the `choices` ( `(pk, name)` rows )
+        by summing the cube rows of each `group_by` cube column.
+        """
+        counts = dict(
+            self.get_cube().order_by().values_list(
+                group_by).annotate(count=Sum('facilities')))
+        return [
+            {
+                "name": name,
+                "count": counts.get(pk, 0)
+            }
+            for pk, name in choices
+        ]
+
+    def top(self, summary, limit):
+        return sorted(
+            summary, key=lambda item: item["count"], reverse=True)[:limit]
 
     def get_facility_county_summary(self):
-        counties = County.objects.all()
-        facility_county_summary = {}
-        for county in counties:
-            facility_county_count = self.filter_queryset().filter(
-                ward__constituency__county=county).count()
-            facility_county_summary[str(county.name)] = facility_county_count
-        top_10_counties = sorted(
-            facility_county_summary.items(),
-            key=lambda x: x[1], reverse=True)[0:20]
-        facility_county_summary
-        top_10_counties_summary = []
-        for item in top_10_counties:
-            top_10_counties_summary.append(
-                {
-                    "name": item[0],
-                    "count": item[1]
-                })
-        if self.request.user.is_national:
-            return top_10_counties_summary
-        else:
+        if not self.scope.is_national:
             return []
+        counties = County.objects.values_list('id', 'name')
+        return self.top(
+            self.summarize('county', counties), 20)
 
     def get_facility_constituency_summary(self):
+        if not self.scope.county:
+            return []
         constituencies = Constituency.objects.filter(
-            county=self.request.user.county)
-        constituencies = constituencies if self.request.user.county else []
-
-        facility_constituency_summary = {}
-        for const in constituencies:
-            facility_const_count = self.filter_queryset().filter(
-                ward__constituency=const).count()
-            facility_constituency_summary[
-                str(const.name)] = facility_const_count
-        top_10_consts = sorted(
-            facility_constituency_summary.items(),
-            key=lambda x: x[1], reverse=True)[0:20]
-        top_10_consts_summary = []
-        for item in top_10_consts:
-            top_10_consts_summary.append(
-                {
-                    "name": item[0],
-                    "count": item[1]
-                })
-        return top_10_consts_summary
+            county=self.scope.county).values_list('id', 'name')
+        return self.top(
+            self.summarize('constituency', constituencies), 20)
 
     def get_facility_ward_summary(self):
-        if self.request.user.constituency:
-            wards = Ward.objects.filter(
-                constituency=self.request.user.constituency)
-        else:
-            wards = []
-        facility_ward_summary = {}
-        for ward in wards:
-            facility_ward_count = self.filter_queryset().filter(
-                ward=ward).count()
-            facility_ward_summary[str(ward.name)] = facility_ward_count
-        top_10_wards = sorted(
-            facility_ward_summary.items(),
-            key=lambda x: x[1], reverse=True)[0:20]
-        top_10_wards_summary = []
-        for item in top_10_wards:
-            top_10_wards_summary.append(
-                {
-                    "name": item[0],
-                    "count": item[1]
-                })
-        return top_10_wards_summary
+        if not self.scope.constituency:
+            return []
+        wards = Ward.objects.filter(
+            constituency=self.scope.constituency).values_list('id', 'name')
+        return self.top(self.summarize('ward', wards), 20)
 
     def get_facility_type_summary(self):
-        facility_types = FacilityType.objects.all()
-        facility_type_summary = []
-        for facility_type in facility_types:
-                facility_type_summary.append(
-                    {
-                        "name": facility_type.name,
-                        "count": self.filter_queryset().filter(
-                            facility_type=facility_type).count()
-                    })
-        facility_type_summary_sorted = sorted(
-            facility_type_summary,
-            key=lambda x: x, reverse=True)[0:5]
-
-        return facility_type_summary_sorted
+        facility_types = FacilityType.objects.values_list('id', 'name')
+        return self.top(self.summarize('facility_type', facility_types), 5)
 
     def get_facility_owner_summary(self):
-        owners = Owner.objects.all()
-        facility_owners_summary = []
-        for owner in owners:
-            facility_owners_summary.append(
-                {
-                    "name": owner.name,
-                    "count": self.filter_queryset().filter(
-                        owner=owner).count()
-                })
-        return facility_owners_summary
+        owners = Owner.objects.values_list('id', 'name')
+        return self.summarize('owner', owners)
 
     def get_facility_status_summary(self):
-        statuses = FacilityStatus.objects.all()
-        status_summary = []
-        for status in statuses:
-                status_summary.append(
-                    {
-                        "name": status.name,
-                        "count": self.filter_queryset().filter(
-                            operation_status=status).count()
-                    })
-
-        return status_summary
+        statuses = FacilityStatus.objects.values_list('id', 'name')
+        return self.summarize('operation_status', statuses)
 
     def get_facility_owner_types_summary(self):
-        owner_types = OwnerType.objects.all()
-        owner_types_summary = []
-        for owner_type in owner_types:
-            owner_types_summary.append(
-                {
-                    "name": owner_type.name,
-                    "count": self.filter_queryset().filter(
-                        owner__owner_type=owner_type).count()
-                })
-        return owner_types_summary
+        owner_types = OwnerType.objects.values_list('id', 'name')
+        return self.summarize('owner_type', owner_types)
+
+    def get_recent_period(self):
+        """The `last_*` parameter that was sent and its length in days"""
+        for param, days in RECENT_PERIODS:
+            if self.request.query_params.get(param, None):
+                return param, days
+        return RECENT_PERIODS[-1]
 
     def get_recently_created_facilities(self):
-        right_now = timezone.now()
-        last_week = self.request.query_params.get('last_week', None)
-        last_month = self.request.query_params.get('last_month', None)
-        last_three_months = self.request.query_params.get(
-            'last_three_months', None)
-        three_months_ago = right_now - timedelta(days=90)
-        if last_week:
-            weekly = right_now - timedelta(days=7)
-            return self.filter_queryset().filter(
-                created__gte=weekly).count()
-
-        if last_month:
-            monthly = right_now - timedelta(days=30)
-            return self.filter_queryset().filter(
-                created__gte=monthly).count()
-
-        if last_three_months:
-            return self.filter_queryset().filter(
-                created__gte=three_months_ago).count()
-
-        return self.filter_queryset().filter(
-            created__gte=three_months_ago).count()
+        _, days = self.get_recent_period()
+        since = timezone.now() - timedelta(days=days)
+        return self.filter_queryset().filter(created__gte=since).count()
+
+    def get_scope_county(self):
+        """The county that the dashboard is limited to, if any"""
+        scope = self.scope
+        if scope.county and not scope.is_national:
+            return scope.county
+        elif scope.constituency:
+            return scope.constituency.county
+        return None
 
     def filter_queryset(self):
-        user = self.request.user
-        if user.county and not user.is_national:
+        county = self.get_scope_county()
+        if county:
             return self.get_queryset().filter(
-                ward__constituency__county=user.county)
-        elif user.constituency:
-            return self.get_queryset().filter(
-                ward__constituency__county=user.constituency.county)
-        elif user.is_national:
-            return self.get_queryset()
-        else:
-            return self.get_queryset()
+                ward__constituency__county=county)
+        return self.get_queryset()
+
+    def get_total_facilities(self):
+        total = self.get_cube().aggregate(total=Sum('facilities'))['total']
+        return total or 0
+
+    summaries = OrderedDict((
+        ("total_facilities", get_total_facilities),
+        ("county_summary", get_facility_county_summary),
+        ("constituencies_summary", get_facility_constituency_summary),
+        ("wards_summary", get_facility_ward_summary),
+        ("owners_summary", get_facility_owner_summary),
+        ("types_summary", get_facility_type_summary),
+        ("status_summary", get_facility_status_summary),
+        ("owner_types", get_facility_owner_types_summary),
+        ("recently_created", get_recently_created_facilities),
+    ))
+
+    def get_required_summaries(self):
+        fields = self.request.query_params.get("fields", None)
+        if not fields:
+            return list(self.summaries)
+        return [name for name in self.summaries if name in fields.split(",")]
+
+    def get_dashboard(self):
+        """Only the summaries listed in `fields`, if given, are computed"""
+        return {
+            name: self.summaries[name](self)
+            for name in self.get_required_summaries()
+        }
+
+    def get_cache_key(self):
+        """Users with the same scope share their cached dashboards"""
+        variant = (
+            self.scope.key, self.get_recent_period()[0],
+            self.get_required_summaries())
+        return DASHBOARD_CACHE_KEY.format(
+            hashlib.md5(force_bytes(repr(variant))).hexdigest())
+
+    def get_data_version(self):
+        versions = get_model_versions(DASHBOARD_MODELS)
+        return sorted(
+            (model._meta.db_table, version)
+            for model, version in versions.items())
+
+    def cache_dashboard(self, key, version):
+        data = self.get_dashboard()
+        cache.set(
+            key, (version, time.time(), data), DASHBOARD_CACHE_SECONDS)
+        return data
 
     def get(self, *args, **kwargs):
-        data = {
-            "total_facilities": len(self.filter_queryset()),
-            "county_summary": self.get_facility_county_summary(),
-            "constituencies_summary": self.get_facility_constituency_summary(),
-            "wards_summary": self.get_facility_ward_summary(),
-            "owners_summary": self.get_facility_owner_summary(),
-            "types_summary": self.get_facility_type_summary(),
-            "status_summary": self.get_facility_status_summary(),
-            "owner_types": self.get_facility_owner_types_summary(),
-            "recently_created": self.get_recently_created_facilities()
-        }
-        fields = self.request.query_params.get("fields", None)
-        if fields:
-            required = fields.split(",")
-            required_data = {
-                i: data[i] for i in data if i in required
-            }
-            return Response(required_data)
-        return Response(data)
+        """
+        Serves the cached dashboard of the user's scope.
+
+        A stale dashboard i.e. one that was built before the facility data
+        last changed or more than `DASHBOARD_FRESH_SECONDS` ago is still
+        served, and is rebuilt once the response has been sent.
+        """
+        key = self.get_cache_key()
+        version = self.get_data_version()
+        cached = cache.get(key)
+        if cached is None:
+            return Response(self.cache_dashboard(key, version))
+
+        cached_version, built, data = cached
+        response = Response(data)
+        is_stale = cached_version != version or \
+            time.time() - built > DASHBOARD_FRESH_SECONDS
+        if is_stale and cache.add(key + ':lock', True, DASHBOARD_LOCK_SECONDS):
+            DashboardRevalidation(self, key, version).schedule()
+        return response
@@ -1,11 +1,16 @@
-from django.contrib.auth.models import AnonymousUser
-
 from rest_framework import generics
 from rest_framework import status
 from rest_framework.views import Response, APIView
 
-from common.views import AuditableDetailViewMixin
+from common.models import Contact, County, Constituency, Ward
+from common.views import (
+    AuditableDetailViewMixin,
+    PartialResponseQuerysetMixin,
+    StreamingExportMixin
+)
 from common.utilities import CustomRetrieveUpdateDestroyView
+from common.paginator import CachedCount, EstimatedCount
+from users.middleware import get_request_scope
 
 
 from ..models import (
@@ -18,7 +23,19 @@ from ..models import (
     FacilityUnitRegulation,
     KephLevel,
     OptionGroup,
-    FacilityLevelChangeReason
+    FacilityLevelChangeReason,
+    FacilitySummary,
+    FacilityType,
+    OwnerType,
+    FacilityStatus,
+    RegulatingBody,
+    FacilityService,
+    Service,
+    ServiceCategory,
+    Option,
+    FacilityServiceRating,
+    FacilityApproval,
+    FacilityUpdates
 )
 
 from ..serializers import (
@@ -34,7 +51,8 @@ from ..serializers import (
     KephLevelSerializer,
     OptionGroupSerializer,
     CreateFacilityOfficerMixin,
-    FacilityLevelChangeReasonSerializer
+    FacilityLevelChangeReasonSerializer,
+    FacilitySummarySerializer
 )
 
 from ..filters import (
@@ -47,9 +65,11 @@ from ..filters import (
     FacilityUnitRegulationFilter,
     KephLevelFilter,
     OptionGroupFilter,
-    FacilityLevelChangeReasonFilter
+    FacilityLevelChangeReasonFilter,
+    FacilitySummaryFilter
 
 )
+from ..visibility import filter_visible
 
 
 class QuerysetFilterMixin(object):
@@ -62,69 +82,35 @@ class QuerysetFilterMixin(object):
 
     It is not intended to be applied to all views ( it should be used
     only on views for resources that are directly linked to counties
-    e.g. facilities ).
+    e.g. facilities ). Views of models that hold their own county and
+    constituency columns point `county_lookup` and `constituency_lookup`
+    at them.
     """
+    county_lookup = 'ward__constituency__county'
+    constituency_lookup = 'ward__constituency'
+
     def get_queryset(self, *args, **kwargs):
         # The line below reflects the fact that geographic "attachment"
         # will occur at the smallest unit i.e the ward
-
-        if not isinstance(self.request.user, AnonymousUser):
-            if not self.request.user.is_national and \
-                    self.request.user.county \
-                    and hasattr(self.queryset.model, 'ward'):
-                self.queryset = self.queryset.filter(
-                    ward__constituency__county=self.request.user.county)
-
-            elif self.request.user.regulator and hasattr(
-                    self.queryset.model, 'regulatory_body'):
-                self.queryset = self.queryset.filter(
-                    regulatory_body=self.request.user.regulator)
-            elif self.request.user.is_national and not \
-                    self.request.user.county:
-                self.queryset = self.queryset
-            elif self.request.user.constituency and hasattr(
-                    self.queryset.model, 'ward'):
-                self.queryset = self.queryset.filter(
-                    ward__constituency=self.request.user.constituency)
-            else:
-                self.queryset = self.queryset
+        scope = get_request_scope(self.request)
+
+        if not scope.is_national and scope.county \
+                and hasattr(self.queryset.model, 'ward'):
+            self.queryset = self.queryset.filter(
+                **{self.county_lookup: scope.county})
+        elif scope.regulator and hasattr(
+                self.queryset.model, 'regulatory_body'):
+            self.queryset = self.queryset.filter(
+                regulatory_body=scope.regulator)
+        elif scope.is_national and not scope.county:
+            self.queryset = self.queryset
+        elif scope.constituency and hasattr(self.queryset.model, 'ward'):
+            self.queryset = self.queryset.filter(
+                **{self.constituency_lookup: scope.constituency})
         else:
             self.queryset = self.queryset
 
-        if self.request.user.has_perm(
-            "facilities.view_unpublished_facilities") \
-            is False and 'is_published' in [
-                field.name for field in
-                self.queryset.model._meta.get_fields()]:
-
-            self.queryset = self.queryset.filter(is_published=True)
-
-        if self.request.user.has_perm(
-            "facilities.view_unapproved_facilities") \
-            is False and 'approved' in [
-                field.name for field in
-                self.queryset.model._meta.get_fields()]:
-            self.queryset = self.queryset.filter(approved=True)
-
-        if self.request.user.has_perm(
-                "facilities.view_classified_facilities") \
-            is False and 'is_classified' in [
-                field.name for field in
-                self.queryset.model._meta.get_fields()]:
-            self.queryset = self.queryset.filter(is_classified=False)
-
-        if self.request.user.has_perm("facilities.view_rejected_facilities") \
-            is False and ('rejected' in [
-                field.name for field in
-                self.queryset.model._meta.get_fields()]):
-            self.queryset = self.queryset.filter(rejected=False)
-
-        if self.request.user.has_perm(
-            "facilities.view_closed_facilities") is False and \
-            'closed' in [field.name for field in
-                         self.queryset.model._meta.get_fields()]:
-            self.queryset = self.queryset.filter(closed=False)
-
+        self.queryset = filter_visible(self.queryset, scope)
         return self.queryset
 
 
@@ -270,7 +256,18 @@ class OwnerDetailView(
     serializer_class = OwnerSerializer
 
 
-class FacilityListView(QuerysetFilterMixin, generics.ListCreateAPIView):
+# the tables the facility list serializers read besides the facility's own
+FACILITY_LIST_MODELS = (
+    Ward, Constituency, County, FacilityType, Owner, OwnerType,
+    FacilityStatus, RegulatingBody, FacilityService, Service,
+    ServiceCategory, Option, FacilityServiceRating, FacilityApproval,
+    FacilityUpdates, FacilityContact, Contact
+)
+
+
+class FacilityListView(
+        PartialResponseQuerysetMixin, StreamingExportMixin,
+        QuerysetFilterMixin, generics.ListCreateAPIView):
     """
     Lists and creates facilities
 
@@ -292,7 +289,10 @@ class FacilityListView(QuerysetFilterMixin, generics.ListCreateAPIView):
     is_classified -- Boolean True/False
     is_published -- Boolean True/False
     is_regulated -- Boolean True/False
-    service_category -- A service category's pk
+    service_category -- A list of comma separated service category pks
+    service_category_mode -- `all` (default) or `any` of the categories
+    stream -- With `format=csv` or `excel`, stream all matching facilities
+    fields -- Comma separated fields to return; only what they need is read
     Created --  Date the record was Created
     Updated -- Date the record was Updated
     Created_by -- User who created the record
@@ -300,33 +300,65 @@ class FacilityListView(QuerysetFilterMixin, generics.ListCreateAPIView):
     active  -- Boolean is the record active
     deleted -- Boolean is the record deleted
     """
-    queryset = Facility.objects.all()
+    queryset = Facility.objects.with_list_annotations()
     serializer_class = FacilitySerializer
     filter_class = FacilityFilter
+    count_strategy = CachedCount
+    export_models = FACILITY_LIST_MODELS
     ordering_fields = (
         'name', 'code', 'number_of_beds', 'number_of_cots',
         'operation_status', 'ward', 'owner',
     )
 
 
-class FacilityListReadOnlyView(QuerysetFilterMixin, generics.ListAPIView):
+class FacilityListReadOnlyView(
+        PartialResponseQuerysetMixin, StreamingExportMixin,
+        QuerysetFilterMixin, generics.ListAPIView):
     """
     Returns a slimmed payload of the facility.
     """
-    queryset = Facility.objects.all()
+    queryset = Facility.objects.with_list_annotations()
     serializer_class = FacilityListSerializer
     filter_class = FacilityFilter
+    count_strategy = CachedCount
+    export_models = FACILITY_LIST_MODELS
     ordering_fields = (
         'code', 'name', 'county', 'constituency', 'facility_type_name',
         'owner_type_name', 'is_published'
     )
 
 
+class FacilitySummaryListView(
+        PartialResponseQuerysetMixin, StreamingExportMixin,
+        QuerysetFilterMixin, generics.ListAPIView):
+    """
+    Lists the denormalized facility summaries.
+
+    Returns the same payload as the slimmed facility list, read off a
+    single pre-joined table.
+    service_category -- A comma separated list of service category ids
+    service_category_mode -- `all` ( default ) or `any` of the categories
+    """
+    queryset = FacilitySummary.objects.all()
+    serializer_class = FacilitySummarySerializer
+    filter_class = FacilitySummaryFilter
+    count_strategy = EstimatedCount
+    # scoped on the summary's own columns, without joins
+    county_lookup = 'county'
+    constituency_lookup = 'constituency'
+    ordering_fields = (
+        'code', 'name', 'county_name', 'constituency_name',
+        'facility_type_name', 'owner_type_name', 'is_published'
+    )
+
+
 class FacilityDetailView(
-        QuerysetFilterMixin,
+        PartialResponseQuerysetMixin, QuerysetFilterMixin,
         AuditableDetailViewMixin, CustomRetrieveUpdateDestroyView):
     """
     Retrieves a particular facility
+
+    fields -- e.g `name,facility_services(service_name),officer_in_charge`
     """
     queryset = Facility.objects.all()
     serializer_class = FacilityDetailSerializer
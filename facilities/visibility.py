@@ -0,0 +1,76 @@
+"""
+Which facility records a user gets to see.
+
+A model's visibility flags are boolean fields that hide records from
+users without the matching permission e.g. unpublished facilities are only
+listed for users who can `view_unpublished_facilities`. Models declare
+their flags in `visibility_flags`; models that do not are assumed to use
+every flag they have a field for.
+
+The flags hidden from a user only depend on the model and the user's
+permissions, so the filter is compiled once per model and permission set.
+"""
+from django.db.models import Q
+from django.utils.six import iteritems
+
+
+# flag: ( the permission that lifts the restriction, the value shown to
+# users without the permission )
+VISIBILITY_RULES = {
+    'is_published': ('facilities.view_unpublished_facilities', True),
+    'approved': ('facilities.view_unapproved_facilities', True),
+    'is_classified': ('facilities.view_classified_facilities', False),
+    'rejected': ('facilities.view_rejected_facilities', False),
+    'closed': ('facilities.view_closed_facilities', False),
+}
+
+_model_flags = {}
+_compiled_filters = {}
+
+
+def get_visibility_flags(model):
+    """The visibility flags of `model`"""
+    try:
+        return _model_flags[model]
+    except KeyError:
+        pass
+
+    flags = getattr(model, 'visibility_flags', None)
+    if flags is None:
+        field_names = set(field.name for field in model._meta.get_fields())
+        flags = tuple(sorted(
+            flag for flag in VISIBILITY_RULES if flag in field_names))
+    _model_flags[model] = flags
+    return flags
+
+
+def get_visibility_filter(model, scope, prefix=''):
+    """
+    A `Q` that keeps the records of `model` that `scope` ( a
+    `users.models.UserScope` ) may see.
+
+    `prefix` is the lookup path to the model when filtering a related
+    model e.g. `facility__` for facility services.
+    """
+    key = (
+        model, prefix, scope.is_active, scope.is_superuser, scope.permissions)
+    try:
+        return _compiled_filters[key]
+    except KeyError:
+        pass
+
+    compiled = Q(**dict(
+        (prefix + flag, shown)
+        for flag, (permission, shown) in iteritems(VISIBILITY_RULES)
+        if flag in get_visibility_flags(model) and
+        not scope.has_perm(permission)
+    ))
+    _compiled_filters[key] = compiled
+    return compiled
+
+
+def filter_visible(queryset, scope, prefix='', model=None):
+    """Keep the records of `queryset` that `scope` may see"""
+    visibility = get_visibility_filter(
+        model or queryset.model, scope, prefix)
+    return queryset.filter(visibility) if visibility else queryset
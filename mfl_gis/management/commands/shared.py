@@ -160,6 +160,9 @@ def _load_boundaries(
                     "{} {}:{} NOT FOUND".format(admin_area_cls, code, name))
 
     if unsaved_instances:
+        # bulk_create does not call save(), which simplifies the boundaries
+        for instance in unsaved_instances.values():
+            instance.simplify_mpoly()
         boundary_cls.objects.bulk_create(unsaved_instances.values())
     if errors:
         raise CommandError('\n'.join(errors))
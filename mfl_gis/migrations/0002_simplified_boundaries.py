@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import math
+
+from django.db import migrations
+from django.contrib.gis.geos import MultiPolygon, Polygon
+import django.contrib.gis.db.models.fields
+
+
+BOUNDARY_MODELS = (
+    'WorldBorder', 'CountyBoundary', 'ConstituencyBoundary', 'WardBoundary')
+
+# ( field, simplification tolerance in degrees ), as they were when the
+# fields were added; the models may change after this migration
+SIMPLIFIED_FIELDS = (
+    ('low_resolution_mpoly', 1e-2),
+    ('medium_resolution_mpoly', 1e-3),
+    ('high_resolution_mpoly', 1e-4),
+)
+
+
+def _round_ring(ring, precision):
+    rounded = []
+    for x, y in ring:
+        point = (round(x, precision), round(y, precision))
+        if not rounded or rounded[-1] != point:
+            rounded.append(point)
+    # rings that rounding collapses are kept as they are
+    return rounded if len(rounded) >= 4 else ring
+
+
+def _simplify_boundary(mpoly, tolerance):
+    precision = int(round(-math.log10(tolerance)))
+    simplified = mpoly.simplify(tolerance, preserve_topology=True)
+    return MultiPolygon(
+        *[
+            Polygon(*[_round_ring(ring, precision) for ring in polygon])
+            for polygon in simplified.coords
+        ], srid=mpoly.srid)
+
+
+def simplify_boundaries(apps, schema_editor):
+    for model_name in BOUNDARY_MODELS:
+        model = apps.get_model('mfl_gis', model_name)
+        for boundary in model.objects.exclude(mpoly=None):
+            for field_name, tolerance in SIMPLIFIED_FIELDS:
+                setattr(
+                    boundary, field_name,
+                    _simplify_boundary(boundary.mpoly, tolerance))
+            boundary.save(update_fields=[
+                field_name for field_name, _ in SIMPLIFIED_FIELDS])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mfl_gis', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name=model_name.lower(),
+            name=field_name,
+            field=django.contrib.gis.db.models.fields.MultiPolygonField(srid=4326, null=True, editable=False, blank=True),
+        )
+        for model_name in BOUNDARY_MODELS
+        for field_name, _ in SIMPLIFIED_FIELDS
+    ] + [
+        migrations.RunPython(simplify_boundaries, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,13 @@
 import reversion
 import logging
 import json
+import math
+
+from collections import OrderedDict
 
 from django.contrib.gis.db import models as gis_models
 from django.contrib.gis.db.models import Union
-from django.contrib.gis.geos import MultiPolygon
+from django.contrib.gis.geos import MultiPolygon, Polygon
 from django.utils import timezone, encoding
 from rest_framework.exceptions import ValidationError
 from common.models import AbstractBase, County, Constituency, Ward
@@ -226,6 +229,44 @@ class FacilityCoordinates(GISAbstractBase):
         verbose_name = 'facility coordinates'
 
 
+# resolution: ( the field holding the boundaries simplified for it, the
+# simplification tolerance in degrees ); 1e-3 degrees is about 100 meters
+BOUNDARY_RESOLUTIONS = OrderedDict((
+    ('low', ('low_resolution_mpoly', 1e-2)),
+    ('medium', ('medium_resolution_mpoly', 1e-3)),
+    ('high', ('high_resolution_mpoly', 1e-4)),
+))
+DEFAULT_BOUNDARY_RESOLUTION = 'medium'
+
+
+def _round_ring(ring, precision):
+    rounded = []
+    for x, y in ring:
+        point = (round(x, precision), round(y, precision))
+        if not rounded or rounded[-1] != point:
+            rounded.append(point)
+    # rings that rounding collapses are kept as they are
+    return rounded if len(rounded) >= 4 else ring
+
+
+def simplify_boundary(mpoly, tolerance):
+    """
+    Simplify a multipolygon, keeping every polygon and every ring ( holes
+    included ), and round its coordinates to the tolerance's precision
+    """
+    precision = int(round(-math.log10(tolerance)))
+    simplified = mpoly.simplify(tolerance, preserve_topology=True)
+    return MultiPolygon(
+        *[
+            Polygon(*[_round_ring(ring, precision) for ring in polygon])
+            for polygon in simplified.coords
+        ], srid=mpoly.srid)
+
+
+def _geometry_key(geometry):
+    return geometry.hexewkb if geometry else None
+
+
 class AdministrativeUnitBoundary(GISAbstractBase):
 
     """Base class for the models that implement administrative boundaries
@@ -244,6 +285,14 @@ class AdministrativeUnitBoundary(GISAbstractBase):
     # loaded and tested during each build
     mpoly = gis_models.MultiPolygonField(null=True, blank=True)
 
+    # `mpoly` simplified for each of the `BOUNDARY_RESOLUTIONS`
+    low_resolution_mpoly = gis_models.MultiPolygonField(
+        null=True, blank=True, editable=False)
+    medium_resolution_mpoly = gis_models.MultiPolygonField(
+        null=True, blank=True, editable=False)
+    high_resolution_mpoly = gis_models.MultiPolygonField(
+        null=True, blank=True, editable=False)
+
     @property
     def bound(self):
         return json.loads(self.mpoly.envelope.geojson) if self.mpoly else None
@@ -278,54 +327,57 @@ class AdministrativeUnitBoundary(GISAbstractBase):
             _lookup_facility_coordinates
         return _lookup_facility_coordinates(self)
 
+    def get_geometry(self, resolution=DEFAULT_BOUNDARY_RESOLUTION):
+        """The GeoJSON of the boundary, simplified for `resolution`"""
+        field_name, _ = BOUNDARY_RESOLUTIONS[resolution]
+        geometry = getattr(self, field_name)
+        return json.loads(geometry.geojson) if geometry else None
+
     @property
     def geometry(self):
         """Reduce the precision of the geometries sent in list views
 
         This produces a MASSIVE saving in rendering time
         """
-        if not self.mpoly:
-            return self.mpoly
-
-        def _simplify(tolerance, geometry):
-            if isinstance(geometry, MultiPolygon):
-                polygon = None
-                for child_polygon in geometry:
-                    if polygon:
-                        polygon.extend(child_polygon)
-                    else:
-                        polygon = child_polygon
-            else:
-                polygon = geometry
-
-            return json.loads(
-                polygon.simplify(
-                    tolerance=(1.0 / 10 ** precision)
-                ).geojson
-            )
-
-        # 3 decimal places for the web map ( about 10 meter accuracy )
-        precision = 3
-        tolerance = (1.0 / 10 ** precision)
-        geojson_dict = _simplify(
-            tolerance=tolerance, geometry=self.mpoly.cascaded_union
-        )
-        original_coordinates = geojson_dict['coordinates']
-        assert original_coordinates
-        new_coordinates = [
-            [
-                [
-                    round(coordinate_pair[0], precision),
-                    round(coordinate_pair[1], precision)
-                ]
-                for coordinate_pair in original_coordinates[0]
-                if coordinate_pair and
-                isinstance(coordinate_pair[0], float) and
-                isinstance(coordinate_pair[1], float)
-            ]
-        ]
-        geojson_dict['coordinates'] = new_coordinates
-        return geojson_dict
+        return self.get_geometry()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(AdministrativeUnitBoundary, cls).from_db(
+            db, field_names, values)
+        # remembered so that saving does not simplify an unchanged `mpoly`
+        if 'mpoly' in field_names:
+            instance._loaded_mpoly = _geometry_key(instance.mpoly)
+        return instance
+
+    def mpoly_changed(self):
+        """Whether `mpoly` differs from the one read from the database"""
+        if 'mpoly' in self.get_deferred_fields():
+            return False
+        if not hasattr(self, '_loaded_mpoly'):
+            return True
+        return _geometry_key(self.mpoly) != self._loaded_mpoly
+
+    def simplify_mpoly(self):
+        """Recompute the simplified geometries from `mpoly`"""
+        for field_name, tolerance in BOUNDARY_RESOLUTIONS.values():
+            setattr(
+                self, field_name,
+                simplify_boundary(self.mpoly, tolerance)
+                if self.mpoly else None)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields', None)
+        mpoly_saved = update_fields is None or 'mpoly' in update_fields
+        if mpoly_saved and self.mpoly_changed():
+            self.simplify_mpoly()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields).union(
+                    field_name
+                    for field_name, _ in BOUNDARY_RESOLUTIONS.values())
+        super(AdministrativeUnitBoundary, self).save(*args, **kwargs)
+        if mpoly_saved and 'mpoly' not in self.get_deferred_fields():
+            self._loaded_mpoly = _geometry_key(self.mpoly)
 
     class Meta(GISAbstractBase.Meta):
         abstract = True
@@ -1,7 +1,10 @@
 from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
 from rest_framework_gis.serializers import GeoFeatureModelSerializer
 from common.serializers import AbstractFieldsMixin
 from .models import (
+    BOUNDARY_RESOLUTIONS,
+    DEFAULT_BOUNDARY_RESOLUTION,
     GeoCodeSource,
     GeoCodeMethod,
     FacilityCoordinates,
@@ -11,6 +14,9 @@ from .models import (
     WardBoundary
 )
 
+SIMPLIFIED_MPOLY_FIELDS = tuple(
+    field_name for field_name, _ in BOUNDARY_RESOLUTIONS.values())
+
 
 class GeoCodeSourceSerializer(
         AbstractFieldsMixin, serializers.ModelSerializer):
@@ -76,6 +82,24 @@ class FacilityCoordinateSimpleSerializer(
         model = FacilityCoordinates
 
 
+class SimplifiedGeometryMixin(object):
+
+    """
+    Serves the boundaries simplified for the `resolution` query parameter
+    ( see `mfl_gis.models.BOUNDARY_RESOLUTIONS` ) as the `geometry`
+    """
+
+    def get_geometry(self, obj):
+        request = self.context.get('request', None)
+        resolution = request.query_params.get(
+            'resolution', None) if request else None
+        resolution = resolution or DEFAULT_BOUNDARY_RESOLUTION
+        if resolution not in BOUNDARY_RESOLUTIONS:
+            raise ValidationError({'resolution': [
+                'Pick one of {}'.format(', '.join(BOUNDARY_RESOLUTIONS))]})
+        return obj.get_geometry(resolution)
+
+
 class AbstractBoundarySerializer(
         AbstractFieldsMixin, GeoFeatureModelSerializer):
     center = serializers.ReadOnlyField()
@@ -97,7 +121,7 @@ class WorldBorderSerializer(AbstractBoundarySerializer):
         exclude = (
             'mpoly', 'active', 'deleted', 'search', 'created', 'updated',
             'created_by', 'updated_by', 'longitude', 'latitude',
-        )
+        ) + SIMPLIFIED_MPOLY_FIELDS
 
 
 class WorldBorderDetailSerializer(AbstractBoundarySerializer):
@@ -106,12 +130,14 @@ class WorldBorderDetailSerializer(AbstractBoundarySerializer):
 
     class Meta(AbstractBoundarySerializer.Meta):
         model = WorldBorder
+        exclude = SIMPLIFIED_MPOLY_FIELDS
 
 
-class CountyBoundarySerializer(AbstractBoundarySerializer):
+class CountyBoundarySerializer(
+        SimplifiedGeometryMixin, AbstractBoundarySerializer):
     constituency_boundary_ids = serializers.ReadOnlyField()
     county_id = serializers.ReadOnlyField(source='area.id')
-    geometry = serializers.ReadOnlyField()
+    geometry = serializers.SerializerMethodField()
 
     class Meta(object):
         model = CountyBoundary
@@ -119,7 +145,7 @@ class CountyBoundarySerializer(AbstractBoundarySerializer):
         exclude = (
             'active', 'deleted', 'search', 'created', 'updated', 'created_by',
             'updated_by', 'area', 'mpoly',
-        )
+        ) + SIMPLIFIED_MPOLY_FIELDS
 
 
 class CountyBoundaryDetailSerializer(AbstractBoundarySerializer):
@@ -130,6 +156,7 @@ class CountyBoundaryDetailSerializer(AbstractBoundarySerializer):
 
     class Meta(AbstractBoundarySerializer.Meta):
         model = CountyBoundary
+        exclude = SIMPLIFIED_MPOLY_FIELDS
 
 
 class CountyBoundSerializer(
@@ -141,11 +168,12 @@ class CountyBoundSerializer(
         fields = ("bound", )
 
 
-class ConstituencyBoundarySerializer(AbstractBoundarySerializer):
+class ConstituencyBoundarySerializer(
+        SimplifiedGeometryMixin, AbstractBoundarySerializer):
     ward_ids = serializers.ReadOnlyField()
     ward_boundary_ids = serializers.ReadOnlyField()
     constituency_id = serializers.CharField(source='area.id')
-    geometry = serializers.ReadOnlyField()
+    geometry = serializers.SerializerMethodField()
 
     class Meta(object):
         model = ConstituencyBoundary
@@ -153,7 +181,7 @@ class ConstituencyBoundarySerializer(AbstractBoundarySerializer):
         exclude = (
             'active', 'deleted', 'search', 'created', 'updated', 'created_by',
             'updated_by', 'area', 'mpoly',
-        )
+        ) + SIMPLIFIED_MPOLY_FIELDS
 
 
 class ConstituencyBoundaryDetailSerializer(AbstractBoundarySerializer):
@@ -164,6 +192,7 @@ class ConstituencyBoundaryDetailSerializer(AbstractBoundarySerializer):
 
     class Meta(AbstractBoundarySerializer.Meta):
         model = ConstituencyBoundary
+        exclude = SIMPLIFIED_MPOLY_FIELDS
 
 
 class ConstituencyBoundSerializer(
@@ -175,9 +204,10 @@ class ConstituencyBoundSerializer(
         fields = ("bound", )
 
 
-class WardBoundarySerializer(AbstractBoundarySerializer):
+class WardBoundarySerializer(
+        SimplifiedGeometryMixin, AbstractBoundarySerializer):
     ward_id = serializers.CharField(source='area.id')
-    geometry = serializers.ReadOnlyField()
+    geometry = serializers.SerializerMethodField()
 
     class Meta(object):
         model = WardBoundary
@@ -185,7 +215,7 @@ class WardBoundarySerializer(AbstractBoundarySerializer):
         exclude = (
             'active', 'deleted', 'search', 'created', 'updated', 'created_by',
             'updated_by', 'area', 'mpoly',
-        )
+        ) + SIMPLIFIED_MPOLY_FIELDS
 
 
 class WardBoundaryDetailSerializer(AbstractBoundarySerializer):
@@ -195,3 +225,4 @@ class WardBoundaryDetailSerializer(AbstractBoundarySerializer):
 
     class Meta(AbstractBoundarySerializer.Meta):
         model = WardBoundary
+        exclude = SIMPLIFIED_MPOLY_FIELDS
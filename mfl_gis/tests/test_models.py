@@ -1,10 +1,30 @@
+import math
+
 from model_mommy import mommy
-from django.contrib.gis.geos import Point
+from django.contrib.gis.geos import MultiPolygon, Point, Polygon
 from rest_framework.exceptions import ValidationError
 from common.tests.test_models import BaseTestCase
 
 from ..models import (
-    GeoCodeSource, GeoCodeMethod, FacilityCoordinates, WorldBorder)
+    GeoCodeSource, GeoCodeMethod, FacilityCoordinates, WorldBorder,
+    CountyBoundary, simplify_boundary)
+
+
+def _make_boundary_mpoly():
+    """A detailed circle, a square with a hole and a tiny square"""
+    circle = [
+        (36.8 + 0.5 * math.cos(i * math.pi / 500),
+         -1.3 + 0.5 * math.sin(i * math.pi / 500))
+        for i in range(1000)
+    ]
+    circle.append(circle[0])
+    square = ((38, 0), (38, 1), (39, 1), (39, 0), (38, 0))
+    hole = ((38.25, 0.25), (38.25, 0.75), (38.75, 0.75), (38.75, 0.25),
+            (38.25, 0.25))
+    tiny = ((40, 0), (40, 0.0001), (40.0001, 0.0001), (40.0001, 0),
+            (40, 0))
+    return MultiPolygon(
+        Polygon(circle), Polygon(square, hole), Polygon(tiny), srid=4326)
 
 
 class TestWorldBoundaryModel(BaseTestCase):
@@ -13,6 +33,69 @@ class TestWorldBoundaryModel(BaseTestCase):
         self.assertEqual(WorldBorder().geometry, {})
 
 
+class TestSimplifiedBoundaries(BaseTestCase):
+
+    def test_boundaries_are_simplified_on_save(self):
+        boundary = mommy.make(CountyBoundary, mpoly=_make_boundary_mpoly())
+        boundary = CountyBoundary.objects.get(pk=boundary.pk)
+        sizes = []
+        for mpoly in (
+                boundary.low_resolution_mpoly,
+                boundary.medium_resolution_mpoly,
+                boundary.high_resolution_mpoly):
+            # every polygon and the hole are kept
+            self.assertEqual(3, len(mpoly))
+            self.assertEqual(2, len(mpoly[1]))
+            sizes.append(mpoly.num_points)
+        self.assertEqual(sorted(sizes), sizes)
+        self.assertLess(sizes[-1], boundary.mpoly.num_points)
+
+        geometry = boundary.geometry
+        self.assertEqual('MultiPolygon', geometry['type'])
+        self.assertEqual(
+            boundary.medium_resolution_mpoly.num_points,
+            sum(len(ring) for polygon in geometry['coordinates']
+                for ring in polygon))
+
+        boundary.mpoly = None
+        boundary.save()
+        self.assertIsNone(boundary.low_resolution_mpoly)
+        self.assertIsNone(boundary.geometry)
+
+    def test_unchanged_boundaries_are_not_simplified_again(self):
+        boundary = mommy.make(CountyBoundary, mpoly=_make_boundary_mpoly())
+        boundary = CountyBoundary.objects.get(pk=boundary.pk)
+        self.assertFalse(boundary.mpoly_changed())
+        boundary.low_resolution_mpoly = None
+        boundary.save()
+        self.assertIsNone(
+            CountyBoundary.objects.get(pk=boundary.pk).low_resolution_mpoly)
+
+        # only saving `mpoly` simplifies it again
+        boundary.mpoly = MultiPolygon(
+            Polygon(((38, 0), (38, 1), (39, 1), (39, 0), (38, 0))),
+            srid=4326)
+        self.assertTrue(boundary.mpoly_changed())
+        boundary.save(update_fields=['name'])
+        self.assertIsNone(boundary.low_resolution_mpoly)
+        boundary.save(update_fields=['mpoly'])
+        boundary = CountyBoundary.objects.get(pk=boundary.pk)
+        self.assertEqual(5, boundary.low_resolution_mpoly.num_points)
+
+        deferred = CountyBoundary.objects.defer('mpoly').get(pk=boundary.pk)
+        self.assertFalse(deferred.mpoly_changed())
+
+    def test_simplified_coordinates_are_rounded(self):
+        mpoly = simplify_boundary(_make_boundary_mpoly(), 1e-2)
+        self.assertEqual(((38.25, 0.25), ) * 2, (
+            mpoly[1][1][0], mpoly[1][1][-1]))
+        for x, y in mpoly[0][0]:
+            self.assertEqual((round(x, 2), round(y, 2)), (x, y))
+        # rings that would collapse are not rounded
+        self.assertEqual(
+            (40.0001, 0.0001), mpoly[2][0][2])
+
+
 class TestGeoCodeSourceModel(BaseTestCase):
 
     def test_save(self):
@@ -1,3 +1,7 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+
 from rest_framework.test import APITestCase
 from common.tests.test_views import LoginMixin
 from common.models import Ward, County, Constituency
@@ -11,6 +15,7 @@ from ..models import (
     WardBoundary
 )
 from ..serializers import WorldBorderDetailSerializer
+from .test_models import _make_boundary_mpoly
 
 
 class TestCountryBoundariesView(LoginMixin, APITestCase):
@@ -81,6 +86,51 @@ class TestWardBoundaryViews(LoginMixin, APITestCase):
         assert not response.data.get('properties').get('facility_ids')
 
 
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    })
+class TestBoundaryResolutions(LoginMixin, APITestCase):
+    def setUp(self):
+        super(TestBoundaryResolutions, self).setUp()
+        cache.clear()
+        self.boundary = mommy.make(
+            ConstituencyBoundary, mpoly=_make_boundary_mpoly())
+        self.list_url = reverse('api:mfl_gis:constituency_boundaries_list')
+
+    def _get_geometry(self, url):
+        response = self.client.get(url)
+        self.assertEqual(200, response.status_code)
+        [feature] = response.data['results']['features']
+        return feature['geometry']
+
+    def test_default_resolution(self):
+        self.assertEqual(
+            self.boundary.get_geometry('medium'),
+            self._get_geometry(self.list_url))
+
+    def test_pick_a_resolution(self):
+        for resolution in ('low', 'high'):
+            self.assertEqual(
+                self.boundary.get_geometry(resolution),
+                self._get_geometry(
+                    self.list_url + '?resolution={}'.format(resolution)))
+
+    def test_other_resolutions_are_not_read(self):
+        with CaptureQueriesContext(connection) as queries:
+            self._get_geometry(self.list_url + '?resolution=low')
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertIn('low_resolution_mpoly', sql)
+        self.assertNotIn('medium_resolution_mpoly', sql)
+        self.assertNotIn('high_resolution_mpoly', sql)
+
+    def test_unknown_resolution(self):
+        response = self.client.get(self.list_url + '?resolution=ultra')
+        self.assertEqual(400, response.status_code)
+
+
 class TestFacilityCoordinatesListing(LoginMixin, APITestCase):
     def test_list_facility_coordinates(self):
         url = reverse("api:mfl_gis:facility_coordinates_list")
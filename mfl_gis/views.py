@@ -5,6 +5,8 @@ from common.views import AuditableDetailViewMixin
 from common.utilities import CustomRetrieveUpdateDestroyView
 
 from .models import (
+    BOUNDARY_RESOLUTIONS,
+    DEFAULT_BOUNDARY_RESOLUTION,
     GeoCodeSource,
     GeoCodeMethod,
     FacilityCoordinates,
@@ -206,6 +208,27 @@ class FacilityCoordinatesCreationAndDetail(CustomRetrieveUpdateDestroyView):
     serializer_class = FacilityCoordinateSimpleSerializer
 
 
+class SimplifiedBoundaryListMixin(object):
+
+    """
+    Reads only the boundaries simplified for the requested `resolution`;
+    the other resolutions' columns are deferred.
+    """
+
+    def get_queryset(self):
+        queryset = super(SimplifiedBoundaryListMixin, self).get_queryset()
+        resolution = self.request.query_params.get(
+            'resolution', None) or DEFAULT_BOUNDARY_RESOLUTION
+        # an unknown resolution is rejected by the serializer
+        if resolution not in BOUNDARY_RESOLUTIONS:
+            return queryset
+        return queryset.defer(*[
+            field_name
+            for name, (field_name, _) in BOUNDARY_RESOLUTIONS.items()
+            if name != resolution
+        ])
+
+
 class WorldBorderListView(GISListCreateAPIView):
     """
     Lists and creates ward borders
@@ -235,7 +258,8 @@ class WorldBorderDetailView(
     serializer_class = WorldBorderDetailSerializer
 
 
-class CountyBoundaryListView(GISListCreateAPIView):
+class CountyBoundaryListView(
+        SimplifiedBoundaryListMixin, GISListCreateAPIView):
     """
     Lists and creates county boundaries
 
@@ -248,6 +272,8 @@ class CountyBoundaryListView(GISListCreateAPIView):
     Updated_by -- User who updated the record
     active  -- Boolean is the record active
     deleted -- Boolean is the record deleted
+    resolution -- The detail of the boundaries: `low`, `medium` ( default )
+        or `high`
     """
     queryset = CountyBoundary.objects.all()
     serializer_class = CountyBoundarySerializer
@@ -274,7 +300,8 @@ class CountyBoundView(
     serializer_class = CountyBoundSerializer
 
 
-class ConstituencyBoundaryListView(GISListCreateAPIView):
+class ConstituencyBoundaryListView(
+        SimplifiedBoundaryListMixin, GISListCreateAPIView):
     """
     Lists and creates constituency boundaries
 
@@ -287,6 +314,8 @@ class ConstituencyBoundaryListView(GISListCreateAPIView):
     Updated_by -- User who updated the record
     active  -- Boolean is the record active
     deleted -- Boolean is the record deleted
+    resolution -- The detail of the boundaries: `low`, `medium` ( default )
+        or `high`
     """
     queryset = ConstituencyBoundary.objects.all()
     serializer_class = ConstituencyBoundarySerializer
@@ -313,7 +342,8 @@ class ConstituencyBoundView(
     serializer_class = ConstituencyBoundSerializer
 
 
-class WardBoundaryListView(GISListCreateAPIView):
+class WardBoundaryListView(
+        SimplifiedBoundaryListMixin, GISListCreateAPIView):
     """
     Lists and creates ward boundaries
 
@@ -326,6 +356,8 @@ class WardBoundaryListView(GISListCreateAPIView):
     Updated_by -- User who updated the record
     active  -- Boolean is the record active
     deleted -- Boolean is the record deleted
+    resolution -- The detail of the boundaries: `low`, `medium` ( default )
+        or `high`
     """
     queryset = WardBoundary.objects.all()
     serializer_class = WardBoundarySerializer
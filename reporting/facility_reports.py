@@ -1,90 +1,65 @@
 import functools
 
-from datetime import timedelta
+from datetime import datetime, time, timedelta
 
-from django.apps import apps
-from django.db.models import Sum
+from django.db.models import Count, Sum
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 
-from rest_framework.views import APIView, Response
-from rest_framework.exceptions import NotFound
+from rest_framework.compat import OrderedDict
+from rest_framework.views import APIView
+from rest_framework.exceptions import NotFound, ValidationError
 
 from facilities.models import (
     Facility,
+    FacilityLevelChangeReason,
+    FacilityStatsSnapshot,
+    FacilityStatus,
     FacilityType,
+    FacilityUpgrade,
     KephLevel,
-    FacilityUpgrade)
-from common.constants import TRUTH_NESS, FALSE_NESS
-from common.models import County, Constituency
-
+    Owner,
+    OwnerType,
+    RegulatingBody
+)
+from facilities.visibility import filter_visible
+from common.constants import TRUTH_NESS, FALSE_NESS, RECENT_PERIODS
+from common.models import County, Constituency, Ward
+from users.middleware import get_request_scope
+
+from .hierarchy_reports import get_beds_and_cots_hierarchy
+from .pivot_reports import pivot_facilities
+from .report_cache import CachedReportMixin
+from .report_compiler import (
+    filter_report_facilities,
+    get_report_filters,
+    run_report
+)
 from .report_config import REPORTS
+from .trend_reports import get_trend_period, get_trends
 
 
-class FilterReportMixin(object):
-    queryset = Facility.objects.all()
+# the models that the facility reports read
+REPORT_MODELS = (
+    Facility, County, Constituency, Ward, FacilityType, KephLevel, Owner,
+    OwnerType, FacilityStatus, RegulatingBody,
+)
 
-    def _prepare_filters(self, filtering_data):
-        filtering_data = filtering_data.split('=')
-        return filtering_data[0], filtering_data[1]
+DEFAULT_REPORT_TYPE = "facility_count_by_county"
 
-    def _build_dict_filter(self, filter_field_name, value):
-        return {
-            filter_field_name: value
-        }
 
-    def _filter_queryset(self, filter_dict):
-        return self.queryset.filter(**filter_dict)
+class FilterReportMixin(object):
+    queryset = Facility.objects.all()
 
-    def _filter_relation_obj(self, model, field_name, value):
-        filter_dict = {
-            field_name: value
-        }
-        return model.objects.filter(**filter_dict)
-
-    def _filter_by_extra_params(
-            self, report_config, more_filters_params, model):
-        more_filters = self._prepare_filters(more_filters_params)
-
-        requested_filters = report_config.get(
-            'extra_filters')[more_filters[0]]
-        requested_filters_filter_field_name = requested_filters.get(
-            "filter_field_name")
-        filtering_dict = self._build_dict_filter(
-            requested_filters_filter_field_name, more_filters[1])
-
-        self.queryset = self._filter_queryset(filtering_dict)
-        model_instances = self._filter_relation_obj(
-            model, more_filters[0], more_filters[1])
-        return model_instances
-
-    def _get_return_data(
-            self, filter_field_name, model_instances, return_instance_name,
-            return_count_name):
-        data = []
-
-        for instance in model_instances:
-            filiter_data = {
-                filter_field_name: instance
-            }
-            count = self.queryset.filter(**filiter_data).count()
-            instance_name = instance.name
-            data.append(
-                {
-                    return_instance_name: instance_name,
-                    return_count_name: count
-                }
-            )
-        return data
+    def get_queryset(self):
+        """The facilities the user gets to see"""
+        return filter_visible(
+            Facility.objects.all(), get_request_scope(self.request))
 
     def get_report_data(self, *args, **kwargs):
+        self.queryset = self.get_queryset()
         report_type = self.request.query_params.get(
-            "report_type", "facility_count_by_county")
-        if report_type == "facility_count_by_facility_type_detailed":
-            return self._get_facility_type_data()
-        if report_type == "facility_keph_level_report":
-            return self._get_facility_keph_level_data()
-        if report_type == "facility_constituency_report":
-            return self._get_facility_constituency_data()
+            "report_type", DEFAULT_REPORT_TYPE)
 
         if report_type == "beds_and_cots_by_county":
             return self._get_beds_and_cots({
@@ -116,120 +91,46 @@ class FilterReportMixin(object):
                 filters=filters
             )
 
-        more_filters_params = self.request.query_params.get("filters", None)
+        if report_type == "beds_and_cots_hierarchy":
+            return self._get_beds_and_cots_hierarchy()
 
         report_config = REPORTS.get(report_type, None)
         if report_config is None:
             raise NotFound(detail="Report not found.")
 
-        group_by = report_config.get("group_by")
-        app_label, model_name = report_config.get(
-            "filter_fields").get("model").split('.')
-        filter_field_name = report_config.get(
-            "filter_fields").get("filter_field_name")
-        model = apps.get_model(app_label, model_name)
-        model_instances = model.objects.all()
-
-        if more_filters_params:
-            model_instances = self._filter_by_extra_params(
-                report_config, more_filters_params, model)
-
-        return_instance_name = report_config.get(
-            "filter_fields").get("return_field")[0]
-        return_count_name = report_config.get(
-            "filter_fields").get("return_field")[1]
-        if group_by:
-            pass
-        else:
-            data = self._get_return_data(
-                filter_field_name, model_instances, return_instance_name,
-                return_count_name)
+        filters = get_report_filters(
+            report_config, self.request.query_params)
+        data = run_report(report_config, self.queryset, filters)
+        self.queryset = filter_report_facilities(
+            report_config, self.queryset, filters)
         return data, self.queryset.count()
 
-    def _get_facility_type_data(self):
-        owner_category = self.request.query_params.get("owner_category")
-        facility_type = self.request.query_params.get("facility_type")
-
-        data = []
-
-        for county in County.objects.all():
-            for facility_type in FacilityType.objects.all():
-                if not owner_category:
-                    count = Facility.objects.filter(
-                        facility_type=facility_type,
-                        ward__constituency__county=county).count()
-                else:
-                    count = Facility.objects.filter(
-                        facility_type=facility_type,
-                        ward__constituency__county=county,
-                        owner__owner_type=owner_category).count()
-
-                data.append(
-                    {
-                        "county": county.name,
-                        "facility_type": facility_type.name,
-                        "number_of_facilities": count
-                    }
-                )
-
-        totals = []
-
-        return data, totals
-
-    def _get_facility_keph_level_data(self):
-        owner_category = self.request.query_params.get("owner_category")
-
-        data = []
-
-        for county in County.objects.all():
-            for level in KephLevel.objects.all():
-                if not owner_category:
-                    count = Facility.objects.filter(
-                        keph_level=level,
-                        ward__constituency__county=county).count()
-                else:
-                    count = Facility.objects.filter(
-                        level=level,
-                        ward__constituency__county=county,
-                        owner__owner_type=owner_category).count()
-
-                data.append({
-                    "county": county.name,
-                    "keph_level": level.name,
-                    "number_of_facilities": count
-                })
-
-        totals = []
-        return data, totals
-
-    def _get_facility_constituency_data(self):
-        owner_category = self.request.query_params.get("owner_category")
-
-        data = []
-
-        for county in County.objects.all():
-            for const in Constituency.objects.filter(county=county):
-                if not owner_category:
-                    count = Facility.objects.filter(
-                        ward__constituency=const).count()
-                else:
-                    count = Facility.objects.filter(
-                        ward__constituency=const,
-                        owner__owner_type=owner_category).count()
-
-                data.append({
-                    "county": county.name,
-                    "constituency": const.name,
-                    "number_of_facilities": count
-                })
-
-            totals = []
-        return data, totals
+    def _get_beds_and_cots_hierarchy(self):
+        """Limited to the user's county or constituency, if any"""
+        scope = get_request_scope(self.request)
+        facilities = self.queryset
+        if scope.constituency:
+            facilities = facilities.filter(
+                ward__constituency=scope.constituency)
+        elif scope.county and not scope.is_national:
+            facilities = facilities.filter(
+                ward__constituency__county=scope.county)
+
+        params = self.request.query_params
+        if params.get("county", None):
+            facilities = facilities.filter(
+                ward__constituency__county=params["county"])
+        if params.get("constituency", None):
+            facilities = facilities.filter(
+                ward__constituency=params["constituency"])
+
+        tree = get_beds_and_cots_hierarchy(facilities)
+        return tree, {"total_cots": tree["cots"], "total_beds": tree["beds"]}
 
     def _get_beds_and_cots(self, vals={}, filters={}):
         fields = vals.keys()
         assert len(fields) == 2
-        items = Facility.objects.values(*fields).filter(**filters).annotate(
+        items = self.queryset.values(*fields).filter(**filters).annotate(
             cots=Sum('number_of_cots'), beds=Sum('number_of_beds')
         ).order_by()
 
@@ -248,89 +149,199 @@ class FilterReportMixin(object):
         ], {"total_cots": total_cots, "total_beds": total_beds}
 
 
-class ReportView(FilterReportMixin, APIView):
+class ReportView(FilterReportMixin, CachedReportMixin, APIView):
+    report_models = REPORT_MODELS
+    report_params = ('report_type', 'county', 'constituency', 'filters')
+
+    def get_report_param_names(self):
+        """The report's extra filters can be passed as parameters too"""
+        report_config = REPORTS.get(
+            self.request.query_params.get("report_type", DEFAULT_REPORT_TYPE),
+            {})
+        return self.report_params + tuple(
+            report_config.get('extra_filters', {}))
 
-    def get(self, *args, **kwargs):
+    def get_report(self):
         data, totals = self.get_report_data()
 
-        return Response(data={
+        return {
             "results": data,
             "total": totals
-        })
+        }
 
 
-class FacilityUpgradeDowngrade(APIView):
+class PivotReportView(FilterReportMixin, CachedReportMixin, APIView):
+    """
+    Cross tabulates the facilities
 
-    def get(self, *args, **kwargs):
-        county = self.request.query_params.get('county', None)
-        upgrade = self.request.query_params.get('upgrade', None)
+    rows -- The dimension of the rows e.g. `county`
+    cols -- The dimension of the columns e.g. `facility_type`
+    measure -- `count` ( default ), `beds` or `cots`
+    """
+    report_models = REPORT_MODELS
+    report_params = ('rows', 'cols', 'measure')
+
+    def get_report(self):
+        params = self.request.query_params
+        rows = params.get('rows', 'county')
+        columns, results, total = pivot_facilities(
+            self.get_queryset(), rows, params.get('cols', 'facility_type'),
+            params.get('measure', 'count'))
+        return {
+            "rows": rows,
+            "columns": columns,
+            "results": results,
+            "total": total
+        }
 
-        right_now = timezone.now()
-        last_week = self.request.query_params.get('last_week', None)
-        last_month = self.request.query_params.get('last_month', None)
-        last_three_months = self.request.query_params.get(
-            'last_three_months', None)
-        three_months_ago = right_now - timedelta(days=90)
-        last_one_week = right_now - timedelta(days=7)
-        last_one_month = right_now - timedelta(days=30)
 
+class FacilityTrendsView(CachedReportMixin, APIView):
+    """
+    Facility counts over time, from the daily snapshots
+
+    since -- The first date, a year before `until` by default
+    until -- The last date, today by default
+    dimension -- Split the counts by `county`, `facility_type`,
+        `keph_level`, `owner_type` or `operation_status`
+    measure -- `count` ( default ), `beds` or `cots`
+    """
+    report_models = (
+        FacilityStatsSnapshot, County, FacilityType, KephLevel, OwnerType,
+        FacilityStatus)
+    report_params = ('since', 'until', 'dimension', 'measure')
+
+    def get_report_period(self):
+        return get_trend_period(self.request.query_params)
+
+    def get_report(self):
+        params = self.request.query_params
+        since, until = get_trend_period(params)
+        snapshots = filter_visible(
+            FacilityStatsSnapshot.objects.all(),
+            get_request_scope(self.request))
+        dimension = params.get('dimension', None)
+        measure = params.get('measure', 'count')
+        return {
+            "since": since,
+            "until": until,
+            "dimension": dimension,
+            "measure": measure,
+            "results": get_trends(
+                snapshots, since, until, dimension, measure)
+        }
+
+
+# ( report field, FacilityUpgrade field ) of the listed changes
+UPGRADE_CHANGE_FIELDS = (
+    ("name", "facility__name"),
+    ("code", "facility__code"),
+    ("current_keph_level", "keph_level__name"),
+    ("previous_keph_level", "current_keph_level_name"),
+    ("previous_facility_type", "current_facility_type_name"),
+    ("current_facility_type", "facility_type__name"),
+    ("reason", "reason__reason"),
+)
+
+
+class FacilityUpgradeDowngrade(CachedReportMixin, APIView):
+    """
+    Facility upgrades and downgrades: the number of facilities changed in
+    each county or, with `county`, the latest change of each facility in it
+
+    upgrade -- `true` for upgrades only, `false` for downgrades only
+    since -- Only changes made at or after this date / datetime
+    until -- Only changes made at or before this date / datetime
+    last_week, last_month, last_three_months -- Shortcuts for `since`
+    """
+    report_models = REPORT_MODELS + (
+        FacilityUpgrade, FacilityLevelChangeReason)
+    report_params = ('county', 'upgrade', 'since', 'until') + tuple(
+        param for param, _ in RECENT_PERIODS)
+
+    def get_date_param(self, name, end_of_day=False):
+        value = self.request.query_params.get(name, None)
+        if not value:
+            return None
+        try:
+            parsed = parse_datetime(value)
+            if parsed is None:
+                parsed = datetime.combine(parse_date(value), time.min)
+                if end_of_day:
+                    parsed += timedelta(days=1, microseconds=-1)
+        except (ValueError, TypeError):
+            raise ValidationError({name: ['Enter a valid date']})
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+
+    def get_report_period(self):
+        """
+        The requested `( since, until )`; the recent period shortcuts start
+        at the beginning of the day so that they hold for the whole day
+        """
+        since = self.get_date_param('since')
+        for param, days in RECENT_PERIODS:
+            if self.request.query_params.get(param, None):
+                today = timezone.localtime(timezone.now()).replace(
+                    hour=0, minute=0, second=0, microsecond=0)
+                since = today - timedelta(days=days)
+                break
+        return since, self.get_date_param('until', end_of_day=True)
+
+    def get_changes(self):
+        """The changes of the visible facilities in the requested period"""
+        changes = filter_visible(
+            FacilityUpgrade.objects.filter(facility__deleted=False),
+            get_request_scope(self.request), 'facility__', Facility)
+
+        upgrade = self.request.query_params.get('upgrade', None)
         if upgrade in TRUTH_NESS:
-            all_changes = FacilityUpgrade.objects.filter(
-                is_upgrade=True)
+            changes = changes.filter(is_upgrade=True)
         elif upgrade in FALSE_NESS:
-            all_changes = FacilityUpgrade.objects.filter(
-                is_upgrade=False)
-        else:
-            all_changes = FacilityUpgrade.objects.all()
-
-        if last_week:
-            all_changes = all_changes.filter(created__gte=last_one_week)
-        if last_month:
-            all_changes = all_changes.filter(created__gte=last_one_month)
-        if last_three_months:
-            all_changes = all_changes.filter(created__gte=three_months_ago)
-
-        facilities_ids = [change.facility.id for change in all_changes]
-        changed_facilities = Facility.objects.filter(id__in=facilities_ids)
-        if not county:
-            results = []
-            for county in County.objects.all():
-                facility_count = changed_facilities.filter(
-                    ward__constituency__county=county).count()
-                data = {
-                    "county": county.name,
-                    "county_id": county.id,
-                    "changes": facility_count
-                }
-                results.append(data)
-            return Response(data={
-                "total_number_of_changes": len(facilities_ids),
-                "results": results
-            })
-        else:
-
-            facilities = changed_facilities.filter(
-                ward__constituency__county_id=county)
-            records = []
-            for facility in facilities:
-                latest_facility_change = FacilityUpgrade.objects.filter(
-                    facility=facility)[0]
-                data = {
-                    "name": facility.name,
-                    "code": facility.code,
-                    "current_keph_level":
-                        latest_facility_change.keph_level.name,
-                    "previous_keph_level":
-                        latest_facility_change.current_keph_level_name,
-                    "previous_facility_type":
-                        latest_facility_change.current_facility_type_name,
-                    "current_facility_type":
-                        latest_facility_change.facility_type.name,
-                    "reason": latest_facility_change.reason.reason
+            changes = changes.filter(is_upgrade=False)
+
+        since, until = self.get_report_period()
+        if since:
+            changes = changes.filter(created__gte=since)
+        if until:
+            changes = changes.filter(created__lte=until)
+        return changes.order_by()
+
+    def get_county_summary(self, changes):
+        """The changed facilities of every county, in one grouped query"""
+        counts = dict(
+            changes.values_list('facility__ward__constituency__county')
+            .annotate(changes=Count('facility', distinct=True)))
+        return {
+            "total_number_of_changes": changes.count(),
+            "results": [
+                {
+                    "county": name,
+                    "county_id": pk,
+                    "changes": counts.get(pk, 0)
                 }
-                records.append(data)
+                for pk, name in County.objects.values_list('id', 'name')
+            ]
+        }
 
-            return Response(data={
-                "total_facilities_changed": len(facilities),
-                "results": records
-            })
+    def get_county_changes(self, changes, county):
+        """The latest change of each facility, fetched with DISTINCT ON"""
+        names, fields = zip(*UPGRADE_CHANGE_FIELDS)
+        latest_changes = changes.filter(
+            facility__ward__constituency__county=county
+        ).order_by('facility', '-created').distinct('facility').values_list(
+            *fields)
+        records = sorted(
+            (OrderedDict(zip(names, change)) for change in latest_changes),
+            key=lambda record: (record["name"], record["code"]))
+        return {
+            "total_facilities_changed": len(records),
+            "results": records
+        }
+
+    def get_report(self):
+        changes = self.get_changes()
+        county = self.request.query_params.get('county', None)
+        if not county:
+            return self.get_county_summary(changes)
+        return self.get_county_changes(changes, county)
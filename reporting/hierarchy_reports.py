@@ -0,0 +1,87 @@
+"""
+Beds and cots of every ward, constituency and county, and of the country.
+
+All the levels come from a single `GROUP BY ROLLUP` query; the rows are
+then nested into a tree so that a front end can drill down from the
+national totals without going back to the server.
+"""
+from django.db import connection
+
+from .report_compiler import _get_sql
+
+
+# ( level, facility field, the field holding its name ), outermost first
+HIERARCHY_LEVELS = (
+    ('county', 'ward__constituency__county',
+     'ward__constituency__county__name'),
+    ('constituency', 'ward__constituency', 'ward__constituency__name'),
+    ('ward', 'ward', 'ward__name'),
+)
+
+NATIONAL = 'national'
+
+
+def compile_beds_and_cots_hierarchy(facilities):
+    """
+    Compile the rollup into `( sql, params )`; each row has the id and the
+    name of each level ( NULL above the row's level ), the beds, the cots
+    and the number of levels that the row is rolled up over.
+    """
+    fields = []
+    for _, field, name_field in HIERARCHY_LEVELS:
+        fields.extend([field, name_field])
+    sql, params = _get_sql(facilities.values_list(
+        *fields + ['number_of_beds', 'number_of_cots']).order_by())
+
+    keys = ['k{}'.format(i) for i in range(len(HIERARCHY_LEVELS))]
+    columns = []
+    for key in keys:
+        columns.extend([key, key + '_name'])
+    sql = (
+        'SELECT {columns}, COALESCE(SUM(f.beds), 0), '
+        'COALESCE(SUM(f.cots), 0), {rolled_up} '
+        'FROM ({sql}) AS f ({columns}, beds, cots) '
+        'GROUP BY ROLLUP ({groups}) '
+        'ORDER BY {order}'
+    ).format(
+        columns=', '.join(columns), sql=sql,
+        rolled_up=' + '.join(
+            'GROUPING({})'.format(key) for key in keys),
+        groups=', '.join('({0}, {0}_name)'.format(key) for key in keys),
+        order=', '.join(
+            '{0}_name NULLS FIRST, {0} NULLS FIRST'.format(key)
+            for key in keys))
+    return sql, params
+
+
+def get_beds_and_cots_hierarchy(facilities):
+    """
+    The national beds and cots, with the counties under `children`, their
+    constituencies under theirs and so on down to the wards.
+    """
+    sql, params = compile_beds_and_cots_hierarchy(facilities)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    depth = len(HIERARCHY_LEVELS)
+    tree = None
+    parents = []
+    for row in rows:
+        beds, cots, rolled_up = row[-3:]
+        level = depth - rolled_up
+        node = {
+            "level": HIERARCHY_LEVELS[level - 1][0] if level else NATIONAL,
+            "beds": beds,
+            "cots": cots,
+        }
+        if level:
+            node["id"], node["name"] = row[2 * level - 2:2 * level]
+            parents[level - 1]["children"].append(node)
+        else:
+            tree = node
+        if level < depth:
+            node["children"] = []
+            # rows are ordered so that each node follows its parent
+            parents[level:] = [node]
+    return tree
@@ -0,0 +1,90 @@
+"""
+Cross tabulates facilities by two of their dimensions.
+
+The cells come from a single GROUP BY query over the two dimensions; the
+query only returns the combinations that have facilities, so the matrix
+is filled in with zeros and the row and column totals are added here.
+Columns are keyed on their names, so same named groups share a column.
+"""
+from django.db.models import Count, Sum
+
+from rest_framework.compat import OrderedDict
+from rest_framework.exceptions import ValidationError
+
+
+# dimension: ( the facility field to group by, the field holding its name )
+PIVOT_DIMENSIONS = {
+    'county': (
+        'ward__constituency__county', 'ward__constituency__county__name'),
+    'constituency': ('ward__constituency', 'ward__constituency__name'),
+    'ward': ('ward', 'ward__name'),
+    'facility_type': ('facility_type', 'facility_type__name'),
+    'keph_level': ('keph_level', 'keph_level__name'),
+    'owner': ('owner', 'owner__name'),
+    'owner_type': ('owner__owner_type', 'owner__owner_type__name'),
+    'operation_status': ('operation_status', 'operation_status__name'),
+    'regulatory_body': ('regulatory_body', 'regulatory_body__name'),
+}
+
+PIVOT_MEASURES = {
+    'count': Count('id'),
+    'beds': Sum('number_of_beds'),
+    'cots': Sum('number_of_cots'),
+}
+
+TOTAL = 'total'
+
+
+def _get_choice(name, value, choices):
+    if value not in choices:
+        raise ValidationError({name: [
+            'Pick one of {}'.format(', '.join(sorted(choices)))]})
+    return choices[value]
+
+
+def pivot_facilities(facilities, rows, cols, measure='count'):
+    """
+    Tabulate `measure` for `facilities` by the `rows` and `cols`
+    dimensions.
+
+    Returns `( columns, results, total )`: the column names, one dict per
+    row ( the row's name under the `rows` key, a value per column and the
+    row total under `total` ) followed by a row of column totals, and the
+    grand total.
+    """
+    row_field, row_name = _get_choice('rows', rows, PIVOT_DIMENSIONS)
+    col_field, col_name = _get_choice('cols', cols, PIVOT_DIMENSIONS)
+    aggregate = _get_choice('measure', measure, PIVOT_MEASURES)
+    if rows == cols:
+        raise ValidationError({'cols': ['Pick a dimension other than rows']})
+
+    cells = facilities.order_by().values(
+        row_field, row_name, col_field, col_name).annotate(
+        value=aggregate).order_by(row_name, col_name)
+
+    row_names = OrderedDict()
+    columns = OrderedDict()
+    matrix = {}
+    for cell in cells:
+        row = cell[row_field]
+        row_names[row] = cell[row_name]
+        columns[cell[col_name]] = 0
+        key = (row, cell[col_name])
+        matrix[key] = matrix.get(key, 0) + (cell['value'] or 0)
+
+    results = []
+    for row, name in row_names.items():
+        values = OrderedDict([(rows, name)])
+        for column in columns:
+            value = matrix.get((row, column), 0)
+            values[column] = value
+            columns[column] += value
+        values[TOTAL] = sum(values[column] for column in columns)
+        results.append(values)
+
+    total = sum(columns.values())
+    totals = OrderedDict([(rows, TOTAL)])
+    totals.update(columns)
+    totals[TOTAL] = total
+    results.append(totals)
+    return list(columns), results, total
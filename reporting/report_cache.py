@@ -0,0 +1,77 @@
+"""
+Caches report results until the data they are computed from changes.
+
+A report is cached per view, the query parameters it reads and the user
+scope, together with the versions of the models that the report reads
+( see `common.models.model_versions` ). Saving or deleting a record of any
+of those models bumps its version, so the cached report is recomputed on
+the next request; otherwise it is served from the cache until the dates
+that the report resolves relative to today move on.
+Bulk updates do not send signals, so code that makes them has to call
+`bump_model_version` itself.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.utils.encoding import force_bytes
+
+from rest_framework.views import Response
+
+from common.models import get_model_versions
+from users.middleware import get_request_scope
+
+
+REPORT_CACHE_KEY = 'report:{}'
+
+
+class CachedReportMixin(object):
+
+    """
+    Serves the data that the view's `get_report()` returns from the cache;
+    views list the models that the report reads in `report_models` and
+    the query parameters it reads in `report_params`.
+    """
+    report_models = ()
+    report_params = ()
+
+    def get_report_param_names(self):
+        return self.report_params
+
+    def get_report_params(self):
+        """The non empty parameters the report reads, in a canonical order"""
+        names = self.get_report_param_names()
+        return sorted(
+            (name, sorted(value for value in values if value))
+            for name, values in self.request.query_params.lists()
+            if name in names and any(values))
+
+    def get_report_period(self):
+        """
+        The dates a report resolves relative to today, e.g. its default
+        window; cached reports move on with them
+        """
+        return None
+
+    def get_report_cache_key(self):
+        variant = (
+            self.__class__.__name__, self.get_report_params(),
+            self.get_report_period(), get_request_scope(self.request).key)
+        return REPORT_CACHE_KEY.format(
+            hashlib.md5(force_bytes(repr(variant))).hexdigest())
+
+    def get_data_version(self):
+        versions = get_model_versions(self.report_models)
+        return sorted(
+            (model._meta.db_table, version)
+            for model, version in versions.items())
+
+    def get(self, *args, **kwargs):
+        key = self.get_report_cache_key()
+        version = self.get_data_version()
+        cached = cache.get(key)
+        if cached is not None and cached[0] == version:
+            return Response(data=cached[1])
+
+        data = self.get_report()
+        cache.set(key, (version, data), None)
+        return Response(data=data)
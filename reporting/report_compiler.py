@@ -0,0 +1,156 @@
+"""
+Compiles the reports in `report_config.REPORTS` into aggregate queries.
+
+A report counts facilities per record of its grouping model
+( `filter_fields.model` ) and, if it has a `group_by`, per record of every
+`group_by` model as well e.g. facility types per county. Each report runs
+as a single query: the grouping models are joined to each other ( cross
+joined unless a level names the `join_field` that links it to the level
+before it ) and LEFT JOINed to the facilities, so groups without any
+facilities are still reported, with a count of 0.
+"""
+from django.apps import apps
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connection
+
+from rest_framework.exceptions import ValidationError
+
+
+class ReportLevel(object):
+
+    """A grouping model of a report and the facility field that points to it"""
+
+    def __init__(self, model, field_name, name, join_field=None):
+        self.model = apps.get_model(*model.split('.'))
+        self.field_name = field_name
+        self.name = name
+        self.join_field = join_field
+
+    def get_queryset(self, filters, extra_filters, joined=False):
+        """The groups, narrowed by the extra filters that apply to them"""
+        queryset = self.model.objects.all()
+        label = '{}.{}'.format(
+            self.model._meta.app_label, self.model._meta.object_name)
+        field_names = set(
+            field.name for field in self.model._meta.get_fields()
+            if field.concrete)
+        for name, value in filters.items():
+            if extra_filters[name]['path'] == label:
+                queryset = queryset.filter(pk=value)
+            elif name in field_names:
+                queryset = queryset.filter(**{name: value})
+
+        columns = ['pk', 'name']
+        if joined:
+            columns.append(self.join_field)
+        return queryset.values_list(*columns).order_by()
+
+
+def get_report_levels(report_config):
+    """The levels of a report, outermost `group_by` first"""
+    group_by = report_config.get('group_by') or []
+    if isinstance(group_by, dict):
+        group_by = [group_by]
+    levels = [
+        ReportLevel(
+            level['path'], level['field_name'], level['name'],
+            level.get('join_field'))
+        for level in group_by
+    ]
+    filter_fields = report_config['filter_fields']
+    levels.append(ReportLevel(
+        filter_fields['model'], filter_fields['filter_field_name'],
+        filter_fields['return_field'][0], filter_fields.get('join_field')))
+    return levels
+
+
+def get_report_filters(report_config, query_params):
+    """
+    The report's `extra_filters` that the request sets, either as
+    `filters=<name>=<value>` or as `<name>=<value>`.
+    """
+    extra_filters = report_config.get('extra_filters', {})
+    filters = {}
+    more_filters = query_params.get('filters', None)
+    if more_filters:
+        name, _, value = more_filters.partition('=')
+        if name not in extra_filters or not value:
+            raise ValidationError(
+                {'filters': ['Unknown report filter {}'.format(name)]})
+        filters[name] = value
+
+    for name in extra_filters:
+        value = query_params.get(name, None)
+        if value and name not in filters:
+            filters[name] = value
+    return filters
+
+
+def filter_report_facilities(report_config, facilities, filters):
+    """Narrow down the facilities that a report counts"""
+    extra_filters = report_config.get('extra_filters', {})
+    for name, value in filters.items():
+        facilities = facilities.filter(
+            **{extra_filters[name]['filter_field_name']: value})
+    return facilities
+
+
+def _get_sql(queryset):
+    try:
+        return queryset.query.sql_with_params()
+    except (ValueError, DjangoValidationError):
+        # e.g. a malformed id in the filters
+        raise ValidationError({'filters': ['Invalid report filter value']})
+
+
+def compile_report(report_config, facilities, filters):
+    """
+    Compile a report into `( sql, params )`; the query returns the name of
+    each level's group followed by the number of facilities in the group.
+    """
+    levels = get_report_levels(report_config)
+    extra_filters = report_config.get('extra_filters', {})
+    facilities = filter_report_facilities(
+        report_config, facilities, filters).values_list(
+        'pk', *[level.field_name for level in levels]).order_by()
+
+    sources = []
+    params = []
+    for i, level in enumerate(levels):
+        joined = bool(i and level.join_field)
+        sql, level_params = _get_sql(
+            level.get_queryset(filters, extra_filters, joined))
+        params.extend(level_params)
+        if joined:
+            sources.append(
+                'JOIN ({}) AS g{i} (id, name, parent) '
+                'ON g{i}.parent = g{parent}.id'.format(sql, i=i, parent=i - 1))
+        else:
+            sources.append('{}({}) AS g{i} (id, name)'.format(
+                'CROSS JOIN ' if i else '', sql, i=i))
+
+    sql, facility_params = _get_sql(facilities)
+    params.extend(facility_params)
+    keys = ['k{}'.format(i) for i in range(len(levels))]
+    sources.append('LEFT JOIN ({}) AS f (id, {}) ON {}'.format(
+        sql, ', '.join(keys),
+        ' AND '.join(
+            'f.k{i} = g{i}.id'.format(i=i) for i in range(len(levels)))))
+
+    groups = ['g{}'.format(i) for i in range(len(levels))]
+    sql = 'SELECT {}, COUNT(f.id) FROM {} GROUP BY {} ORDER BY {}'.format(
+        ', '.join('{}.name'.format(group) for group in groups),
+        ' '.join(sources),
+        ', '.join('{0}.id, {0}.name'.format(group) for group in groups),
+        ', '.join('{0}.name, {0}.id'.format(group) for group in groups))
+    return sql, params
+
+
+def run_report(report_config, facilities, filters):
+    """The rows of a report, as dicts"""
+    names = [level.name for level in get_report_levels(report_config)]
+    names.append(report_config['filter_fields']['return_field'][1])
+    sql, params = compile_report(report_config, facilities, filters)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [dict(zip(names, row)) for row in cursor.fetchall()]
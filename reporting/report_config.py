@@ -82,10 +82,10 @@ REPORTS = {
         "filter_fields": {
             "model": "facilities.FacilityType",
             "filter_field_name": "facility_type",
-            "return_field": ["type_category", "number_of_facilities"]
+            "return_field": ["facility_type", "number_of_facilities"]
         },
         "extra_filters": {
-            "owner_type": {
+            "owner_category": {
                 "path": "facilities.OwnerType",
                 "filter_field_name": "owner__owner_type"
             }
@@ -106,6 +106,52 @@ REPORTS = {
             "field_name": "ward__constituency__county"
         },
         "top_level_field": "total"
+    },
+
+    # facility count by keph levels per county
+    "facility_keph_level_report": {
+        "type": "complex",
+        "filter_fields": {
+            "model": "facilities.KephLevel",
+            "filter_field_name": "keph_level",
+            "return_field": ["keph_level", "number_of_facilities"]
+        },
+        "extra_filters": {
+            "owner_category": {
+                "path": "facilities.OwnerType",
+                "filter_field_name": "owner__owner_type"
+            }
+        },
+        "group_by": {
+            "path": "common.County",
+            "name": "county",
+            "field_name": "ward__constituency__county"
+        },
+        "top_level_field": "total"
+    },
+
+    # facility count by constituencies, under their counties; `join_field`
+    # pairs each constituency with its own county only
+    "facility_constituency_report": {
+        "type": "complex",
+        "filter_fields": {
+            "model": "common.Constituency",
+            "filter_field_name": "ward__constituency",
+            "return_field": ["constituency", "number_of_facilities"],
+            "join_field": "county"
+        },
+        "extra_filters": {
+            "owner_category": {
+                "path": "facilities.OwnerType",
+                "filter_field_name": "owner__owner_type"
+            }
+        },
+        "group_by": {
+            "path": "common.County",
+            "name": "county",
+            "field_name": "ward__constituency__county"
+        },
+        "top_level_field": "total"
     }
 
 }
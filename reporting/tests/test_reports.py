@@ -1,5 +1,9 @@
-from datetime import timedelta
+from datetime import datetime, timedelta
 
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
 from django.utils import timezone
 
 from rest_framework.test import APITestCase
@@ -7,10 +11,17 @@ from django.core.urlresolvers import reverse
 
 from model_mommy import mommy
 from facilities.models import (
-    Facility, FacilityType, KephLevel, FacilityUpgrade)
-from common.models import Ward, County, Constituency
+    Facility, FacilityType, KephLevel, FacilityUpgrade, Owner, OwnerType,
+    FacilityStatsSnapshot, snapshot_facility_stats)
+from common.models import (
+    Ward, County, Constituency, UserConstituency, UserCounty)
 from common.tests.test_views import LoginMixin
 
+from .. import facility_reports
+from ..hierarchy_reports import get_beds_and_cots_hierarchy
+from ..report_compiler import run_report
+from ..report_config import REPORTS
+
 
 class TestFacilityCountByCountyReport(LoginMixin, APITestCase):
 
@@ -209,10 +220,94 @@ class TestFacilityCountByCountyReport(LoginMixin, APITestCase):
         self.assertEquals(4, response.data.get("total_number_of_changes"))
 
 
-class TestBedsAndCots(LoginMixin, APITestCase):
+class TestFacilityUpgradeDowngradeQueries(LoginMixin, APITestCase):
+
+    def setUp(self):
+        super(TestFacilityUpgradeDowngradeQueries, self).setUp()
+        self.url = reverse("api:reporting:upgrade_downgrade_report")
+        self.county = mommy.make(County)
+        constituency = mommy.make(Constituency, county=self.county)
+        self.ward = mommy.make(Ward, constituency=constituency)
+
+    def _make_changes(self, quantity):
+        for _ in range(quantity):
+            mommy.make(
+                FacilityUpgrade, facility__ward=self.ward,
+                keph_level=mommy.make(KephLevel))
+
+    def _count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEquals(200, response.status_code)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_the_changes(self):
+        county_url = self.url + "?county={}".format(self.county.id)
+        self._make_changes(1)
+        # the first request also loads the user's scope; other parameters
+        # keep the measured reports out of the report cache
+        self.client.get(self.url + "?upgrade=true")
+        summary_count = self._count_queries(self.url)
+        county_count = self._count_queries(county_url)
+        self._make_changes(3)
+        self.assertEquals(summary_count, self._count_queries(self.url))
+        self.assertEquals(county_count, self._count_queries(county_url))
+
+    def test_latest_change_per_facility(self):
+        facility = mommy.make(Facility, ward=self.ward)
+        mommy.make(
+            FacilityUpgrade, facility=facility, is_confirmed=True,
+            keph_level=mommy.make(KephLevel),
+            created=timezone.now() - timedelta(days=10))
+        latest = mommy.make(
+            FacilityUpgrade, facility=facility,
+            keph_level=mommy.make(KephLevel))
+
+        response = self.client.get(self.url)
+        self.assertEquals(2, response.data["total_number_of_changes"])
+        self.assertEquals(
+            [1], [
+                county["changes"] for county in response.data["results"]
+                if county["county_id"] == self.county.id])
+
+        url = self.url + "?county={}".format(self.county.id)
+        response = self.client.get(url)
+        self.assertEquals(1, response.data["total_facilities_changed"])
+        self.assertEquals(
+            latest.keph_level.name,
+            response.data["results"][0]["current_keph_level"])
+
+    def test_filter_by_date_range(self):
+        facility = mommy.make(Facility, ward=self.ward)
+        mommy.make(
+            FacilityUpgrade, facility=facility, is_confirmed=True,
+            created=timezone.make_aware(datetime(2015, 9, 1, 10, 0)))
+        mommy.make(
+            FacilityUpgrade, facility=facility,
+            created=timezone.make_aware(datetime(2015, 9, 20, 10, 0)))
+
+        def changes(query):
+            response = self.client.get(self.url + query)
+            self.assertEquals(200, response.status_code)
+            return response.data["total_number_of_changes"]
+
+        self.assertEquals(2, changes("?since=2015-09-01"))
+        self.assertEquals(1, changes("?since=2015-09-02"))
+        self.assertEquals(1, changes("?until=2015-09-01"))
+        self.assertEquals(0, changes("?until=2015-08-31"))
+        self.assertEquals(
+            1, changes("?since=2015-09-10T00:00:00Z&until=2015-09-30"))
+
+    def test_invalid_dates(self):
+        for query in ("?since=yesterday", "?until=2015-13-01"):
+            response = self.client.get(self.url + query)
+            self.assertEquals(400, response.status_code)
+
+
+class BedsAndCotsMixin(LoginMixin):
 
     def setUp(self):
-        super(TestBedsAndCots, self).setUp()
+        super(BedsAndCotsMixin, self).setUp()
         self.base_url = reverse("api:reporting:reports")
         self.coun1 = mommy.make(County)
         self.coun2 = mommy.make(County)
@@ -240,6 +335,9 @@ class TestBedsAndCots(LoginMixin, APITestCase):
             ward=self.ward3
         )
 
+
+class TestBedsAndCots(BedsAndCotsMixin, APITestCase):
+
     def test_beds_and_cots_without_filter(self):
         params = [
             "beds_and_cots_by_county", "beds_and_cots_by_constituency",
@@ -274,3 +372,379 @@ class TestBedsAndCots(LoginMixin, APITestCase):
             self.base_url, "beds_and_cots_by_ward", str(self.cons3.pk)
         ))
         self.assertEquals(200, response.status_code)
+
+
+class TestBedsAndCotsHierarchy(BedsAndCotsMixin, APITestCase):
+
+    def setUp(self):
+        super(TestBedsAndCotsHierarchy, self).setUp()
+        self.ward4 = mommy.make(Ward, constituency=self.cons3)
+        mommy.make(
+            Facility, ward=self.ward4, number_of_beds=1, number_of_cots=0)
+        self.url = self.base_url + "?report_type=beds_and_cots_hierarchy"
+
+    def _get_tree(self, url):
+        response = self.client.get(url)
+        self.assertEquals(200, response.status_code)
+        return response.data
+
+    def _summarize(self, nodes):
+        return dict(
+            (node["id"], (
+                node["level"], node["beds"], node["cots"],
+                self._summarize(node.get("children", []))))
+            for node in nodes)
+
+    def test_hierarchy_in_one_query(self):
+        with self.assertNumQueries(1):
+            get_beds_and_cots_hierarchy(Facility.objects.all())
+        data = self._get_tree(self.url)
+        self.assertEquals(
+            {"total_beds": 22, "total_cots": 18}, data["total"])
+        tree = data["results"]
+        self.assertEquals(
+            ("national", 22, 18),
+            (tree["level"], tree["beds"], tree["cots"]))
+        self.assertEquals({
+            self.coun1.id: ("county", 21, 18, {
+                self.cons1.id: ("constituency", 15, 6, {
+                    self.ward1.id: ("ward", 10, 4, {}),
+                    self.ward2.id: ("ward", 5, 2, {}),
+                }),
+                self.cons2.id: ("constituency", 6, 12, {
+                    self.ward3.id: ("ward", 6, 12, {}),
+                }),
+            }),
+            self.coun2.id: ("county", 1, 0, {
+                self.cons3.id: ("constituency", 1, 0, {
+                    self.ward4.id: ("ward", 1, 0, {}),
+                }),
+            }),
+        }, self._summarize(tree["children"]))
+
+    def test_hierarchy_filters(self):
+        tree = self._get_tree(
+            self.url + "&county={}".format(self.coun2.id))["results"]
+        self.assertEquals(
+            [self.coun2.id], [county["id"] for county in tree["children"]])
+
+        tree = self._get_tree(
+            self.url + "&constituency={}".format(self.cons2.id))["results"]
+        self.assertEquals((6, 12), (tree["beds"], tree["cots"]))
+
+    def test_hierarchy_without_facilities(self):
+        tree = self._get_tree(
+            self.url + "&county={}".format(self.coun3.id))["results"]
+        self.assertEquals(
+            {"level": "national", "beds": 0, "cots": 0, "children": []},
+            tree)
+
+    def test_hierarchy_of_a_county_user(self):
+        self.user.is_national = False
+        self.user.save()
+        mommy.make(UserCounty, user=self.user, county=self.coun2)
+        tree = self._get_tree(self.url)["results"]
+        self.assertEquals(
+            [self.coun2.id], [county["id"] for county in tree["children"]])
+
+    def test_hierarchy_of_a_constituency_user(self):
+        creator = mommy.make(get_user_model())
+        mommy.make(UserCounty, user=creator, county=self.coun1)
+        mommy.make(
+            UserConstituency, user=self.user, constituency=self.cons1,
+            created_by=creator)
+        tree = self._get_tree(self.url)["results"]
+        self.assertEquals((15, 6), (tree["beds"], tree["cots"]))
+        [county] = tree["children"]
+        self.assertEquals(
+            [self.cons1.id],
+            [constituency["id"] for constituency in county["children"]])
+
+
+class TestReportCompiler(LoginMixin, APITestCase):
+
+    def setUp(self):
+        super(TestReportCompiler, self).setUp()
+        self.url = reverse("api:reporting:reports")
+        self.county = mommy.make(County, name='A county')
+        self.empty_county = mommy.make(County, name='B county')
+        self.constituency = mommy.make(
+            Constituency, county=self.county, name='A constituency')
+        self.other_constituency = mommy.make(
+            Constituency, county=self.empty_county, name='B constituency')
+        ward = mommy.make(Ward, constituency=self.constituency)
+        self.facility_type = mommy.make(FacilityType, name='A type')
+        self.other_type = mommy.make(FacilityType, name='B type')
+        self.owner_type = mommy.make(OwnerType)
+        owner = mommy.make(Owner, owner_type=self.owner_type)
+        mommy.make(
+            Facility, ward=ward, facility_type=self.facility_type,
+            owner=owner, _quantity=2)
+        mommy.make(Facility, ward=ward, facility_type=self.other_type)
+
+    def test_groups_without_facilities_are_reported(self):
+        with self.assertNumQueries(1):
+            data = run_report(
+                REPORTS["facility_count_by_county"], Facility.objects.all(),
+                {})
+        self.assertIn(
+            {"county_name": "A county", "number_of_facilities": 3}, data)
+        self.assertIn(
+            {"county_name": "B county", "number_of_facilities": 0}, data)
+
+    def test_extra_filters(self):
+        url = self.url + (
+            "?report_type=facility_count_by_consituency"
+            "&filters=county={}".format(self.empty_county.id))
+        response = self.client.get(url)
+        self.assertEquals(200, response.status_code)
+        self.assertEquals(
+            [{"constituency_name": "B constituency",
+              "number_of_facilities": 0}],
+            response.data["results"])
+        self.assertEquals(0, response.data["total"])
+
+        url = self.url + (
+            "?report_type=facility_count_by_facility_type_detailed"
+            "&owner_category={}".format(self.owner_type.id))
+        response = self.client.get(url)
+        self.assertEquals(200, response.status_code)
+        self.assertEquals(3, response.data["total"])
+
+    def test_invalid_filters(self):
+        url = self.url + "?report_type=facility_count_by_county"
+        response = self.client.get(url + "&filters=nothing=1")
+        self.assertEquals(400, response.status_code)
+        url = self.url + "?report_type=facility_count_by_consituency"
+        response = self.client.get(url + "&filters=county=nairobi")
+        self.assertEquals(400, response.status_code)
+
+    def test_group_by(self):
+        data = run_report(
+            REPORTS["facility_count_by_facility_type_detailed"],
+            Facility.objects.all(), {})
+        self.assertEquals(4, len(data))
+        self.assertEquals({
+            "county": "A county",
+            "facility_type": "A type",
+            "number_of_facilities": 2
+        }, data[0])
+        self.assertEquals({
+            "county": "B county",
+            "facility_type": "B type",
+            "number_of_facilities": 0
+        }, data[3])
+
+    def test_joined_group_by(self):
+        url = self.url + "?report_type=facility_constituency_report"
+        response = self.client.get(url)
+        self.assertEquals(200, response.status_code)
+        self.assertEquals([
+            {
+                "county": "A county",
+                "constituency": "A constituency",
+                "number_of_facilities": 3
+            },
+            {
+                "county": "B county",
+                "constituency": "B constituency",
+                "number_of_facilities": 0
+            }
+        ], response.data["results"])
+
+
+class TestPivotReport(LoginMixin, APITestCase):
+
+    def setUp(self):
+        super(TestPivotReport, self).setUp()
+        self.url = reverse("api:reporting:pivot_report")
+        county = mommy.make(County, name='A county')
+        other_county = mommy.make(County, name='B county')
+        ward = mommy.make(
+            Ward, constituency=mommy.make(Constituency, county=county))
+        other_ward = mommy.make(
+            Ward, constituency=mommy.make(Constituency, county=other_county))
+        facility_type = mommy.make(FacilityType, name='A type')
+        other_type = mommy.make(FacilityType, name='B type')
+        mommy.make(
+            Facility, ward=ward, facility_type=facility_type,
+            number_of_beds=3, _quantity=2)
+        mommy.make(
+            Facility, ward=other_ward, facility_type=other_type,
+            number_of_beds=4)
+
+    def test_pivot(self):
+        response = self.client.get(
+            self.url + "?rows=county&cols=facility_type")
+        self.assertEquals(200, response.status_code)
+        self.assertEquals(["A type", "B type"], response.data["columns"])
+        self.assertEquals(3, response.data["total"])
+        self.assertEquals([
+            {"county": "A county", "A type": 2, "B type": 0, "total": 2},
+            {"county": "B county", "A type": 0, "B type": 1, "total": 1},
+            {"county": "total", "A type": 2, "B type": 1, "total": 3},
+        ], [dict(row) for row in response.data["results"]])
+
+    def test_measures(self):
+        response = self.client.get(
+            self.url + "?rows=facility_type&cols=county&measure=beds")
+        self.assertEquals(200, response.status_code)
+        self.assertEquals(10, response.data["total"])
+        self.assertEquals(
+            {"facility_type": "A type", "A county": 6, "B county": 0,
+             "total": 6},
+            dict(response.data["results"][0]))
+
+    def test_invalid_dimensions(self):
+        for params in ["?rows=planet", "?measure=area",
+                       "?rows=county&cols=county"]:
+            response = self.client.get(self.url + params)
+            self.assertEquals(400, response.status_code)
+
+    def test_export(self):
+        response = self.client.get(self.url + "?format=csv")
+        self.assertEquals(200, response.status_code)
+        self.assertIn(b"A county", response.content)
+        response = self.client.get(self.url + "?format=excel")
+        self.assertEquals(200, response.status_code)
+
+
+class TestFacilityTrends(LoginMixin, APITestCase):
+
+    def setUp(self):
+        super(TestFacilityTrends, self).setUp()
+        self.url = reverse("api:reporting:facility_trends")
+        self.today = timezone.localtime(timezone.now()).date()
+        self.yesterday = self.today - timedelta(days=1)
+        county = mommy.make(County, name='A county')
+        other_county = mommy.make(County, name='B county')
+        for day in (self.yesterday, self.today):
+            mommy.make(
+                FacilityStatsSnapshot, date=day, county=county,
+                facilities=2, beds=5)
+            mommy.make(
+                FacilityStatsSnapshot, date=day, county=other_county,
+                facilities=1, beds=1)
+        mommy.make(
+            FacilityStatsSnapshot, county=county, facilities=7,
+            date=self.today - timedelta(days=400))
+
+    def test_trends(self):
+        response = self.client.get(self.url)
+        self.assertEquals(200, response.status_code)
+        self.assertEquals(self.today, response.data["until"])
+        self.assertEquals([
+            {"date": self.yesterday, "value": 3},
+            {"date": self.today, "value": 3},
+        ], response.data["results"])
+
+    def test_trends_by_dimension(self):
+        response = self.client.get(
+            self.url + "?dimension=county&measure=beds&since={}".format(
+                self.today))
+        self.assertEquals([
+            {"date": self.today, "county": "A county", "value": 5},
+            {"date": self.today, "county": "B county", "value": 1},
+        ], response.data["results"])
+
+    def test_trends_over_a_custom_period(self):
+        response = self.client.get(
+            self.url + "?since=2000-01-01&until={}".format(self.yesterday))
+        self.assertEquals([7, 3], [
+            point["value"] for point in response.data["results"]])
+
+    def test_invalid_trend_parameters(self):
+        for query in ("?since=someday", "?until=2015-02-30",
+                      "?dimension=ward", "?measure=rooms"):
+            response = self.client.get(self.url + query)
+            self.assertEquals(400, response.status_code)
+
+
+@override_settings(
+    CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    })
+class TestReportCache(LoginMixin, APITestCase):
+
+    def setUp(self):
+        super(TestReportCache, self).setUp()
+        cache.clear()
+        self.url = reverse("api:reporting:reports")
+        self.county = mommy.make(County)
+        self.ward = mommy.make(
+            Ward, constituency=mommy.make(Constituency, county=self.county))
+        mommy.make(Facility, ward=self.ward)
+        # loads the user's scope, so only the reports' own queries differ
+        self.client.get(reverse("api:reporting:pivot_report"))
+
+    def _get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEquals(200, response.status_code)
+        return len(queries), response.data
+
+    def _county_count(self, data):
+        return [
+            row["number_of_facilities"] for row in data["results"]
+            if row["county_name"] == self.county.name]
+
+    def test_reports_are_cached(self):
+        cold_count, data = self._get(self.url)
+        warm_count, cached = self._get(self.url)
+        self.assertLess(warm_count, cold_count)
+        self.assertEquals(data, cached)
+
+    def test_query_parameters_are_normalized(self):
+        url = self.url + "?report_type=facility_count_by_county"
+        cold_count, _ = self._get(url + "&county=&format=json")
+        warm_count, _ = self._get(self.url + "?county=&report_type={}".format(
+            "facility_count_by_county"))
+        self.assertLess(warm_count, cold_count)
+
+    def test_unread_parameters_share_the_cache(self):
+        cold_count, data = self._get(self.url + "?_=1")
+        warm_count, cached = self._get(self.url + "?_=2&page=3")
+        self.assertLess(warm_count, cold_count)
+        self.assertEquals(data, cached)
+
+    def test_recent_periods_move_on(self):
+        url = reverse("api:reporting:upgrade_downgrade_report")
+        mommy.make(
+            FacilityUpgrade, facility=Facility.objects.get(),
+            created=timezone.now() - timedelta(days=7))
+        _, data = self._get(url + "?last_week=true")
+        self.assertEquals(1, data["total_number_of_changes"])
+
+        # as if a day went by; the window starts a day later
+        recent_periods = facility_reports.RECENT_PERIODS
+        facility_reports.RECENT_PERIODS = (('last_week', 6), )
+        try:
+            _, data = self._get(url + "?last_week=true")
+        finally:
+            facility_reports.RECENT_PERIODS = recent_periods
+        self.assertEquals(0, data["total_number_of_changes"])
+
+    def test_writes_invalidate_cached_reports(self):
+        _, data = self._get(self.url)
+        self.assertEquals([1], self._county_count(data))
+        mommy.make(Facility, ward=self.ward)
+        _, data = self._get(self.url)
+        self.assertEquals([2], self._county_count(data))
+
+    def test_upgrade_report_cache(self):
+        url = reverse("api:reporting:upgrade_downgrade_report")
+        _, data = self._get(url)
+        self.assertEquals(0, data["total_number_of_changes"])
+        mommy.make(FacilityUpgrade, facility=Facility.objects.get())
+        _, data = self._get(url)
+        self.assertEquals(1, data["total_number_of_changes"])
+
+    def test_snapshots_invalidate_cached_trends(self):
+        url = reverse("api:reporting:facility_trends")
+        _, data = self._get(url)
+        self.assertEquals([], data["results"])
+        snapshot_facility_stats()
+        _, data = self._get(url)
+        self.assertEquals([1], [point["value"] for point in data["results"]])
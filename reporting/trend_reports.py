@@ -0,0 +1,75 @@
+"""
+Facility trends, read from the daily `FacilityStatsSnapshot`s.
+
+A year of snapshots is a few rows per day and dimension value, so a trend
+is a single GROUP BY over the snapshots in the requested period.
+"""
+from datetime import timedelta
+
+from django.db.models import Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from rest_framework.exceptions import ValidationError
+
+from .pivot_reports import _get_choice
+
+
+# dimension: the snapshot field holding its name
+TREND_DIMENSIONS = {
+    'county': 'county__name',
+    'facility_type': 'facility_type__name',
+    'keph_level': 'keph_level__name',
+    'owner_type': 'owner_type__name',
+    'operation_status': 'operation_status__name',
+}
+
+TREND_MEASURES = {
+    'count': Sum('facilities'),
+    'beds': Sum('beds'),
+    'cots': Sum('cots'),
+}
+
+TREND_DAYS = 365
+
+
+def _get_date(name, value, default):
+    if not value:
+        return default
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: ['Enter a valid date']})
+    return parsed
+
+
+def get_trend_period(query_params):
+    """The `( since, until )` dates requested; the last year by default"""
+    today = timezone.localtime(timezone.now()).date()
+    until = _get_date('until', query_params.get('until', None), today)
+    since = _get_date(
+        'since', query_params.get('since', None),
+        until - timedelta(days=TREND_DAYS))
+    return since, until
+
+
+def get_trends(snapshots, since, until, dimension=None, measure='count'):
+    """
+    The `measure` of each snapshot date from `since` to `until`, split by
+    `dimension` if given, as `{"date", <dimension>, "value"}` dicts.
+    """
+    aggregate = _get_choice('measure', measure, TREND_MEASURES)
+    fields = ['date']
+    if dimension:
+        fields.append(_get_choice('dimension', dimension, TREND_DIMENSIONS))
+
+    points = snapshots.filter(date__gte=since, date__lte=until).order_by(
+    ).values(*fields).annotate(value=aggregate).order_by(*fields)
+    return [
+        dict(
+            [('date', point['date']), ('value', point['value'] or 0)] +
+            [(dimension, point[field]) for field in fields[1:]])
+        for point in points
+    ]
@@ -1,6 +1,8 @@
 from django.conf.urls import url, patterns
 
-from .facility_reports import ReportView, FacilityUpgradeDowngrade
+from .facility_reports import (
+    ReportView, FacilityUpgradeDowngrade, PivotReportView,
+    FacilityTrendsView)
 
 
 urlpatterns = patterns(
@@ -8,6 +10,8 @@ urlpatterns = patterns(
     url(r'^upgrades_downgrades/$',
         FacilityUpgradeDowngrade.as_view(),
         name='upgrade_downgrade_report'),
+    url(r'^pivot/$', PivotReportView.as_view(), name='pivot_report'),
+    url(r'^trends/$', FacilityTrendsView.as_view(), name='facility_trends'),
     url(r'^$', ReportView.as_view(),
         name='reports'),
 
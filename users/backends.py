@@ -0,0 +1,34 @@
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from .models import get_user_permissions_cache_key
+
+PERMISSIONS_CACHE_SECONDS = 60 * 60 * 24
+
+
+class CachedPermissionsBackend(ModelBackend):
+
+    """
+    A `ModelBackend` whose permission sets are shared across requests.
+
+    `ModelBackend` only caches a user's permissions on the user object,
+    so every request reads them off the group and user permission tables
+    again. Here the effective permissions are kept in the cache under a
+    key that changes whenever group memberships, group permissions or
+    direct user permissions change.
+    """
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous() or \
+                obj is not None:
+            return set()
+        if not hasattr(user_obj, '_perm_cache'):
+            key = get_user_permissions_cache_key(user_obj)
+            permissions = cache.get(key)
+            if permissions is None:
+                permissions = super(
+                    CachedPermissionsBackend, self).get_all_permissions(
+                    user_obj)
+                cache.set(key, permissions, PERMISSIONS_CACHE_SECONDS)
+            user_obj._perm_cache = set(permissions)
+        return user_obj._perm_cache
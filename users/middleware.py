@@ -0,0 +1,30 @@
+from django.utils.functional import SimpleLazyObject
+
+from .models import load_user_scope
+
+
+def get_request_scope(request):
+    """
+    The `UserScope` of the user making `request`, loaded at most once per
+    request.
+    """
+    scope = getattr(request, 'user_scope', None)
+    if scope is None:
+        scope = load_user_scope(request.user)
+        request.user_scope = scope
+    return scope
+
+
+class UserScopeMiddleware(object):
+
+    """
+    Attaches the user's scope to the request as `request.user_scope`.
+
+    The scope is loaded lazily: API views authenticate their requests
+    after the middleware has run, so it has to be read off whichever user
+    the request ends up with.
+    """
+
+    def process_request(self, request):
+        request.user_scope = SimpleLazyObject(
+            lambda: load_user_scope(request.user))
@@ -1,8 +1,13 @@
 import reversion
 import datetime
+import hashlib
 
+from django.core.cache import cache
 from django.db import models
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
 from django.utils import timezone, encoding
+from django.utils.encoding import force_bytes
 from django.core.validators import (
     validate_email, RegexValidator, ValidationError
 )
@@ -307,6 +312,172 @@ class ProxyGroup(Group):
         return self.name
 
 
+USER_SCOPE_VERSION = 'user_scope'
+USER_SCOPE_CACHE_KEY = 'user_scope:{}:{}:{}'
+USER_SCOPE_CACHE_SECONDS = 60 * 60 * 24
+
+USER_PERMISSIONS_VERSION = 'user_permissions'
+USER_PERMISSIONS_CACHE_KEY = 'user_permissions:{}:{}:{}'
+
+# the records that change what a user gets to see
+USER_SCOPE_MODELS = (
+    ('common', 'usercounty'),
+    ('common', 'userconstituency'),
+    ('facilities', 'regulatorybodyuser'),
+    ('users', 'mfluser'),
+    ('users', 'customgroup'),
+)
+
+# the records that change what permissions a user has, besides the
+# group and permission assignments
+USER_PERMISSIONS_MODELS = (
+    ('auth', 'group'),
+    ('auth', 'permission'),
+)
+
+
+class UserScope(object):
+
+    """
+    The administrative unit, regulator and permissions that decide what a
+    user gets to see.
+
+    Loading a scope takes a fixed number of queries and the result is
+    cached ( see `load_user_scope` ), so views should read the scope
+    instead of the `county`, `constituency` and `regulator` properties of
+    the user, each of which runs a query every time it is read.
+    """
+
+    def __init__(self, user_id=None, is_national=False, county=None,
+                 constituency=None, regulator=None, permissions=(),
+                 is_active=False, is_superuser=False):
+        self.user_id = user_id
+        self.is_national = is_national
+        self.county = county
+        self.constituency = constituency
+        self.regulator = regulator
+        self.permissions = frozenset(permissions)
+        self.is_active = is_active
+        self.is_superuser = is_superuser
+
+    @classmethod
+    def for_user(cls, user):
+        """Read a user's scope off the database"""
+        from common.models import UserCounty, UserConstituency
+        from facilities.models import RegulatoryBodyUser
+
+        if not user.is_authenticated():
+            return cls()
+
+        user_county = UserCounty.objects.filter(
+            user=user, active=True).select_related('county').first()
+        user_constituency = UserConstituency.objects.filter(
+            user=user, active=True
+        ).select_related('constituency__county').first()
+        regulator_user = RegulatoryBodyUser.objects.filter(
+            user=user, active=True).select_related('regulatory_body').first()
+        return cls(
+            user_id=user.pk,
+            is_national=user.is_national,
+            county=user_county.county if user_county else None,
+            constituency=(
+                user_constituency.constituency
+                if user_constituency else None),
+            regulator=(
+                regulator_user.regulatory_body if regulator_user else None),
+            permissions=user.get_all_permissions(),
+            is_active=user.is_active,
+            is_superuser=user.is_superuser
+        )
+
+    def has_perm(self, perm):
+        """Mirrors `PermissionsMixin.has_perm` for the cached permissions"""
+        if not self.is_active:
+            return False
+        return self.is_superuser or perm in self.permissions
+
+    @property
+    def key(self):
+        """Users whose scope keys match see exactly the same records"""
+        scope = (
+            self.is_national,
+            self.county.pk if self.county else None,
+            self.constituency.pk if self.constituency else None,
+            self.regulator.pk if self.regulator else None,
+            sorted(self.permissions),
+            self.is_active,
+            self.is_superuser,
+        )
+        return hashlib.md5(force_bytes(repr(scope))).hexdigest()
+
+
+def load_user_scope(user):
+    """
+    The scope of `user`, from the cache when it is there.
+
+    Cached scopes are keyed on the user and on the scope and permission
+    version counters; the scope version is bumped whenever the records in
+    `USER_SCOPE_MODELS` change.
+    """
+    from common.models import get_named_versions
+
+    if not user.is_authenticated():
+        return UserScope()
+
+    versions = get_named_versions(
+        [USER_SCOPE_VERSION, USER_PERMISSIONS_VERSION])
+    key = USER_SCOPE_CACHE_KEY.format(
+        user.pk, versions[USER_SCOPE_VERSION],
+        versions[USER_PERMISSIONS_VERSION])
+    scope = cache.get(key)
+    if scope is None:
+        scope = UserScope.for_user(user)
+        cache.set(key, scope, USER_SCOPE_CACHE_SECONDS)
+    return scope
+
+
+def get_user_permissions_cache_key(user):
+    """
+    The key of a user's cached permission set.
+
+    Superusers have every permission, so the flag is a part of the key;
+    the version changes with group memberships, group permissions and
+    direct user permissions.
+    """
+    from common.models import get_named_version
+    return USER_PERMISSIONS_CACHE_KEY.format(
+        user.pk, int(user.is_superuser),
+        get_named_version(USER_PERMISSIONS_VERSION))
+
+
+def _bump_named_version(name):
+    from common.models import bump_named_version
+    bump_named_version(name)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def bump_user_versions_on_change(sender, **kwargs):
+    meta = sender._meta
+    label = (meta.app_label, meta.model_name)
+    if label in USER_PERMISSIONS_MODELS:
+        _bump_named_version(USER_PERMISSIONS_VERSION)
+    if label not in USER_SCOPE_MODELS:
+        return
+    # logging in only touches `last_login`
+    if kwargs.get('update_fields') == frozenset(['last_login']):
+        return
+    _bump_named_version(USER_SCOPE_VERSION)
+
+
+@receiver(m2m_changed)
+def bump_user_permissions_version(sender, action, **kwargs):
+    if action.startswith('post_') and sender in (
+            MflUser.groups.through, MflUser.user_permissions.through,
+            Group.permissions.through):
+        _bump_named_version(USER_PERMISSIONS_VERSION)
+
+
 # model registration done here
 reversion.register(MFLOAuthApplication, follow=['user'])
 reversion.register(Permission)
@@ -1,14 +1,26 @@
 import json
 
-from django.contrib.auth.models import Group
+from django.contrib.auth.models import AnonymousUser, Group, Permission
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.core.urlresolvers import reverse
-from django.test import Client, TestCase
+from django.test import Client, RequestFactory, TestCase
+from django.test.utils import override_settings
 from django.utils import timezone
 from model_mommy import mommy
 
+from common.models import County, UserCounty
 from common.tests.test_models import BaseTestCase
-from ..models import MflUser, MFLOAuthApplication, ProxyGroup, CustomGroup
+from ..backends import CachedPermissionsBackend
+from ..middleware import UserScopeMiddleware, get_request_scope
+from ..models import (
+    MflUser,
+    MFLOAuthApplication,
+    ProxyGroup,
+    CustomGroup,
+    UserScope,
+    load_user_scope
+)
 
 
 class TestMflUserModel(BaseTestCase):
@@ -191,3 +203,140 @@ class TestCustomAndProxyGroup(TestCase):
         self.assertFalse(proxy_group.is_national)
         self.assertFalse(proxy_group.is_county_level)
         self.assertFalse(proxy_group.is_sub_county_level)
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+})
+class TestUserScope(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = MflUser.objects.create_user(
+            email='scope@ehealth.or.ke', first_name='Scope',
+            employee_number='7070707', password='mtihani124')
+
+    def test_scope_is_cached(self):
+        county = mommy.make(County)
+        mommy.make(UserCounty, user=self.user, county=county)
+        scope = load_user_scope(self.user)
+        self.assertEquals(county, scope.county)
+        self.assertIsNone(scope.constituency)
+        self.assertIsNone(scope.regulator)
+        self.assertFalse(scope.is_national)
+
+        with self.assertNumQueries(0):
+            cached = load_user_scope(self.user)
+        self.assertEquals(scope.key, cached.key)
+        self.assertEquals(county, cached.county)
+
+    def test_scope_changes_invalidate_the_cache(self):
+        scope = load_user_scope(self.user)
+        self.assertIsNone(scope.county)
+
+        county = mommy.make(County)
+        mommy.make(UserCounty, user=self.user, county=county)
+        county_scope = load_user_scope(self.user)
+        self.assertEquals(county, county_scope.county)
+        self.assertNotEqual(scope.key, county_scope.key)
+
+        group = mommy.make(Group)
+        group.permissions.add(
+            Permission.objects.get(codename='view_unpublished_facilities'))
+        self.user.groups.add(group)
+        user = MflUser.objects.get(pk=self.user.pk)
+        self.assertTrue(load_user_scope(user).has_perm(
+            'facilities.view_unpublished_facilities'))
+
+    def test_logging_in_keeps_the_cache(self):
+        load_user_scope(self.user)
+        self.user.last_login = timezone.now()
+        self.user.save(update_fields=['last_login'])
+        with self.assertNumQueries(0):
+            load_user_scope(self.user)
+
+    def test_has_perm(self):
+        scope = UserScope(is_active=True, permissions=['common.view_county'])
+        self.assertTrue(scope.has_perm('common.view_county'))
+        self.assertFalse(scope.has_perm('common.add_county'))
+        self.assertTrue(
+            UserScope(is_active=True, is_superuser=True).has_perm('a.b'))
+        self.assertFalse(
+            UserScope(is_superuser=True).has_perm('common.view_county'))
+
+    def test_anonymous_scope(self):
+        scope = load_user_scope(AnonymousUser())
+        self.assertIsNone(scope.county)
+        self.assertFalse(scope.has_perm('common.view_county'))
+
+    def test_middleware(self):
+        request = RequestFactory().get('/')
+        UserScopeMiddleware().process_request(request)
+        # the user is only known once the request has been authenticated
+        request.user = self.user
+        self.assertEquals(self.user.pk, get_request_scope(request).user_id)
+
+        request = RequestFactory().get('/')
+        request.user = self.user
+        scope = get_request_scope(request)
+        self.assertIs(scope, get_request_scope(request))
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+})
+class TestCachedPermissionsBackend(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.backend = CachedPermissionsBackend()
+        self.perm = 'facilities.view_unpublished_facilities'
+        self.permission = Permission.objects.get(
+            codename='view_unpublished_facilities')
+        self.group = mommy.make(Group)
+        self.group.permissions.add(self.permission)
+        self.user = MflUser.objects.create_user(
+            email='perms@ehealth.or.ke', first_name='Perms',
+            employee_number='8080808', password='mtihani124')
+        self.user.groups.add(self.group)
+
+    def _fresh_user(self):
+        return MflUser.objects.get(pk=self.user.pk)
+
+    def test_permissions_are_shared_across_requests(self):
+        self.assertTrue(self.backend.has_perm(self._fresh_user(), self.perm))
+        user = self._fresh_user()
+        with self.assertNumQueries(0):
+            self.assertTrue(self.backend.has_perm(user, self.perm))
+
+    def test_group_permission_changes(self):
+        self.assertTrue(self.backend.has_perm(self._fresh_user(), self.perm))
+        self.group.permissions.clear()
+        self.assertFalse(
+            self.backend.has_perm(self._fresh_user(), self.perm))
+
+        self.user.user_permissions.add(self.permission)
+        self.assertTrue(self.backend.has_perm(self._fresh_user(), self.perm))
+
+    def test_group_membership_changes(self):
+        self.assertTrue(self.backend.has_perm(self._fresh_user(), self.perm))
+        self.user.groups.remove(self.group)
+        self.assertFalse(
+            self.backend.has_perm(self._fresh_user(), self.perm))
+
+    def test_superusers_and_inactive_users(self):
+        self.assertFalse(self.backend.has_perm(
+            self._fresh_user(), 'facilities.view_closed_facilities'))
+        self.user.is_superuser = True
+        self.user.save()
+        self.assertTrue(self.backend.has_perm(
+            self._fresh_user(), 'facilities.view_closed_facilities'))
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEquals(
+            set(), self.backend.get_all_permissions(self._fresh_user()))
@@ -4,6 +4,7 @@ from django.contrib.auth.models import Permission
 
 from common.utilities import CustomRetrieveUpdateDestroyView
 
+from .middleware import get_request_scope
 from .models import MflUser, MFLOAuthApplication, ProxyGroup
 
 from .serializers import (
@@ -50,22 +51,22 @@ class UserList(generics.ListCreateAPIView):
 
     def get_queryset(self, *args, **kwargs):
         from common.models import UserCounty, UserConstituency
-        user = self.request.user
-        if user.county and not user.is_national:
+        scope = get_request_scope(self.request)
+        if scope.county and not scope.is_national:
             county_users = [
                 const_user.user.id for const_user in
                 UserCounty.objects.filter(
-                    county=user.county).distinct()
+                    county=scope.county).distinct()
             ]
             sub_county_users = [
                 const_user.user.id for const_user in
                 UserConstituency.objects.filter(
-                    constituency__county=user.county).distinct()
+                    constituency__county=scope.county).distinct()
             ]
             area_users = county_users + sub_county_users
             return MflUser.objects.filter(
                 id__in=area_users)
-        elif user.is_national:
+        elif scope.is_national:
             # Should see the county users and the national users
             # Also should not see the system user
             county_users = [